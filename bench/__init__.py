@@ -0,0 +1,9 @@
+"""
+Offline benchmarks: a fake Azure OpenAI server, a synthetic claim-PDF corpus, an
+end-to-end pipeline run and microbenchmarks.
+
+    python -m bench.run --claims 200 --concurrency 8      # claims/sec, stage p50/p95, peak RSS
+    python -m bench.micro --sizes 10000 100000 1000000    # similarity search, extract_key_fields
+    python -m bench.fake_openai --port 8099               # standalone fake endpoint
+    python -m bench.corpus /tmp/claims --claims 500       # just the PDFs
+"""
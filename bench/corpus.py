@@ -0,0 +1,246 @@
+"""
+Synthetic claim-PDF corpus for benchmarks.
+
+    python -m bench.corpus /tmp/claims --claims 500 --kinds digital,scanned,multipage,hindi
+
+Kinds:
+    digital    one-page English claim form with a text layer
+    multipage  claim form followed by 2-5 pages of bills and discharge notes
+    scanned    image-only pages (needs OCR: tesseract or USE_AZURE_OCR)
+    hindi      Devanagari claim form; the text layer maps glyph ids to Unicode
+               through a ToUnicode CMap, so no font file is needed to extract it
+
+A share of claims (--dup-rate) repeats an earlier claim's policy, name and date,
+sometimes with a different amount, so the duplicate-matching path is exercised.
+Generation is deterministic for a given --seed.
+"""
+import argparse
+import io
+import random
+from pathlib import Path
+from typing import Any, Optional
+
+KINDS = ("digital", "multipage", "scanned", "hindi")
+
+_FIRST = ("Rohan", "Priya", "Amit", "Sneha", "Vikram", "Ananya", "Rahul", "Kavya", "Arjun", "Meera", "Sanjay", "Divya")
+_LAST = ("Sharma", "Verma", "Iyer", "Nair", "Gupta", "Reddy", "Patel", "Khan", "Das", "Menon", "Joshi", "Rao")
+_FIRST_HI = ("रोहन", "प्रिया", "अमित", "स्नेहा", "विक्रम", "अनन्या", "राहुल", "काव्या")
+_LAST_HI = ("शर्मा", "वर्मा", "गुप्ता", "पटेल", "जोशी", "राव")
+_HOSPITALS = ("City Care Hospital", "Apollo Clinic", "Sunrise Medical Centre", "Green Valley Hospital")
+_DIAGNOSES = ("Acute appendicitis", "Fractured radius", "Dengue fever", "Cataract surgery", "Road traffic injury")
+_PREFIXES = ("HL", "MT", "PL", "HC")
+
+
+def claim_fields(rng: random.Random) -> dict[str, Any]:
+    """Random claim details (names in both scripts, so any kind can render them)."""
+    i, j = rng.randrange(len(_FIRST)), rng.randrange(len(_LAST))
+    return {
+        "name": f"{_FIRST[i]} {_LAST[j]}",
+        "name_hi": f"{_FIRST_HI[i % len(_FIRST_HI)]} {_LAST_HI[j % len(_LAST_HI)]}",
+        "policy": f"{rng.choice(_PREFIXES)}-{rng.randint(10_000_000, 99_999_999)}",
+        "date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice((2025, 2026))}",
+        "amount": rng.randint(5_000, 500_000),
+        "hospital": rng.choice(_HOSPITALS),
+        "diagnosis": rng.choice(_DIAGNOSES),
+    }
+
+
+def form_lines(f: dict[str, Any]) -> list[str]:
+    return [
+        "HEALTH INSURANCE CLAIM FORM",
+        "",
+        f"Policy Holder Name: {f['name']}",
+        f"Policy Number: {f['policy']}",
+        f"Date of Incident: {f['date']}",
+        f"Hospital: {f['hospital']}",
+        f"Diagnosis: {f['diagnosis']}",
+        f"Treatment Cost: Rs {f['amount']:,}",
+        "",
+        "I declare that the information furnished in this claim form is true and correct.",
+        "Signature of claimant: ______________________",
+    ]
+
+
+def hindi_lines(f: dict[str, Any]) -> list[str]:
+    return [
+        "स्वास्थ्य बीमा दावा प्रपत्र",
+        "",
+        f"नाम: {f['name_hi']}",
+        f"पॉलिसी नंबर: {f['policy']}",
+        f"घटना की तारीख: {f['date']}",
+        f"दावा राशि: {f['amount']:,}",
+        f"अस्पताल: {f['hospital']}",
+        "",
+        "मैं घोषणा करता हूँ कि दी गई जानकारी सत्य है।",
+    ]
+
+
+def annex_lines(f: dict[str, Any], page: int, rng: random.Random) -> list[str]:
+    lines = [f"ANNEXURE {page} - ITEMISED BILL ({f['hospital']})", f"Policy Number: {f['policy']}", ""]
+    for k in range(rng.randint(12, 30)):
+        lines.append(f"{k + 1:>3}. Item {rng.randint(1000, 9999)}  qty {rng.randint(1, 5)}  Rs {rng.randint(100, 20_000):,}")
+    lines += ["", f"Discharge note: patient treated for {f['diagnosis'].lower()} and discharged in stable condition."]
+    return lines
+
+
+# --- Minimal PDF writer ----------------------------------------------------------------
+
+
+def _serialize(objects: list[bytes]) -> bytes:
+    """PDF file from numbered objects (object 1 must be the catalog)."""
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _stream(data: bytes) -> bytes:
+    return b"<</Length %d>>stream\n" % len(data) + data + b"\nendstream"
+
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("latin-1", "replace") + b")"
+
+
+_TO_UNICODE = b"""/CIDInit /ProcSet findresource begin 12 dict begin begincmap
+/CIDSystemInfo <</Registry (Adobe) /Ordering (UCS) /Supplement 0>> def
+/CMapName /Adobe-Identity-UCS def /CMapType 2 def
+1 begincodespacerange <0000> <FFFF> endcodespacerange
+1 beginbfrange <0000> <FFFF> <0000> endbfrange
+endcmap CMapName currentdict /CMap defineresource pop end end"""
+
+
+def text_pdf(pages: list[list[str]], unicode: bool = False) -> bytes:
+    """
+    Text-layer PDF, one list of lines per page. Latin text uses Helvetica; unicode=True
+    writes UTF-16 code units through an Identity-H Type0 font with a ToUnicode map.
+    """
+    objects: list[bytes] = [b"", b""]
+    if unicode:
+        objects += [
+            b"<</Type/Font/Subtype/Type0/BaseFont/NotoSansDevanagari/Encoding/Identity-H"
+            b"/DescendantFonts[4 0 R]/ToUnicode 5 0 R>>",
+            b"<</Type/Font/Subtype/CIDFontType2/BaseFont/NotoSansDevanagari"
+            b"/CIDSystemInfo<</Registry(Adobe)/Ordering(Identity)/Supplement 0>>/FontDescriptor 6 0 R/DW 600>>",
+            _stream(_TO_UNICODE),
+            b"<</Type/FontDescriptor/FontName/NotoSansDevanagari/Flags 4/FontBBox[0 -300 1000 900]"
+            b"/ItalicAngle 0/Ascent 900/Descent -300/CapHeight 700/StemV 80>>",
+        ]
+    else:
+        objects.append(b"<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>")
+    kids = []
+    for lines in pages:
+        if unicode:
+            shown = [b"<" + line.encode("utf-16-be").hex().encode() + b"> Tj T*" for line in lines]
+        else:
+            shown = [_pdf_string(line) + b" Tj T*" for line in lines]
+        objects.append(_stream(b"BT /F1 11 Tf 60 750 Td 15 TL " + b" ".join(shown) + b" ET"))
+        objects.append(
+            b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]/Contents %d 0 R"
+            b"/Resources<</Font<</F1 3 0 R>>>>>>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[0] = b"<</Type/Catalog/Pages 2 0 R>>"
+    objects[1] = b"<</Type/Pages/Kids[%s]/Count %d>>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    return _serialize(objects)
+
+
+def scanned_pdf(pages: list[list[str]], rng: random.Random, dpi: int = 150) -> bytes:
+    """Image-only PDF: each page rendered to a grey, slightly skewed and speckled bitmap."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.load_default(size=int(dpi / 72 * 11))
+    except TypeError:  # Pillow < 10.1 has no scalable default font
+        font = ImageFont.load_default()
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    images = []
+    for lines in pages:
+        img = Image.new("L", (width, height), 250)
+        draw = ImageDraw.Draw(img)
+        y = int(0.8 * dpi)
+        for line in lines:
+            draw.text((int(0.8 * dpi), y), line, fill=rng.randint(10, 60), font=font)
+            y += int(dpi / 72 * 15)
+        for _ in range(width * height // 2000):
+            draw.point((rng.randrange(width), rng.randrange(height)), fill=rng.randint(120, 200))
+        images.append(img.rotate(rng.uniform(-1.0, 1.0), fillcolor=250))
+    buf = io.BytesIO()
+    images[0].save(buf, format="PDF", resolution=dpi, save_all=True, append_images=images[1:])
+    return buf.getvalue()
+
+
+# --- Corpus ------------------------------------------------------------------------
+
+
+def make_claim_pdf(kind: str, fields: dict[str, Any], rng: random.Random) -> bytes:
+    if kind == "digital":
+        return text_pdf([form_lines(fields)])
+    if kind == "multipage":
+        extra = rng.randint(2, 5)
+        return text_pdf([form_lines(fields)] + [annex_lines(fields, p, rng) for p in range(1, extra + 1)])
+    if kind == "scanned":
+        return scanned_pdf([form_lines(fields)], rng)
+    if kind == "hindi":
+        return text_pdf([hindi_lines(fields)], unicode=True)
+    raise ValueError(f"Unknown corpus kind {kind!r}; expected one of {', '.join(KINDS)}.")
+
+
+def generate(
+    out_dir: str,
+    claims: int = 100,
+    kinds: tuple[str, ...] = KINDS,
+    dup_rate: float = 0.1,
+    seed: int = 0,
+) -> list[str]:
+    """Write claims PDFs (kinds in rotation) to out_dir. Returns their paths in generation order."""
+    rng = random.Random(seed)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    history: list[dict[str, Any]] = []
+    paths = []
+    for n in range(claims):
+        kind = kinds[n % len(kinds)]
+        if history and rng.random() < dup_rate:
+            fields = dict(rng.choice(history))
+            if rng.random() < 0.5:
+                fields["amount"] = int(fields["amount"] * rng.uniform(1.05, 1.5))
+        else:
+            fields = claim_fields(rng)
+            history.append(fields)
+        path = out / f"claim_{n:06d}_{kind}.pdf"
+        path.write_bytes(make_claim_pdf(kind, fields, rng))
+        paths.append(str(path))
+    return paths
+
+
+def parse_kinds(value: Optional[str]) -> tuple[str, ...]:
+    kinds = tuple(k.strip() for k in (value or ",".join(KINDS)).split(",") if k.strip())
+    unknown = [k for k in kinds if k not in KINDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown kind(s) {', '.join(unknown)}; expected {', '.join(KINDS)}")
+    return kinds
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.corpus", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--claims", type=int, default=100)
+    parser.add_argument("--kinds", type=parse_kinds, default=KINDS, help=f"Comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--dup-rate", type=float, default=0.1, help="Share of claims repeating an earlier claim")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = generate(args.out_dir, args.claims, args.kinds, args.dup_rate, args.seed)
+    print(f"Wrote {len(paths)} PDFs to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,266 @@
+"""
+Local stand-in for the Azure OpenAI chat and embeddings endpoints.
+
+    python -m bench.fake_openai --port 8099 --chat-latency-ms 400 --embedding-latency-ms 60
+
+Point AZURE_OPENAI_ENDPOINT at http://127.0.0.1:<port> (any API key). Chat replies
+are derived from the prompt (the regex field extractor stands in for the LLM, the
+verdict follows the duplication threshold), vision OCR returns a synthetic claim
+page, and embeddings are deterministic feature-hashed vectors, so similar claim
+text gives similar vectors. Latency, jitter and 429 rate are configurable;
+GET /stats returns request counts.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int = 1536) -> np.ndarray:
+    """Unit float32 vector from signed hashes of the words and character trigrams of text."""
+    vec = np.zeros(dim, dtype=np.float32)
+    norm_text = " ".join(text.lower().split())
+    features = norm_text.split() + [norm_text[i : i + 3] for i in range(len(norm_text) - 2)]
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if h >> 63 else -1.0
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def _tokens(text: str) -> int:
+    # Rough tokenizer-free estimate (~4 characters per token)
+    return max(1, len(text) // 4)
+
+
+def _message_text(message: dict[str, Any]) -> tuple[str, bool]:
+    """Text of a chat message and whether it carries an image."""
+    content = message.get("content")
+    if isinstance(content, list):
+        texts = [part.get("text", "") for part in content if part.get("type") == "text"]
+        has_image = any(part.get("type") == "image_url" for part in content)
+        return "\n".join(texts), has_image
+    return str(content or ""), False
+
+
+def _ocr_page_text(image_url: str) -> str:
+    # The image is not read; its hash picks stable synthetic field values
+    seed = int(hashlib.sha256(image_url.encode("utf-8")).hexdigest()[:12], 16)
+    rng = random.Random(seed)
+    return (
+        "HEALTH INSURANCE CLAIM FORM\n"
+        f"Policy Holder Name: Scanned Claimant {seed % 10_000}\n"
+        f"Policy Number: SC-{rng.randint(10_000_000, 99_999_999)}\n"
+        f"Date of Incident: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026\n"
+        f"Treatment Cost: Rs {rng.randint(5_000, 500_000):,}\n"
+    )
+
+
+def chat_reply(messages: list[dict[str, Any]]) -> str:
+    """Reply content the real deployment would give for the pipeline's prompts."""
+    system = next((_message_text(m)[0] for m in messages if m.get("role") == "system"), "")
+    user_msg = next((m for m in messages if m.get("role") == "user"), {})
+    user, has_image = _message_text(user_msg)
+    if has_image:
+        url = next(p["image_url"]["url"] for p in user_msg["content"] if p.get("type") == "image_url")
+        return _ocr_page_text(url)
+    if "verification assistant" in system:
+        pct = re.search(r"Duplication with existing claim: ([\d.]+)%", user)
+        threshold = re.search(r"Threshold for potential duplicate: ([\d.]+)%", user)
+        dup = float(pct.group(1)) if pct else 0.0
+        limit = float(threshold.group(1)) if threshold else 85.0
+        if dup >= limit:
+            return json.dumps({
+                "status": "rejected",
+                "key_differences": "No material differences from the existing claim.",
+                "rejection_reason": "Duplicate of an existing claim.",
+            })
+        return json.dumps({"status": "accepted", "key_differences": "Different claim details.", "rejection_reason": ""})
+    # Imported here: importing services reads the settings, which bench.run configures first
+    from services.diff_extractor import extract_key_fields
+
+    fields = extract_key_fields(user)
+    is_claim = sum(v is not None for v in fields.values()) >= 2
+    reason = "Insurance claim form." if is_claim else "Not a claim document."
+    if "classifier and data extractor" in system:
+        return json.dumps({"is_claim": is_claim, "reason": reason, **(fields if is_claim else {})}, ensure_ascii=False)
+    if "document classifier" in system:
+        return json.dumps({"is_claim": is_claim, "reason": reason})
+    return json.dumps(fields, ensure_ascii=False)
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server answering Azure OpenAI chat/completions and embeddings requests."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        chat_latency_ms: float = 300.0,
+        embedding_latency_ms: float = 50.0,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        dim: int = 1536,
+        seed: int = 0,
+    ):
+        self.chat_latency_s = chat_latency_ms / 1000
+        self.embedding_latency_s = embedding_latency_ms / 1000
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.dim = dim
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: dict[str, int] = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def _delay(self, base_s: float) -> None:
+        with self._lock:
+            factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        if base_s > 0:
+            time.sleep(base_s * factor)
+
+    def _throttled(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def handle(self, path: str, body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        """(status, JSON body) for one POST request."""
+        if self._throttled():
+            self._count("throttled")
+            return 429, {"error": {"code": "429", "message": "Rate limit is exceeded (fake)."}}
+        if path.endswith("/chat/completions"):
+            self._delay(self.chat_latency_s)
+            messages = body.get("messages") or []
+            content = chat_reply(messages)
+            prompt = sum(_tokens(_message_text(m)[0]) for m in messages)
+            self._count("chat")
+            self._count("prompt_tokens", prompt)
+            return 200, {
+                "id": f"chatcmpl-fake-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": {
+                    "prompt_tokens": prompt,
+                    "completion_tokens": _tokens(content),
+                    "total_tokens": prompt + _tokens(content),
+                },
+            }
+        if path.endswith("/embeddings"):
+            self._delay(self.embedding_latency_s)
+            inputs = body.get("input") or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            as_base64 = body.get("encoding_format") == "base64"
+            data = []
+            for i, text in enumerate(inputs):
+                vec = fake_embedding(str(text), self.dim)
+                value: Any = base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii") if as_base64 else vec.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": value})
+            tokens = sum(_tokens(str(t)) for t in inputs)
+            self._count("embeddings")
+            self._count("embedding_inputs", len(inputs))
+            return 200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        return 404, {"error": {"code": "404", "message": f"Unknown path {path}"}}
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real endpoint (the client pools connections)
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, payload: dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("retry-after-ms", "50")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send(400, {"error": {"code": "400", "message": "Invalid JSON"}})
+                    return
+                self._send(*server.handle(self.path.split("?", 1)[0], body))
+
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0].rstrip("/") == "/stats":
+                    with server._lock:
+                        self._send(200, dict(server.stats))
+                else:
+                    self._send(404, {"error": {"code": "404", "message": "Not found"}})
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        return _Handler
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.fake_openai", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Uniform latency jitter as a fraction (0.2 = ±20%%)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimensions")
+    args = parser.parse_args(argv)
+    server = FakeOpenAIServer(
+        args.host, args.port, args.chat_latency_ms, args.embedding_latency_ms, args.jitter, args.error_rate, args.dim
+    )
+    print(f"Fake Azure OpenAI listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+"""
+Microbenchmarks of duplicate search and regex field extraction at corpus scale.
+
+    python -m bench.micro --sizes 10000 100000 1000000 --dim 1536 --queries 100
+    python -m bench.micro --only similarity --modes float32 int8 ivf --max-gb 8
+
+similarity: builds a ClaimVectorIndex (float32 and int8) and an IVF index
+(services.ann_index) over N synthetic clustered embeddings and times top-5 queries.
+int8 timings cover the quantized scan only; the exact re-score reads up to
+EMBEDDING_RESCORE_CANDIDATES embeddings from MongoDB, which is not part of this
+run. Sizes whose matrix would exceed --max-gb are skipped.
+
+extract_key_fields: runs the regex extractor over N synthetic claim texts
+(English, multi-page and Hindi, cycled) and reports µs per document.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Any, Iterator, Optional
+from unittest import mock
+
+import numpy as np
+
+from .corpus import annex_lines, claim_fields, form_lines, hindi_lines
+from .run import peak_rss_mb
+
+_TOP_K = 5
+_CHUNK = 10_000
+
+
+def _clustered(n: int, dim: int, seed: int) -> Iterator[np.ndarray]:
+    """Chunks of unit vectors around n/50 random centres (near-duplicates, like real claims)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, n // 50), dim), dtype=np.float32)
+    for start in range(0, n, _CHUNK):
+        size = min(_CHUNK, n - start)
+        block = centres[rng.integers(0, centres.shape[0], size)]
+        block += 0.3 * rng.standard_normal((size, dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        yield block
+
+
+def _query_times(search: Any, queries: np.ndarray) -> dict[str, float]:
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        search(q)
+        times.append((time.perf_counter() - start) * 1000)
+    p50, p95 = np.quantile(times, (0.5, 0.95))
+    return {"query_p50_ms": round(float(p50), 3), "query_p95_ms": round(float(p95), 3)}
+
+
+def bench_similarity(n: int, dim: int, mode: str, queries: int, seed: int) -> dict[str, Any]:
+    from services import vector_index
+    from services.ann_index import build_index, open_index
+
+    rng = np.random.default_rng(seed + 1)
+    qs = rng.standard_normal((queries, dim), dtype=np.float32)
+    row = {"benchmark": "similarity", "mode": mode, "claims": n, "dim": dim}
+    start = time.perf_counter()
+    if mode == "ivf":
+        with tempfile.TemporaryDirectory(prefix="bench_ivf_") as root:
+            source = (
+                (f"C{start_row + i}", vec)
+                for start_row, block in zip(range(0, n, _CHUNK), _clustered(n, dim, seed))
+                for i, vec in enumerate(block)
+            )
+            build_index(source, root=root, seed=seed)
+            index = open_index(root, reuse=False)
+            row["build_s"] = round(time.perf_counter() - start, 2)
+            row.update(_query_times(lambda q: index.search(q, _TOP_K), qs))
+            row["nlist"] = index.nlist
+        return row
+
+    index = vector_index.ClaimVectorIndex(dim=dim, quantized=mode == "int8")
+    offset = 0
+    for block in _clustered(n, dim, seed):
+        for vec in block:
+            index.add(f"C{offset}", vec)
+            offset += 1
+    row["build_s"] = round(time.perf_counter() - start, 2)
+    row["matrix_alloc_mb"] = round(index._matrix.nbytes / 1e6, 1)
+    # Keep the approximate scores: the exact re-score is a MongoDB read, not measured here
+    with mock.patch.object(vector_index, "_exact_scores", lambda ids, q, approx: approx):
+        row.update(_query_times(lambda q: index.search(q, _TOP_K), qs))
+    return row
+
+
+def _texts(seed: int, pool: int = 1000) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    for i in range(pool):
+        fields = claim_fields(rng)
+        if i % 3 == 0:
+            lines = form_lines(fields)
+        elif i % 3 == 1:
+            lines = form_lines(fields) + [line for p in (1, 2, 3) for line in annex_lines(fields, p, rng)]
+        else:
+            lines = hindi_lines(fields)
+        texts.append("\n".join(lines))
+    return texts
+
+
+def bench_extract_key_fields(n: int, seed: int) -> dict[str, Any]:
+    from services.diff_extractor import extract_key_fields
+
+    texts = _texts(seed)
+    start = time.perf_counter()
+    found = 0
+    for i in range(n):
+        fields = extract_key_fields(texts[i % len(texts)])
+        found += sum(v is not None for v in fields.values())
+    elapsed = time.perf_counter() - start
+    return {
+        "benchmark": "extract_key_fields",
+        "docs": n,
+        "elapsed_s": round(elapsed, 2),
+        "us_per_doc": round(elapsed / n * 1e6, 1),
+        "docs_per_s": round(n / elapsed),
+        "fields_found_per_doc": round(found / n, 2),
+    }
+
+
+def _matrix_gb(n: int, dim: int, mode: str) -> float:
+    return n * dim * (1 if mode == "int8" else 4) / 1e9
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.micro", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--modes", nargs="+", default=["float32", "int8", "ivf"], choices=["float32", "int8", "ivf"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--only", choices=["similarity", "extract"], default=None)
+    parser.add_argument("--max-gb", type=float, default=4.0, help="Skip index sizes whose vectors exceed this")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write the rows as JSON")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n in args.sizes:
+        if args.only != "extract":
+            for mode in args.modes:
+                if _matrix_gb(n, args.dim, mode) > args.max_gb:
+                    rows.append({"benchmark": "similarity", "mode": mode, "claims": n, "skipped": "exceeds --max-gb"})
+                else:
+                    rows.append(bench_similarity(n, args.dim, mode, args.queries, args.seed))
+                print(json.dumps(rows[-1]), flush=True)
+        if args.only != "similarity":
+            rows.append(bench_extract_key_fields(n, args.seed))
+            print(json.dumps(rows[-1]), flush=True)
+    print(json.dumps({"peak_rss_mb": peak_rss_mb()}))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "peak_rss_mb": peak_rss_mb()}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
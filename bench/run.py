@@ -0,0 +1,216 @@
+"""
+End-to-end benchmark of services.pipeline.run_verification without Azure or Atlas.
+
+    python -m bench.run --claims 200 --concurrency 8 --chat-latency-ms 400
+    python -m bench.run --mongo mongodb://localhost:27017 --corpus /data/claims --out bench.json
+
+Starts the fake OpenAI server in-process (or uses --openai-url for one started with
+`python -m bench.fake_openai`, which keeps its CPU out of the measurement), generates
+a synthetic corpus (bench.corpus) unless --corpus is given, and verifies every PDF
+with --concurrency threads. Storage is an in-memory mongomock database (--mongo
+memory, needs `pip install mongomock`) or a throwaway database on a local MongoDB
+that is dropped afterwards. Persistent extraction and embedding caches are off so
+every claim pays the full cost.
+
+Reports claims/sec, outcome counts, p50/p95/mean per pipeline stage (from each
+result's timings), OpenAI request counts and peak RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import numpy as np
+
+from .corpus import KINDS, generate, parse_kinds
+from .fake_openai import FakeOpenAIServer
+
+
+def _configure(openai_url: str, mongo: str, db_name: str, args: argparse.Namespace) -> None:
+    # Must run before services/config are imported: Settings reads the environment once
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": openai_url,
+        "AZURE_OPENAI_API_KEY": "bench",
+        "MONGODB_URI": mongo if mongo != "memory" else "mongodb://memory.invalid",
+        "MONGODB_DB_NAME": db_name,
+        "MONGODB_ENSURE_INDEXES": "false" if mongo == "memory" else "true",
+        "EXTRACTION_CACHE_BACKEND": "none",
+        "EMBEDDING_CACHE_BACKEND": "none",
+        "METRICS_PORT": "0",
+        "OPENAI_POOL_MAX_CONNECTIONS": str(max(20, args.concurrency * 2)),
+    })
+    if args.azure_ocr:
+        os.environ["USE_AZURE_OCR"] = "true"
+
+
+def _use_memory_db(db_name: str) -> None:
+    try:
+        import mongomock
+    except ImportError as e:
+        raise SystemExit("--mongo memory needs mongomock (pip install mongomock), or pass a MongoDB URI.") from e
+    from services import db
+
+    db._db = mongomock.MongoClient()[db_name]
+
+
+def _drop_db(db_name: str) -> None:
+    from services import db
+
+    try:
+        db.get_db().client.drop_database(db_name)
+    except Exception as e:
+        print(f"Could not drop benchmark database {db_name}: {e}", file=sys.stderr)
+
+
+def peak_rss_mb() -> dict[str, float]:
+    """Peak resident set size of this process and of finished child processes (e.g. OCR workers)."""
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / (1024 * 1024)
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+def stage_table(timings: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """p50/p95/mean (ms) per stage over the claims that ran it, slowest p95 first."""
+    samples: dict[str, list[float]] = {"total": []}
+    for t in timings:
+        samples["total"].append(t["total_ms"])
+        for stage, ms in t.get("stages_ms", {}).items():
+            samples.setdefault(stage, []).append(ms)
+    rows = []
+    for stage, values in samples.items():
+        if not values:
+            continue
+        arr = np.asarray(values)
+        p50, p95 = np.quantile(arr, (0.5, 0.95))
+        rows.append({
+            "stage": stage,
+            "claims": int(arr.size),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "mean_ms": round(float(arr.mean()), 1),
+        })
+    return sorted(rows, key=lambda r: -r["p95_ms"])
+
+
+def run(paths: list[str], concurrency: int) -> dict[str, Any]:
+    """Verify every file with a thread pool; returns throughput, outcomes and stage latency."""
+    from services.pipeline import run_verification
+
+    def verify(path: str) -> dict[str, Any]:
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        try:
+            return run_verification(file_bytes, os.path.basename(path))
+        except Exception as e:
+            return {"success": False, "error": f"{e.__class__.__name__}: {e}"}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(verify, paths))
+    elapsed = time.perf_counter() - start
+
+    outcomes: dict[str, int] = {}
+    errors: dict[str, int] = {}
+    for r in results:
+        outcome = r.get("status") if r.get("success") else "error"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if outcome == "error":
+            errors[str(r.get("error"))[:120]] = errors.get(str(r.get("error"))[:120], 0) + 1
+    timings = [r["timings"] for r in results if r.get("timings")]
+    tokens = {
+        kind: int(sum(t.get("tokens", {}).get(kind, 0) for t in timings)) for kind in ("prompt", "completion")
+    }
+    return {
+        "claims": len(paths),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "claims_per_s": round(len(paths) / elapsed, 3) if elapsed > 0 else None,
+        "outcomes": outcomes,
+        "errors": errors,
+        "tokens": tokens,
+        "retries": int(sum(t.get("retries", 0) for t in timings)),
+        "stages": stage_table(timings),
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(
+        f"{report['claims']} claims in {report['elapsed_s']}s with {report['concurrency']} threads: "
+        f"{report['claims_per_s']} claims/s, peak RSS {report['peak_rss_mb']['self']} MB"
+        f" (children {report['peak_rss_mb']['children']} MB)"
+    )
+    print("Outcomes:", ", ".join(f"{k}={v}" for k, v in sorted(report["outcomes"].items())))
+    for error, n in report["errors"].items():
+        print(f"  {n} x {error}")
+    print(f"OpenAI: {report.get('openai_requests', {})}, tokens {report['tokens']}, retries {report['retries']}")
+    print(f"\n{'stage':<32}{'claims':>8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for row in report["stages"]:
+        print(f"{row['stage']:<32}{row['claims']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['mean_ms']:>10}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claims", type=int, default=100, help="Synthetic claims to generate")
+    parser.add_argument("--kinds", type=parse_kinds, default=KINDS, help=f"Comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--dup-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", default=None, help="Directory or manifest of existing PDFs instead of generating")
+    parser.add_argument("--concurrency", type=int, default=4, help="Claims verified in parallel")
+    parser.add_argument("--mongo", default="memory", help='"memory" (mongomock) or a MongoDB URI')
+    parser.add_argument("--keep-db", action="store_true", help="Do not drop the benchmark database afterwards")
+    parser.add_argument("--openai-url", default=None, help="Use an already running bench.fake_openai server")
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake OpenAI requests answered 429")
+    parser.add_argument("--azure-ocr", action="store_true", help="OCR scanned pages through the fake vision endpoint")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.openai_url is None:
+        server = FakeOpenAIServer(
+            chat_latency_ms=args.chat_latency_ms,
+            embedding_latency_ms=args.embedding_latency_ms,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        ).start()
+    db_name = f"claim_bench_{int(time.time())}"
+    _configure(args.openai_url or server.url, args.mongo, db_name, args)
+    if args.mongo == "memory":
+        _use_memory_db(db_name)
+
+    from services.ingest import iter_sources
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="claim_bench_") as tmp:
+            if args.corpus:
+                paths = list(iter_sources(args.corpus))
+            else:
+                paths = generate(tmp, args.claims, args.kinds, args.dup_rate, args.seed)
+            report = run(paths, args.concurrency)
+        report["peak_rss_mb"] = peak_rss_mb()
+        if server is not None:
+            report["openai_requests"] = dict(server.stats)
+    finally:
+        if server is not None:
+            server.stop()
+        if args.mongo != "memory" and not args.keep_db:
+            _drop_db(db_name)
+
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
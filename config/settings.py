@@ -13,6 +13,41 @@ class Settings:
     MONGODB_URI: str = os.getenv("MONGODB_URI", "")
     MONGODB_DB_NAME: str = os.getenv("MONGODB_DB_NAME", "claim_db")
     MONGODB_CLAIMS_COLLECTION: str = os.getenv("MONGODB_CLAIMS_COLLECTION", "claims")
+    MONGODB_EXTRACTION_CACHE_COLLECTION: str = os.getenv(
+        "MONGODB_EXTRACTION_CACHE_COLLECTION", "extraction_cache"
+    )
+    MONGODB_EMBEDDING_CACHE_COLLECTION: str = os.getenv(
+        "MONGODB_EMBEDDING_CACHE_COLLECTION", "embedding_cache"
+    )
+    # Create the claims indexes on first connection (disable for read-only users)
+    MONGODB_ENSURE_INDEXES: bool = os.getenv("MONGODB_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+    # Extracted text and per-page OCR, one document per claim_id (kept out of the claims documents)
+    MONGODB_CLAIM_TEXT_COLLECTION: str = os.getenv("MONGODB_CLAIM_TEXT_COLLECTION", "claim_texts")
+    # Dashboard page / status-count result cache (seconds, entries); saves in-process clear it
+    DASHBOARD_CACHE_TTL_S: float = float(os.getenv("DASHBOARD_CACHE_TTL_S", "15"))
+    DASHBOARD_CACHE_SIZE: int = int(os.getenv("DASHBOARD_CACHE_SIZE", "256"))
+    # Dashboard exports: largest file offered as a browser download (MB; bigger ones via
+    # `python -m services.maintenance export`), and age (s) after which undownloaded files are deleted
+    EXPORT_DOWNLOAD_MAX_MB: float = float(os.getenv("EXPORT_DOWNLOAD_MAX_MB", "200"))
+    EXPORT_TTL_S: float = float(os.getenv("EXPORT_TTL_S", "3600"))
+    # Per-year claim ID sequences (atomic $inc allocation)
+    MONGODB_COUNTERS_COLLECTION: str = os.getenv("MONGODB_COUNTERS_COLLECTION", "counters")
+
+    # Background verification jobs, opt-in: the submit page enqueues and `python -m services.jobs`
+    # workers (which must be running) verify. Disabled = verification runs in the Streamlit session
+    JOB_QUEUE_ENABLED: bool = os.getenv("JOB_QUEUE_ENABLED", "false").lower() in ("true", "1", "yes")
+    MONGODB_JOBS_COLLECTION: str = os.getenv("MONGODB_JOBS_COLLECTION", "jobs")
+    # Waiting jobs per lane (counting higher-priority lanes) before enqueue is refused
+    JOB_QUEUE_MAX: int = int(os.getenv("JOB_QUEUE_MAX", "200"))
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    # Worker lease (s, renewed while running), attempts per job, poll interval (s), result retention (s)
+    JOB_LEASE_S: float = float(os.getenv("JOB_LEASE_S", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+    JOB_POLL_INTERVAL_S: float = float(os.getenv("JOB_POLL_INTERVAL_S", "1.0"))
+    JOB_RESULT_TTL_S: int = int(os.getenv("JOB_RESULT_TTL_S", "86400"))
+    # Multi-file uploads: files per batch, and files verified at once when running inline
+    BATCH_MAX_FILES: int = int(os.getenv("BATCH_MAX_FILES", "50"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
 
     # Azure OpenAI
     AZURE_OPENAI_API_KEY: str = os.getenv("AZURE_OPENAI_API_KEY", "")
@@ -23,14 +58,85 @@ class Settings:
         "AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002"
     )
 
+    # Shared OpenAI HTTP client: per-call timeouts (s), retries on 429/5xx, keep-alive pool
+    OPENAI_TIMEOUT_S: float = float(os.getenv("OPENAI_TIMEOUT_S", "60"))
+    OPENAI_VISION_TIMEOUT_S: float = float(os.getenv("OPENAI_VISION_TIMEOUT_S", "120"))
+    OPENAI_CONNECT_TIMEOUT_S: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "10"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+    OPENAI_POOL_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "20"))
+    OPENAI_KEEPALIVE_EXPIRY_S: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "60"))
+
+    # Embedding cache keyed by (deployment, input hash): persistent tier "mongo" or "none"
+    EMBEDDING_CACHE_BACKEND: str = os.getenv("EMBEDDING_CACHE_BACKEND", "mongo")
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+    # Batched embedding requests: max inputs and characters per request, requests in flight
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+    EMBEDDING_BATCH_MAX_CHARS: int = int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "200000"))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+    # Stored claim embeddings: "none" (float32 only) or "int8" (also store an int8 copy;
+    # the in-memory index then holds int8 and exactly re-scores this many top candidates)
+    EMBEDDING_QUANTIZATION: str = os.getenv("EMBEDDING_QUANTIZATION", "none")
+    EMBEDDING_RESCORE_CANDIDATES: int = int(os.getenv("EMBEDDING_RESCORE_CANDIDATES", "32"))
+    # In-memory index refresh re-reads claims whose _id is up to this many seconds older than
+    # the newest loaded one (client-generated _ids from other processes can commit late)
+    VECTOR_INDEX_REFRESH_OVERLAP_S: float = float(os.getenv("VECTOR_INDEX_REFRESH_OVERLAP_S", "300"))
+
+    # Classify the document and extract key fields in one LLM call instead of two
+    COMBINED_CLASSIFY_EXTRACT: bool = os.getenv("COMBINED_CLASSIFY_EXTRACT", "false").lower() in ("true", "1", "yes")
+    # Key fields come from the regex field scanner when every field scores at least this
+    # (0-1); below it the LLM extracts them. Above 1 = always use the LLM
+    FIELD_SCANNER_MIN_CONFIDENCE: float = float(os.getenv("FIELD_SCANNER_MIN_CONFIDENCE", "0.8"))
+
+    # Pipeline metrics: latency window per stage, Prometheus endpoint port (0 = off),
+    # and optional USD prices per 1K tokens for cost estimates (0 = not tracked)
+    METRICS_WINDOW: int = int(os.getenv("METRICS_WINDOW", "2048"))
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    CHAT_COST_PER_1K_PROMPT_TOKENS: float = float(os.getenv("CHAT_COST_PER_1K_PROMPT_TOKENS", "0"))
+    CHAT_COST_PER_1K_COMPLETION_TOKENS: float = float(os.getenv("CHAT_COST_PER_1K_COMPLETION_TOKENS", "0"))
+    EMBEDDING_COST_PER_1K_TOKENS: float = float(os.getenv("EMBEDDING_COST_PER_1K_TOKENS", "0"))
+
     # Similarity threshold (treat as potential duplicate above this %)
     DUPLICATION_THRESHOLD_PCT: float = float(os.getenv("DUPLICATION_THRESHOLD_PCT", "70"))
 
+    # Persistent IVF ANN index for duplicate search (empty = in-memory brute-force index)
+    ANN_INDEX_DIR: str = os.getenv("ANN_INDEX_DIR", "")
+    ANN_NPROBE: int = int(os.getenv("ANN_NPROBE", "8"))
+    # Number of IVF lists at build time (0 = auto, ~4*sqrt(n))
+    ANN_NLIST: int = int(os.getenv("ANN_NLIST", "0"))
+
     # OCR: use Azure vision (gpt-4o-mini) for image PDFs when True; else Tesseract
     USE_AZURE_OCR: bool = os.getenv("USE_AZURE_OCR", "false").lower() in ("true", "1", "yes")
 
+    # Azure vision OCR: page requests in flight, per-page retries, and payload shrinking
+    AZURE_OCR_CONCURRENCY: int = int(os.getenv("AZURE_OCR_CONCURRENCY", "4"))
+    AZURE_OCR_PAGE_RETRIES: int = int(os.getenv("AZURE_OCR_PAGE_RETRIES", "1"))
+    AZURE_OCR_IMAGE_FORMAT: str = os.getenv("AZURE_OCR_IMAGE_FORMAT", "jpeg")
+    AZURE_OCR_JPEG_QUALITY: int = int(os.getenv("AZURE_OCR_JPEG_QUALITY", "85"))
+    # Longest image side in pixels sent to the model (0 = no downscaling)
+    AZURE_OCR_MAX_DIM: int = int(os.getenv("AZURE_OCR_MAX_DIM", "2048"))
+
     # OCR language(s) for image-only PDFs (e.g. "eng", "hin+eng" for Hindi+English)
     TESSERACT_LANG: str = os.getenv("TESSERACT_LANG", "eng")
 
+    # Text-layer engines tried in order before OCR, each capped in time (s) and memory growth (MB)
+    EXTRACT_TEXT_ENGINES: str = os.getenv("EXTRACT_TEXT_ENGINES", "pypdf,pdfplumber")
+    EXTRACT_ENGINE_TIMEOUT_S: float = float(os.getenv("EXTRACT_ENGINE_TIMEOUT_S", "60"))
+    EXTRACT_ENGINE_MAX_MEMORY_MB: int = int(os.getenv("EXTRACT_ENGINE_MAX_MEMORY_MB", "1024"))
+
+    # Tesseract OCR: worker processes (0 = one per core), per-document page and time budget
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "0"))
+    OCR_MAX_PAGES: int = int(os.getenv("OCR_MAX_PAGES", "100"))
+    OCR_TIME_BUDGET_S: float = float(os.getenv("OCR_TIME_BUDGET_S", "300"))
+
+    # PDF extraction cache keyed by file SHA-256: persistent tier "mongo", "disk" or "none"
+    EXTRACTION_CACHE_BACKEND: str = os.getenv("EXTRACTION_CACHE_BACKEND", "mongo")
+    EXTRACTION_CACHE_DIR: str = os.getenv("EXTRACTION_CACHE_DIR", ".cache/extraction")
+    # In-process LRU entries
+    EXTRACTION_CACHE_SIZE: int = int(os.getenv("EXTRACTION_CACHE_SIZE", "256"))
+    # Entry lifetime in all tiers (Mongo: TTL index on created_at)
+    EXTRACTION_CACHE_TTL_S: float = float(os.getenv("EXTRACTION_CACHE_TTL_S", "2592000"))
+
 
 settings = Settings()
@@ -1,55 +1,244 @@
 """
-Submit Claim — Upload PDF and run verification pipeline.
+Submit Claim — Upload one or more PDFs and queue them for verification (or run inline without the job queue).
 """
 import streamlit as st
 from datetime import datetime, timezone
 
+from config import settings
+from services import metrics
+
 st.set_page_config(page_title="Submit Claim | Claim Verifier", page_icon="📤", layout="wide")
 
+# Opened directly (not via the home page): start the metrics endpoint here too; no-op if running
+metrics.serve_metrics()
+
 st.markdown("## 📤 Submit Claim")
-st.caption("Upload a claim document (PDF). We'll check for duplicates and extract key differences.")
+st.caption(
+    "Upload claim documents (PDF), one or a whole bundle. We'll check for duplicates — against stored claims"
+    " and within the bundle — and extract key differences."
+)
+
+_STATUS_LABELS = {
+    "pending": "⏳ Pending",
+    "queued": "⏳ Queued",
+    "running": "⚙️ Verifying",
+    "done": "✅ Done",
+    "failed": "❌ Failed",
+}
+
+
+def show_result(result: dict) -> None:
+    if not result.get("success"):
+        st.error(result.get("error", "Verification failed."))
+        return
+
+    claim_id = result.get("claim_id")
+    status = result.get("status", "").lower()
+    compared_with = result.get("compared_with")
+    duplication_pct = result.get("duplication_pct", 0)
+    key_differences = result.get("key_differences", "")
+    rejection_reason = result.get("rejection_reason", "")
+
+    st.success(f"Claim saved as **{claim_id}**.")
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Status", status.capitalize())
+    c2.metric("Duplication %", f"{duplication_pct}%" if compared_with else "—")
+    c3.metric("Compared with", compared_with or "—")
+
+    if key_differences:
+        with st.expander("Key differences", expanded=True):
+            st.write(key_differences)
+    if rejection_reason:
+        st.info(f"**Rejection reason:** {rejection_reason}")
+
+    timings = result.get("timings")
+    if timings:
+        with st.expander(f"Timing breakdown ({timings['total_ms'] / 1000:.1f}s)"):
+            st.dataframe(
+                [{"Stage": k, "ms": v} for k, v in timings["stages_ms"].items()],
+                width="stretch",
+                hide_index=True,
+            )
+            tokens = timings.get("tokens", {})
+            st.caption(
+                f"Tokens: {tokens.get('prompt', 0)} prompt / {tokens.get('completion', 0)} completion"
+                f" · Retries: {timings.get('retries', 0)}"
+                + (f" · Est. cost: ${timings['cost_usd']:.4f}" if "cost_usd" in timings else "")
+            )
+
+    st.markdown("---")
+    st.caption(f"Completed at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}. View all claims on the **Dashboard**.")
+
+
+def show_finished_job(job: dict) -> None:
+    if job["status"] == "done":
+        show_result(job["result"])
+    else:
+        st.error(f"Verification of **{job.get('filename') or 'document'}** failed: {job.get('error') or 'unknown error'}")
+
+
+@st.fragment(run_every=settings.JOB_POLL_INTERVAL_S)
+def job_status(job_id: str) -> None:
+    """Polls the job until it finishes; only this fragment reruns while waiting."""
+    from services.jobs import DONE, FAILED, QUEUED, active_workers, get_job
 
-uploaded = st.file_uploader("Choose a PDF file", type=["pdf"], help="Supported: PDF with readable text")
+    job = get_job(job_id)
+    if job is None:
+        st.warning("This verification job was not found (finished jobs are kept for a limited time).")
+        return
+    if job["status"] in (DONE, FAILED):
+        # A full rerun renders the result without the fragment's poll timer
+        st.session_state["finished_job"] = job
+        st.rerun()
+    name = job.get("filename") or "document"
+    if job["status"] == QUEUED:
+        st.info(f"⏳ **{name}** is queued for verification (position {job['position']}).")
+        if not active_workers():
+            st.warning("No verification workers are running. Start them with `python -m services.jobs`.")
+    else:
+        attempt = f" (attempt {job['attempts']})" if job.get("attempts", 1) > 1 else ""
+        st.info(f"⚙️ Verifying **{name}**{attempt}: extracting text, comparing with existing claims…")
 
-if uploaded is not None:
-    file_bytes = uploaded.read()
-    filename = uploaded.name or "document.pdf"
 
-    if st.button("Verify claim", type="primary", width="content"):
-        with st.spinner("Extracting text, comparing with existing claims, and running verification…"):
+def batch_rows(jobs: list[dict]) -> list[dict]:
+    """One table row per file: job status plus the verification outcome once finished."""
+    rows = []
+    for job in jobs:
+        result = job.get("result") or {}
+        status = job["status"]
+        if status == "done" and not result.get("success"):
+            status = "failed"
+        rows.append({
+            "File": job.get("filename") or "document",
+            "Status": _STATUS_LABELS.get(status, status),
+            "Claim ID": result.get("claim_id") or "—",
+            "Outcome": (result.get("status") or "—").capitalize() if result.get("success") else "—",
+            "Duplication %": result.get("duplication_pct") if result.get("compared_with") else None,
+            "Compared with": result.get("compared_with") or "—",
+            "Details": job.get("error") or result.get("error") or result.get("rejection_reason")
+            or result.get("key_differences") or "",
+        })
+    return rows
+
+
+def show_batch(jobs: list[dict], table=None) -> None:
+    """Progress, outcome counts and the per-file table (into the table placeholder when given)."""
+    finished = [j for j in jobs if j["status"] in ("done", "failed")]
+    outcomes: dict[str, int] = {}
+    for job in finished:
+        result = job.get("result") or {}
+        key = result.get("status", "failed") if result.get("success") else "failed"
+        outcomes[key] = outcomes.get(key, 0) + 1
+    container = table.container() if table is not None else st.container()
+    with container:
+        st.progress(len(finished) / max(1, len(jobs)), text=f"{len(finished)} of {len(jobs)} files verified")
+        cols = st.columns(4)
+        for col, key in zip(cols, ("accepted", "flagged", "rejected", "failed")):
+            col.metric(key.capitalize(), outcomes.get(key, 0))
+        st.dataframe(batch_rows(jobs), width="stretch", hide_index=True)
+
+
+@st.fragment(run_every=settings.JOB_POLL_INTERVAL_S)
+def batch_status(batch_id: str) -> None:
+    """Polls the batch's jobs until every file has finished."""
+    from services.jobs import active_workers, get_batch
+
+    jobs = get_batch(batch_id)
+    if not jobs:
+        st.warning("This upload batch was not found (finished jobs are kept for a limited time).")
+        return
+    if all(j["status"] in ("done", "failed") for j in jobs):
+        st.session_state["finished_batch"] = {"batch_id": batch_id, "jobs": jobs}
+        st.rerun()
+    show_batch(jobs)
+    if not active_workers():
+        st.warning("No verification workers are running. Start them with `python -m services.jobs`.")
+
+
+uploaded = st.file_uploader(
+    "Choose PDF files",
+    type=["pdf"],
+    accept_multiple_files=True,
+    help=f"Supported: PDF with readable text. Up to {settings.BATCH_MAX_FILES} files at once.",
+)
+
+if uploaded:
+    if len(uploaded) > settings.BATCH_MAX_FILES:
+        st.warning(f"Please upload at most {settings.BATCH_MAX_FILES} files at a time ({len(uploaded)} selected).")
+        st.stop()
+    files = [(f.getvalue(), f.name or "document.pdf") for f in uploaded]
+    label = "Verify claim" if len(files) == 1 else f"Verify {len(files)} claims"
+
+    if st.button(label, type="primary", width="content"):
+        if settings.JOB_QUEUE_ENABLED:
             try:
-                from services.pipeline import run_verification
-                result = run_verification(file_bytes, filename)
+                from services.jobs import QueueFullError, enqueue_batch, enqueue_job
+                if len(files) == 1:
+                    job_id = enqueue_job(*files[0], lane="interactive")
+                else:
+                    batch_id = enqueue_batch(files, lane="default")
+            except QueueFullError:
+                st.warning("The verification queue is full right now. Please try again in a minute.")
+                st.stop()
             except ValueError as e:
                 st.error(f"Configuration error: {e}. Please set MONGODB_URI and Azure OpenAI keys in `.env`.")
                 st.stop()
             except Exception as e:
                 st.exception(e)
                 st.stop()
-
-        if not result.get("success"):
-            st.error(result.get("error", "Verification failed."))
+            # In the URL, so a refresh keeps following the job / batch
+            if len(files) == 1:
+                st.query_params.pop("batch", None)
+                st.query_params["job"] = job_id
+            else:
+                st.query_params.pop("job", None)
+                st.query_params["batch"] = batch_id
+            st.session_state.pop("finished_job", None)
+            st.session_state.pop("finished_batch", None)
+        elif len(files) == 1:
+            with st.spinner("Extracting text, comparing with existing claims, and running verification…"):
+                try:
+                    from services.pipeline import run_verification
+                    result = run_verification(*files[0])
+                except ValueError as e:
+                    st.error(f"Configuration error: {e}. Please set MONGODB_URI and Azure OpenAI keys in `.env`.")
+                    st.stop()
+                except Exception as e:
+                    st.exception(e)
+                    st.stop()
+            show_result(result)
             st.stop()
+        else:
+            from services.pipeline import verify_batch
 
-        claim_id = result.get("claim_id")
-        status = result.get("status", "").lower()
-        compared_with = result.get("compared_with")
-        duplication_pct = result.get("duplication_pct", 0)
-        key_differences = result.get("key_differences", "")
-        rejection_reason = result.get("rejection_reason", "")
-
-        st.success(f"Claim saved as **{claim_id}**.")
-
-        c1, c2, c3 = st.columns(3)
-        c1.metric("Status", status.capitalize())
-        c2.metric("Duplication %", f"{duplication_pct}%" if compared_with else "—")
-        c3.metric("Compared with", compared_with or "—")
-
-        if key_differences:
-            with st.expander("Key differences", expanded=True):
-                st.write(key_differences)
-        if rejection_reason:
-            st.info(f"**Rejection reason:** {rejection_reason}")
+            jobs = [{"filename": name, "status": "pending"} for _, name in files]
+            table = st.empty()
+            show_batch(jobs, table)
+            # Results stream in as each file finishes
+            for i, result in verify_batch(files):
+                jobs[i] = {"filename": files[i][1], "status": "done", "result": result}
+                show_batch(jobs, table)
+            st.stop()
 
-        st.markdown("---")
-        st.caption(f"Completed at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}. View all claims on the **Dashboard**.")
+job_id = st.query_params.get("job")
+batch_id = st.query_params.get("batch")
+if job_id:
+    finished = st.session_state.get("finished_job")
+    if finished and finished["job_id"] == job_id:
+        show_finished_job(finished)
+    else:
+        try:
+            job_status(job_id)
+        except Exception as e:
+            st.exception(e)
+elif batch_id:
+    finished = st.session_state.get("finished_batch")
+    if finished and finished["batch_id"] == batch_id:
+        show_batch(finished["jobs"])
+        st.caption("View all claims on the **Dashboard**.")
+    else:
+        try:
+            batch_status(batch_id)
+        except Exception as e:
+            st.exception(e)
@@ -1,65 +1,144 @@
 """
-Dashboard — List claims, filter by status, see rejection reasons, export to Excel.
+Dashboard — List claims, filter by status, see rejection reasons, export to Excel/CSV/Parquet.
 """
+import os
+
 import streamlit as st
 import pandas as pd
-from io import BytesIO
 
 st.set_page_config(page_title="Dashboard | Claim Verifier", page_icon="📊", layout="wide")
 
 st.markdown("## 📊 Verification Dashboard")
-st.caption("View all claims, filter by status, and see why claims were rejected. Export to Excel below.")
+st.caption("View all claims, filter by status, and see why claims were rejected. Export to Excel, CSV or Parquet below.")
 
 try:
-    from services.db import list_claims
+    from services.db import DASHBOARD_FIELDS, count_claims_by_status, get_claim_text, list_claims_page
+    from config import settings
+    from services.export import FORMATS as EXPORT_FORMATS, available_formats, export_claims, sweep_exports
 except Exception as e:
     st.error(f"Cannot connect to database: {e}. Check MONGODB_URI in `.env`.")
     st.stop()
 
-status_filter = st.selectbox(
-    "Filter by status",
-    options=["All", "accepted", "rejected", "flagged"],
-    index=0,
-)
-limit = st.number_input("Max rows", min_value=10, max_value=500, value=100, step=10)
+# Status counts (one aggregation, cached briefly)
+counts = count_claims_by_status()
+m_total, m_acc, m_rej, m_flag = st.columns(4)
+m_total.metric("Total claims", sum(counts.values()))
+m_acc.metric("Accepted", counts.get("accepted", 0))
+m_rej.metric("Rejected", counts.get("rejected", 0))
+m_flag.metric("Flagged", counts.get("flagged", 0))
+
+f_col, s_col = st.columns([3, 1])
+with f_col:
+    status_filter = st.selectbox(
+        "Filter by status",
+        options=["All", "accepted", "rejected", "flagged"],
+        index=0,
+    )
+with s_col:
+    page_size = st.selectbox("Rows per page", options=[25, 50, 100, 200], index=1)
 
 q_status = None if status_filter == "All" else status_filter
-rows = list_claims(status=q_status, limit=limit, exclude_large_fields=True)
+
+# Keyset pagination: keep the cursor of every page visited so "Previous" can go back
+view = (q_status, page_size)
+if st.session_state.get("dash_view") != view:
+    st.session_state.dash_view = view
+    st.session_state.dash_cursors = [None]
+cursors = st.session_state.dash_cursors
+rows, next_cursor = list_claims_page(status=q_status, page_size=page_size, after=cursors[-1])
 
 if not rows:
     st.info("No claims found. Submit a claim from the **Submit Claim** page.")
     st.stop()
 
-# Normalize for display (created_at, _id)
-def row_to_dict(r):
-    d = {
-        "Claim ID": r.get("claim_id", ""),
-        "Compared With": r.get("compared_with") or "—",
-        "Duplication %": r.get("duplication_pct") if r.get("duplication_pct") is not None else "—",
-        "Key Differences": r.get("key_differences") or "—",
-        "Status": (r.get("status") or "").capitalize(),
-        "Rejection Reason": r.get("rejection_reason") or "—",
-    }
-    ct = r.get("created_at")
-    if ct:
-        d["Created"] = ct.strftime("%Y-%m-%d %H:%M") if hasattr(ct, "strftime") else str(ct)
-    else:
-        d["Created"] = "—"
-    return d
-
-df = pd.DataFrame([row_to_dict(r) for r in rows])
+# Columns projected by the query go straight into the frame; formatting is vectorized
+df = pd.DataFrame(rows, columns=list(DASHBOARD_FIELDS))
+created = pd.to_datetime(df["created_at"], errors="coerce")
+df["created_at"] = created.dt.strftime("%Y-%m-%d %H:%M")
+df["duplication_pct"] = pd.to_numeric(df["duplication_pct"], errors="coerce").astype("string")
+df["status"] = df["status"].fillna("").str.capitalize()
+df = df.rename(columns={
+    "claim_id": "Claim ID",
+    "compared_with": "Compared With",
+    "duplication_pct": "Duplication %",
+    "key_differences": "Key Differences",
+    "status": "Status",
+    "rejection_reason": "Rejection Reason",
+    "created_at": "Created",
+})
+df = df.replace("", None).fillna("—")
 
 st.dataframe(df, width="stretch", hide_index=True)
 
-# Excel export
-buffer = BytesIO()
-df.to_excel(buffer, index=False, sheet_name="Claims")
-buffer.seek(0)
-
-st.download_button(
-    label="📥 Download as Excel",
-    data=buffer,
-    file_name=f"claim_verification_{pd.Timestamp.now().strftime('%Y%m%d_%H%M')}.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    width="content",
-)
+prev_col, page_col, next_col = st.columns([1, 2, 1])
+with prev_col:
+    if st.button("← Previous", disabled=len(cursors) == 1, key="dash_prev"):
+        cursors.pop()
+        st.rerun()
+with page_col:
+    st.caption(f"Page {len(cursors)}")
+with next_col:
+    if st.button("Next →", disabled=next_cursor is None, key="dash_next"):
+        cursors.append(next_cursor)
+        st.rerun()
+
+# Extracted text is stored separately and loaded only on request
+with st.expander("📄 View extracted text"):
+    claim_ids = [r.get("claim_id") for r in rows if r.get("claim_id")]
+    picked = st.selectbox("Claim", options=claim_ids, key="text_claim_id")
+    if picked and st.button("Load text", key="load_text"):
+        text = get_claim_text(picked)
+        st.text_area("Extracted text", value=text or "(No text stored for this claim.)", height=300, disabled=True)
+
+# Full export: streamed from MongoDB to a temp file (same status filter), then offered for download
+st.markdown("#### 📥 Export")
+fmt_col, btn_col = st.columns([1, 3])
+with fmt_col:
+    export_fmt = st.selectbox("Format", options=available_formats(), index=0, key="export_fmt")
+with btn_col:
+    st.write("")
+    prepare = st.button(f"Prepare {status_filter.lower()} claims export", key="export_prepare")
+if prepare:
+    old = st.session_state.pop("export_file", None)
+    if old and os.path.exists(old[0]):
+        os.unlink(old[0])
+    # Exports other sessions prepared but never downloaded
+    sweep_exports()
+    try:
+        with st.spinner("Exporting…"):
+            path, n_rows = export_claims(export_fmt, status=q_status)
+        st.session_state.export_file = (path, export_fmt, n_rows)
+    except Exception as e:
+        st.error(f"Export failed: {e}")
+export_file = st.session_state.get("export_file")
+
+
+def _read_and_delete(path: str) -> bytes:
+    # Deferred: runs once, when the button is clicked; the temp file is not needed afterwards
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if export_file and os.path.exists(export_file[0]):
+    path, fmt, n_rows = export_file
+    size_mb = os.path.getsize(path) / 1e6
+    if size_mb > settings.EXPORT_DOWNLOAD_MAX_MB:
+        os.unlink(path)
+        st.session_state.pop("export_file", None)
+        st.warning(
+            f"The export is {size_mb:.0f} MB, above the {settings.EXPORT_DOWNLOAD_MAX_MB:.0f} MB browser download"
+            f" limit. Run `python -m services.maintenance export --format {fmt} --out <file>` on the server instead."
+        )
+    else:
+        st.download_button(
+            label=f"📥 Download {n_rows} claims ({fmt}, {size_mb:.1f} MB)",
+            data=lambda: _read_and_delete(path),
+            file_name=f"claim_verification_{pd.Timestamp.now().strftime('%Y%m%d_%H%M')}.{fmt}",
+            mime=EXPORT_FORMATS[fmt],
+            on_click="ignore",
+            width="content",
+        )
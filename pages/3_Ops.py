@@ -0,0 +1,71 @@
+"""
+Ops — Per-stage latency (p50/p95), token usage, cost, retries and cache hit rates.
+"""
+import streamlit as st
+import pandas as pd
+
+st.set_page_config(page_title="Ops | Claim Verifier", page_icon="⏱️", layout="wide")
+
+st.markdown("## ⏱️ Pipeline Ops")
+st.caption("Where verification time goes: per-stage latency, LLM tokens and cost, retries and cache hits.")
+
+try:
+    from services import metrics
+    from services.db import list_claim_timings
+except Exception as e:
+    st.error(f"Cannot load services: {e}")
+    st.stop()
+
+# --- Recent claims (timings saved on each claim, so this covers every process) ---
+st.markdown("#### Recent claims")
+sample = st.selectbox("Claims sampled", options=[100, 500, 2000], index=1)
+try:
+    docs = list_claim_timings(limit=sample)
+except Exception as e:
+    st.error(f"Cannot connect to database: {e}. Check MONGODB_URI in `.env`.")
+    docs = []
+
+if docs:
+    timings = [d["timings"] for d in docs]
+    stages = pd.DataFrame([{**t.get("stages_ms", {}), "total": t.get("total_ms")} for t in timings])
+    summary = pd.DataFrame({
+        "Claims": stages.count(),
+        "p50 ms": stages.quantile(0.5),
+        "p95 ms": stages.quantile(0.95),
+        "Mean ms": stages.mean(),
+    }).round(1).sort_values("p95 ms", ascending=False)
+    st.dataframe(summary, width="stretch")
+
+    tokens = pd.DataFrame([t.get("tokens", {}) for t in timings]).fillna(0)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Prompt tokens / claim", f"{tokens.get('prompt', pd.Series([0])).mean():.0f}")
+    c2.metric("Completion tokens / claim", f"{tokens.get('completion', pd.Series([0])).mean():.0f}")
+    c3.metric("Retries", int(sum(t.get("retries", 0) for t in timings)))
+    costs = [t["cost_usd"] for t in timings if "cost_usd" in t]
+    c4.metric("Cost / claim", f"${sum(costs) / len(costs):.4f}" if costs else "—")
+else:
+    st.info("No claims with timings yet. Submit a claim from the **Submit Claim** page.")
+
+# --- This server process (sliding window) ---
+st.markdown("#### This process")
+rows = metrics.stage_summary()
+if rows:
+    st.dataframe(
+        pd.DataFrame(rows).drop(columns=["sum_s"]).rename(columns={
+            "stage": "Stage", "count": "Calls", "p50_ms": "p50 ms", "p95_ms": "p95 ms", "mean_ms": "Mean ms",
+        }),
+        width="stretch",
+        hide_index=True,
+    )
+    counters = metrics.counters()
+    cache = counters["cache"]
+    cols = st.columns(3)
+    for col, name in zip(cols, ("extraction", "embedding")):
+        hits, misses = cache.get(f"{name}:hit", 0), cache.get(f"{name}:miss", 0)
+        col.metric(f"{name.capitalize()} cache hit rate", f"{hits / (hits + misses):.0%}" if hits + misses else "—")
+    cols[2].metric("OpenAI cost (est.)", f"${counters['cost_usd']:.4f}")
+else:
+    st.info("No verifications have run in this server process yet.")
+
+with st.expander("Prometheus metrics"):
+    st.code(metrics.prometheus_text(), language="text")
@@ -1,7 +1,7 @@
 from .db import get_db, save_claim, list_claims
-from .extraction import extract_text_from_pdf
-from .embeddings import get_embedding
-from .similarity import find_most_similar_claim, cosine_similarity
+from .extraction import extract_text_from_pdf, extract_pdf
+from .embeddings import get_embedding, get_embeddings
+from .similarity import find_most_similar_claim, cosine_similarity, search_similar_claims
 from .diff_extractor import extract_key_fields, compute_differences
 from .agent import get_verdict_and_reason
 
@@ -10,9 +10,12 @@ __all__ = [
     "save_claim",
     "list_claims",
     "extract_text_from_pdf",
+    "extract_pdf",
     "get_embedding",
+    "get_embeddings",
     "find_most_similar_claim",
     "cosine_similarity",
+    "search_similar_claims",
     "extract_key_fields",
     "compute_differences",
     "get_verdict_and_reason",
@@ -2,19 +2,27 @@ import json
 import logging
 from typing import Any
 
-from openai import AzureOpenAI
-
 from config import settings
 
+from .openai_client import acall_with_retries, call_with_retries, get_async_client, get_client
+
 logger = logging.getLogger(__name__)
 
+_CLASSIFY_SYSTEM = """You are a document classifier. Determine if this document is an INSURANCE/CLAIM document (e.g. claim form, health claim, motor claim, policy claim, reimbursement claim). It must be a claim-related form or request, not a resume/CV, invoice, contract, or other document type. Reply with valid JSON only, no markdown: {"is_claim": true or false, "reason": "one short sentence"}"""
 
-def _client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION,
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT.rstrip("/"),
-    )
+_EXTRACT_SYSTEM = """You are a claim data extractor. From the given document text (which may be in any language: English, Hindi, Tamil, etc.), extract these key fields. Preserve original values as they appear. Use null for missing. Output valid JSON only, no markdown. Use exactly these keys: claimant_name, policy_number, claim_amount, incident_date. Example: {"claimant_name": "Rohan Sharma", "policy_number": "HL-99871234", "claim_amount": "82,450", "incident_date": "05/02/2026"}"""
+
+_COMBINED_SYSTEM = """You are a claim document classifier and data extractor. First decide if the document is an INSURANCE/CLAIM document (e.g. claim form, health claim, motor claim, policy claim, reimbursement claim); resumes/CVs, invoices, contracts and other document types are not claims. If it is a claim, extract these key fields from the text (which may be in any language: English, Hindi, Tamil, etc.), preserving original values as they appear; use null for missing fields or when it is not a claim. Output valid JSON only, no markdown, with exactly these keys: is_claim, reason, claimant_name, policy_number, claim_amount, incident_date. Example: {"is_claim": true, "reason": "Health insurance claim form.", "claimant_name": "Rohan Sharma", "policy_number": "HL-99871234", "claim_amount": "82,450", "incident_date": "05/02/2026"}"""
+
+_VERDICT_SYSTEM = """You are a claim verification assistant. Given duplication percentage and list of field differences between a new claim and an existing one, you must:
+1. Decide status: "accepted" (clearly new claim), "rejected" (duplicate or suspicious), or "flagged" (needs human review).
+2. Write a short "key_differences" line (one or two sentences) for Excel: e.g. "Claim amount changed from ₹1.2L to ₹1.5L; Incident date updated."
+3. Write "rejection_reason" only when status is rejected or flagged: explain in one sentence why (e.g. "Duplicate of existing claim with material change in amount."). If status is accepted, set rejection_reason to empty string.
+
+Respond with valid JSON only, no markdown:
+{"status": "accepted|rejected|flagged", "key_differences": "...", "rejection_reason": "..."}"""
+
+_CLAIM_FIELDS = ("claimant_name", "policy_number", "claim_amount", "incident_date")
 
 
 def _parse_json_response(content: str) -> dict:
@@ -25,6 +33,49 @@ def _parse_json_response(content: str) -> dict:
     return json.loads(content) if content else {}
 
 
+def _chat_kwargs(system: str, user: str, temperature: float) -> dict[str, Any]:
+    return {
+        "model": settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ],
+        "temperature": temperature,
+        "timeout": settings.OPENAI_TIMEOUT_S,
+    }
+
+
+def _chat(system: str, user: str, temperature: float, **extra: Any) -> str:
+    resp = call_with_retries(
+        get_client().chat.completions.create, **_chat_kwargs(system, user, temperature), **extra
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+async def _achat(system: str, user: str, temperature: float, **extra: Any) -> str:
+    resp = await acall_with_retries(
+        get_async_client().chat.completions.create, **_chat_kwargs(system, user, temperature), **extra
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+# --- Document classification ----------------------------------------------------
+
+
+def _classification_prompt(text: str) -> str:
+    # Truncate for the classification call
+    snippet = text.strip()[:6000]
+    return f"Document text:\n{snippet}\n\nIs this a claim document? Output JSON with is_claim and reason."
+
+
+def _parse_classification(content: str) -> dict[str, Any]:
+    out = _parse_json_response(content)
+    return {
+        "is_claim": bool(out.get("is_claim", False)),
+        "reason": str(out.get("reason", "")).strip() or "Classification completed.",
+    }
+
+
 def check_is_claim_document(text: str) -> dict[str, Any]:
     """
     Classify whether the document is a claim (insurance/health/motor/any claim form).
@@ -33,31 +84,37 @@ def check_is_claim_document(text: str) -> dict[str, Any]:
     """
     if not text or len(text.strip()) < 20:
         return {"is_claim": False, "reason": "Document text too short to classify."}
-    # Truncate for the classification call
-    snippet = text.strip()[:6000]
-    system = """You are a document classifier. Determine if this document is an INSURANCE/CLAIM document (e.g. claim form, health claim, motor claim, policy claim, reimbursement claim). It must be a claim-related form or request, not a resume/CV, invoice, contract, or other document type. Reply with valid JSON only, no markdown: {"is_claim": true or false, "reason": "one short sentence"}"""
-    user = f"Document text:\n{snippet}\n\nIs this a claim document? Output JSON with is_claim and reason."
     try:
-        client = _client()
-        resp = client.chat.completions.create(
-            model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            temperature=0.1,
-        )
-        content = (resp.choices[0].message.content or "").strip()
-        out = _parse_json_response(content)
-        return {
-            "is_claim": bool(out.get("is_claim", False)),
-            "reason": str(out.get("reason", "")).strip() or "Classification completed.",
-        }
+        return _parse_classification(_chat(_CLASSIFY_SYSTEM, _classification_prompt(text), 0.1))
+    except Exception as e:
+        logger.warning("Claim document check failed: %s", e)
+        return {"is_claim": True, "reason": "Could not classify; allowing as claim."}
+
+
+async def check_is_claim_document_async(text: str) -> dict[str, Any]:
+    """Async variant of check_is_claim_document (same result and fallback)."""
+    if not text or len(text.strip()) < 20:
+        return {"is_claim": False, "reason": "Document text too short to classify."}
+    try:
+        return _parse_classification(await _achat(_CLASSIFY_SYSTEM, _classification_prompt(text), 0.1))
     except Exception as e:
         logger.warning("Claim document check failed: %s", e)
         return {"is_claim": True, "reason": "Could not classify; allowing as claim."}
 
 
+# --- Key field extraction ----------------------------------------------------------
+
+
+def _extraction_prompt(text: str) -> str:
+    snippet = text.strip()[:8000]
+    return f"Document text:\n{snippet}\n\nExtract the four fields. Output JSON only."
+
+
+def _normalize_fields(out: dict) -> dict[str, Any]:
+    """Normalize to our schema (string or None)."""
+    return {k: (str(out.get(k)).strip() if out.get(k) is not None else None) for k in _CLAIM_FIELDS}
+
+
 def extract_claim_fields_with_llm(text: str) -> dict[str, Any] | None:
     """
     Extract key claim fields from document text using LLM. Works in any language.
@@ -66,57 +123,83 @@ def extract_claim_fields_with_llm(text: str) -> dict[str, Any] | None:
     """
     if not text or len(text.strip()) < 10:
         return None
+    try:
+        return _normalize_fields(_parse_json_response(_chat(_EXTRACT_SYSTEM, _extraction_prompt(text), 0.1)))
+    except Exception as e:
+        logger.warning("LLM claim extraction failed: %s", e)
+        return None
+
+
+async def extract_claim_fields_with_llm_async(text: str) -> dict[str, Any] | None:
+    """Async variant of extract_claim_fields_with_llm (same result and fallback)."""
+    if not text or len(text.strip()) < 10:
+        return None
+    try:
+        content = await _achat(_EXTRACT_SYSTEM, _extraction_prompt(text), 0.1)
+        return _normalize_fields(_parse_json_response(content))
+    except Exception as e:
+        logger.warning("LLM claim extraction failed: %s", e)
+        return None
+
+
+# --- Combined classification + extraction (one round trip) ---------------------------
+
+
+def _combined_prompt(text: str) -> str:
     snippet = text.strip()[:8000]
-    system = """You are a claim data extractor. From the given document text (which may be in any language: English, Hindi, Tamil, etc.), extract these key fields. Preserve original values as they appear. Use null for missing. Output valid JSON only, no markdown. Use exactly these keys: claimant_name, policy_number, claim_amount, incident_date. Example: {"claimant_name": "Rohan Sharma", "policy_number": "HL-99871234", "claim_amount": "82,450", "incident_date": "05/02/2026"}"""
-    user = f"Document text:\n{snippet}\n\nExtract the four fields. Output JSON only."
+    return f"Document text:\n{snippet}\n\nIs this a claim document? If so, extract the four fields. Output JSON only."
+
+
+def _parse_combined(content: str) -> dict[str, Any]:
+    out = _parse_json_response(content)
+    if "is_claim" not in out:
+        raise ValueError("Combined response missing is_claim")
+    check = _parse_classification(content)
+    return {**check, "fields": _normalize_fields(out) if check["is_claim"] else None}
+
+
+def classify_and_extract_claim(text: str) -> dict[str, Any] | None:
+    """
+    One structured-JSON call doing check_is_claim_document + extract_claim_fields_with_llm.
+    Returns {"is_claim": bool, "reason": str, "fields": dict | None}, or None on failure
+    so the caller can fall back to the two separate calls.
+    """
+    if not text or len(text.strip()) < 20:
+        return {"is_claim": False, "reason": "Document text too short to classify.", "fields": None}
+    try:
+        content = _chat(_COMBINED_SYSTEM, _combined_prompt(text), 0.1, response_format={"type": "json_object"})
+        return _parse_combined(content)
+    except Exception as e:
+        logger.warning("Combined claim classification/extraction failed: %s", e)
+        return None
+
+
+async def classify_and_extract_claim_async(text: str) -> dict[str, Any] | None:
+    """Async variant of classify_and_extract_claim."""
+    if not text or len(text.strip()) < 20:
+        return {"is_claim": False, "reason": "Document text too short to classify.", "fields": None}
     try:
-        client = _client()
-        resp = client.chat.completions.create(
-            model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            temperature=0.1,
+        content = await _achat(
+            _COMBINED_SYSTEM, _combined_prompt(text), 0.1, response_format={"type": "json_object"}
         )
-        content = (resp.choices[0].message.content or "").strip()
-        out = _parse_json_response(content)
-        # Normalize to our schema (string or None)
-        result = {
-            "claimant_name": out.get("claimant_name"),
-            "policy_number": out.get("policy_number"),
-            "claim_amount": out.get("claim_amount"),
-            "incident_date": out.get("incident_date"),
-        }
-        result = {k: (str(v).strip() if v is not None else None) for k, v in result.items()}
-        return result
+        return _parse_combined(content)
     except Exception as e:
-        logger.warning("LLM claim extraction failed: %s", e)
+        logger.warning("Combined claim classification/extraction failed: %s", e)
         return None
 
 
-def get_verdict_and_reason(
+# --- Verdict -----------------------------------------------------------------------
+
+
+def _verdict_prompt(
     duplication_pct: float,
     compared_claim_id: str,
     differences: list[dict[str, str]],
-    threshold_pct: float | None = None,
-) -> dict[str, str]:
-    """
-    Agent decides: status (accepted / rejected / flagged), key_differences summary,
-    and rejection_reason (why rejected, for dashboard).
-    """
+    threshold_pct: float | None,
+) -> str:
     threshold = threshold_pct if threshold_pct is not None else settings.DUPLICATION_THRESHOLD_PCT
     diffs_str = json.dumps(differences, indent=2) if differences else "No structured differences."
-
-    system = """You are a claim verification assistant. Given duplication percentage and list of field differences between a new claim and an existing one, you must:
-1. Decide status: "accepted" (clearly new claim), "rejected" (duplicate or suspicious), or "flagged" (needs human review).
-2. Write a short "key_differences" line (one or two sentences) for Excel: e.g. "Claim amount changed from ₹1.2L to ₹1.5L; Incident date updated."
-3. Write "rejection_reason" only when status is rejected or flagged: explain in one sentence why (e.g. "Duplicate of existing claim with material change in amount."). If status is accepted, set rejection_reason to empty string.
-
-Respond with valid JSON only, no markdown:
-{"status": "accepted|rejected|flagged", "key_differences": "...", "rejection_reason": "..."}"""
-
-    user = f"""Duplication with existing claim: {duplication_pct}%.
+    return f"""Duplication with existing claim: {duplication_pct}%.
 Compared claim ID: {compared_claim_id}.
 Structured differences:
 {diffs_str}
@@ -124,16 +207,8 @@ Structured differences:
 Threshold for potential duplicate: {threshold}%.
 Output JSON with status, key_differences, and rejection_reason."""
 
-    client = _client()
-    resp = client.chat.completions.create(
-        model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        temperature=0.2,
-    )
-    content = (resp.choices[0].message.content or "").strip()
+
+def _parse_verdict(content: str) -> dict[str, str]:
     # Strip markdown code block if present
     if content.startswith("```"):
         content = content.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
@@ -150,3 +225,28 @@ Output JSON with status, key_differences, and rejection_reason."""
         "key_differences": out.get("key_differences", ""),
         "rejection_reason": out.get("rejection_reason", ""),
     }
+
+
+def get_verdict_and_reason(
+    duplication_pct: float,
+    compared_claim_id: str,
+    differences: list[dict[str, str]],
+    threshold_pct: float | None = None,
+) -> dict[str, str]:
+    """
+    Agent decides: status (accepted / rejected / flagged), key_differences summary,
+    and rejection_reason (why rejected, for dashboard).
+    """
+    user = _verdict_prompt(duplication_pct, compared_claim_id, differences, threshold_pct)
+    return _parse_verdict(_chat(_VERDICT_SYSTEM, user, 0.2))
+
+
+async def get_verdict_and_reason_async(
+    duplication_pct: float,
+    compared_claim_id: str,
+    differences: list[dict[str, str]],
+    threshold_pct: float | None = None,
+) -> dict[str, str]:
+    """Async variant of get_verdict_and_reason."""
+    user = _verdict_prompt(duplication_pct, compared_claim_id, differences, threshold_pct)
+    return _parse_verdict(await _achat(_VERDICT_SYSTEM, user, 0.2))
@@ -0,0 +1,447 @@
+"""
+Persistent IVF (inverted-file) approximate-nearest-neighbour index for claim embeddings.
+
+On-disk layout (ANN_INDEX_DIR):
+    CURRENT              name of the active version directory
+    LOCK                 flock'd by writers (append, rebuild, compaction)
+    v<timestamp>/
+        meta.json        dim, nlist, n_main, id_width
+        centroids.npy    (nlist, dim) float32, unit-norm coarse k-means centroids
+        offsets.npy      (nlist + 1,) int64 row offsets of each list in main.f32
+        main.f32         (n_main, dim) float32 unit vectors, sorted by list
+        main_ids.bin     (n_main,) fixed-width claim ids
+        tail.f32         append-only unit vectors inserted since the last build
+        tail_ids.bin     append-only claim ids for tail.f32
+
+All vector files are opened with np.memmap, so every Streamlit/worker process
+shares the same page-cache pages. Search probes the nprobe closest lists and
+brute-forces the (small) tail; compaction folds the tail back into the lists.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+from config import settings
+
+from .embedding_codec import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+_ID_WIDTH = 32
+_KMEANS_SAMPLE = 50_000
+_KMEANS_ITERS = 10
+_CHUNK_ROWS = 65_536
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (m / norms).astype(np.float32, copy=False)
+
+
+def _sim_to_pct(sim: np.ndarray) -> np.ndarray:
+    return np.clip((sim + 1.0) / 2.0 * 100.0, 0.0, 100.0)
+
+
+def _encode_id(claim_id: str) -> bytes:
+    raw = claim_id.encode("utf-8")
+    if len(raw) > _ID_WIDTH:
+        logger.warning("Claim id %r longer than %s bytes; truncated in ANN index", claim_id, _ID_WIDTH)
+    return raw[:_ID_WIDTH].ljust(_ID_WIDTH, b"\0")
+
+
+def _decode_ids(raw: np.ndarray) -> list[str]:
+    return [b.rstrip(b"\0").decode("utf-8", "replace") for b in raw.tolist()]
+
+
+def _memmap_rows(path: Path, dtype: Any, row_shape: tuple[int, ...] = ()) -> np.ndarray:
+    """Read-only memmap of a raw file; only complete rows are mapped (tolerates torn appends)."""
+    itemsize = np.dtype(dtype).itemsize * int(np.prod(row_shape or (1,)))
+    size = path.stat().st_size if path.exists() else 0
+    rows = size // itemsize
+    if rows == 0:
+        return np.empty((0,) + row_shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,) + row_shape)
+
+
+@contextmanager
+def _locked(root: Path) -> Iterator[None]:
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / "LOCK", "a+") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _current_version(root: Path) -> Optional[Path]:
+    try:
+        name = (root / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return root / name if name else None
+
+
+class AnnIndex:
+    """Read side of one index version, plus append-only inserts into its tail."""
+
+    def __init__(self, version_dir: Path):
+        self.path = version_dir
+        meta = json.loads((version_dir / "meta.json").read_text())
+        self.dim: int = meta["dim"]
+        self.nlist: int = meta["nlist"]
+        self.centroids = np.load(version_dir / "centroids.npy")
+        self.offsets = np.load(version_dir / "offsets.npy")
+        self.main = _memmap_rows(version_dir / "main.f32", np.float32, (self.dim,))
+        self.main_ids = _memmap_rows(version_dir / "main_ids.bin", f"S{_ID_WIDTH}")
+        self._tail_lock = threading.Lock()
+        self._tail_bytes = -1
+        self._tail = np.empty((0, self.dim), dtype=np.float32)
+        self._tail_ids = np.empty((0,), dtype=f"S{_ID_WIDTH}")
+
+    def __len__(self) -> int:
+        return int(self.main.shape[0]) + int(self._refresh_tail()[0].shape[0])
+
+    def _refresh_tail(self) -> tuple[np.ndarray, np.ndarray]:
+        """Re-map tail files when another process has appended to them."""
+        vec_path = self.path / "tail.f32"
+        size = vec_path.stat().st_size if vec_path.exists() else 0
+        with self._tail_lock:
+            if size != self._tail_bytes:
+                tail = _memmap_rows(vec_path, np.float32, (self.dim,))
+                ids = _memmap_rows(self.path / "tail_ids.bin", f"S{_ID_WIDTH}")
+                n = min(tail.shape[0], ids.shape[0])
+                self._tail, self._tail_ids = tail[:n], ids[:n]
+                self._tail_bytes = size
+            return self._tail, self._tail_ids
+
+    def append(self, claim_id: str, embedding: Any) -> bool:
+        """Append one claim to the tail segment (caller holds the directory lock)."""
+        vec = decode_embedding(embedding).reshape(1, -1)
+        if vec.shape[1] != self.dim:
+            logger.warning("ANN append skipped for %s: dim %s != %s", claim_id, vec.shape[1], self.dim)
+            return False
+        vec = _normalize_rows(vec)
+        with open(self.path / "tail.f32", "ab") as fv, open(self.path / "tail_ids.bin", "ab") as fi:
+            fv.write(vec.tobytes())
+            fi.write(_encode_id(claim_id))
+        return True
+
+    def search(
+        self,
+        embedding: Any,
+        top_k: int = 1,
+        nprobe: Optional[int] = None,
+    ) -> list[tuple[str, float]]:
+        """Approximate top-k by cosine. Returns [(claim_id, duplication_pct)] best first."""
+        q = np.asarray(embedding, dtype=np.float32).ravel()
+        if q.size != self.dim:
+            logger.warning("Query embedding dim %s != ANN index dim %s", q.size, self.dim)
+            return []
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
+        nprobe = max(1, min(nprobe or settings.ANN_NPROBE, self.nlist))
+        cscores = self.centroids @ q
+        probe = np.argpartition(-cscores, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+
+        score_parts: list[np.ndarray] = []
+        id_parts: list[np.ndarray] = []
+        for lst in probe:
+            start, end = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if end > start:
+                score_parts.append(self.main[start:end] @ q)
+                id_parts.append(self.main_ids[start:end])
+        tail, tail_ids = self._refresh_tail()
+        if tail.shape[0]:
+            score_parts.append(tail @ q)
+            id_parts.append(tail_ids)
+        if not score_parts:
+            return []
+        scores = np.concatenate(score_parts)
+        ids = np.concatenate(id_parts)
+        return _top_k(scores, ids, top_k)
+
+    def iter_vectors(self, chunk_rows: int = _CHUNK_ROWS) -> Iterator[tuple[list[str], np.ndarray]]:
+        """Yield (claim_ids, vectors) chunks over main then tail (used by compaction and recall)."""
+        tail, tail_ids = self._refresh_tail()
+        for vecs, ids in ((self.main, self.main_ids), (tail, tail_ids)):
+            for start in range(0, vecs.shape[0], chunk_rows):
+                yield _decode_ids(ids[start : start + chunk_rows]), np.asarray(vecs[start : start + chunk_rows])
+
+    def brute_force(self, embedding: Any, top_k: int = 1) -> list[tuple[str, float]]:
+        """Exact top-k over every stored vector (reference for recall checks)."""
+        q = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
+        best_scores = np.empty(0, dtype=np.float32)
+        best_ids = np.empty(0, dtype=f"S{_ID_WIDTH}")
+        tail, tail_ids = self._refresh_tail()
+        for vecs, ids in ((self.main, self.main_ids), (tail, tail_ids)):
+            for start in range(0, vecs.shape[0], _CHUNK_ROWS):
+                s = np.concatenate([best_scores, vecs[start : start + _CHUNK_ROWS] @ q])
+                i = np.concatenate([best_ids, ids[start : start + _CHUNK_ROWS]])
+                k = min(top_k, s.shape[0])
+                keep = np.argpartition(-s, k - 1)[:k] if k < s.shape[0] else np.arange(s.shape[0])
+                best_scores, best_ids = s[keep], i[keep]
+        return _top_k(best_scores, best_ids, top_k)
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, top_k: int) -> list[tuple[str, float]]:
+    """Best top_k distinct claim ids (a claim appended to the tail may also be in main)."""
+    n = scores.shape[0]
+    if min(top_k, n) <= 0:
+        return []
+    k = min(top_k, n)
+    while True:
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        out: list[tuple[str, float]] = []
+        seen: set[str] = set()
+        for name, p in zip(_decode_ids(ids[top]), _sim_to_pct(scores[top])):
+            if name not in seen:
+                seen.add(name)
+                out.append((name, round(float(p), 1)))
+        if len(out) >= top_k or k >= n:
+            return out[:top_k]
+        k = min(n, k * 2)
+
+
+# --- Build / compaction -------------------------------------------------------
+
+
+def _spherical_kmeans(sample: np.ndarray, nlist: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _CHUNK_ROWS):
+        block = np.asarray(vectors[start : start + _CHUNK_ROWS], dtype=np.float32)
+        out[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def build_index(
+    source: Iterable[tuple[str, Any]],
+    root: Optional[str] = None,
+    nlist: Optional[int] = None,
+    seed: int = 0,
+) -> Path:
+    """
+    Build a new index version from (claim_id, embedding) pairs and make it current.
+    Streams vectors to disk first, so memory stays bounded by the k-means sample.
+    Claims appended to the previous version while the build ran are carried over.
+    """
+    root_path = Path(root or settings.ANN_INDEX_DIR)
+    root_path.mkdir(parents=True, exist_ok=True)
+    version = root_path / f"v{time.time_ns()}"
+    version.mkdir()
+    rng = np.random.default_rng(seed)
+
+    # 1. Stream unsorted unit vectors + ids to scratch files (duplicate claim_ids dropped in step 3)
+    dim: Optional[int] = None
+    n = 0
+    with open(version / "unsorted.f32", "wb") as fv, open(version / "unsorted_ids.bin", "wb") as fi:
+        for claim_id, emb in source:
+            vec = np.asarray(emb, dtype=np.float32).reshape(1, -1)
+            if dim is None:
+                dim = vec.shape[1]
+            if vec.shape[1] != dim:
+                continue
+            fv.write(_normalize_rows(vec).tobytes())
+            fi.write(_encode_id(claim_id))
+            n += 1
+    if dim is None or n == 0:
+        shutil.rmtree(version)
+        raise ValueError("No embeddings to index.")
+    unsorted = np.memmap(version / "unsorted.f32", dtype=np.float32, mode="r", shape=(n, dim))
+    unsorted_ids = np.memmap(version / "unsorted_ids.bin", dtype=f"S{_ID_WIDTH}", mode="r", shape=(n,))
+    # One row per claim_id, the last one written (e.g. a compacted tail re-embedding a main claim)
+    _, last_from_end = np.unique(np.asarray(unsorted_ids)[::-1], return_index=True)
+    keep = np.sort(n - 1 - last_from_end)
+    total, n = n, int(keep.shape[0])
+    if n < total:
+        logger.info("Dropped %s duplicate claim ids from the ANN build", total - n)
+
+    # 2. Coarse quantizer on a random sample
+    nlist = int(nlist or settings.ANN_NLIST or max(1, round(4 * np.sqrt(n))))
+    nlist = max(1, min(nlist, n))
+    sample_idx = np.sort(rng.choice(keep, min(n, max(_KMEANS_SAMPLE, nlist)), replace=False))
+    centroids = _spherical_kmeans(np.asarray(unsorted[sample_idx]), nlist, _KMEANS_ITERS, rng)
+
+    # 3. Assign every kept vector and write main.f32 sorted by list
+    assign = _assign(unsorted, centroids)[keep]
+    order = keep[np.argsort(assign, kind="stable")]
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+    main = np.memmap(version / "main.f32", dtype=np.float32, mode="w+", shape=(n, dim))
+    main_ids = np.memmap(version / "main_ids.bin", dtype=f"S{_ID_WIDTH}", mode="w+", shape=(n,))
+    for start in range(0, n, _CHUNK_ROWS):
+        rows = order[start : start + _CHUNK_ROWS]
+        main[start : start + rows.shape[0]] = unsorted[rows]
+        main_ids[start : start + rows.shape[0]] = unsorted_ids[rows]
+    main.flush()
+    main_ids.flush()
+    del main, main_ids, unsorted, unsorted_ids
+    os.remove(version / "unsorted.f32")
+    os.remove(version / "unsorted_ids.bin")
+
+    np.save(version / "centroids.npy", centroids)
+    np.save(version / "offsets.npy", offsets)
+    (version / "meta.json").write_text(
+        json.dumps({"dim": dim, "nlist": nlist, "n_main": n, "id_width": _ID_WIDTH})
+    )
+
+    # 4. Swap CURRENT; carry over inserts that landed in the old tail during the build
+    with _locked(root_path):
+        previous = _current_version(root_path)
+        if previous is not None and previous.exists():
+            built = AnnIndex(version)
+            have = set(_decode_ids(np.asarray(built.main_ids)))
+            old_tail, old_tail_ids = AnnIndex(previous)._refresh_tail()
+            for cid, vec in zip(_decode_ids(np.asarray(old_tail_ids)), np.asarray(old_tail)):
+                if cid not in have:
+                    built.append(cid, vec)
+        tmp = root_path / "CURRENT.tmp"
+        tmp.write_text(version.name)
+        os.replace(tmp, root_path / "CURRENT")
+    if previous is not None and previous.exists():
+        # Processes with the old version mapped keep their pages until they reopen
+        shutil.rmtree(previous, ignore_errors=True)
+    logger.info("ANN index built: %s vectors, %s lists at %s", n, nlist, version)
+    return version
+
+
+def _iter_db_embeddings() -> Iterator[tuple[str, Any]]:
+    from .db import _claims_collection
+
+    cursor = _claims_collection().find(
+        {"embedding": {"$exists": True, "$ne": None}},
+        {"claim_id": 1, "embedding": 1},
+    ).batch_size(2000)
+    for doc in cursor:
+        vec = decode_embedding(doc["embedding"])
+        if vec is not None:
+            yield doc.get("claim_id") or str(doc.get("_id", "")), vec
+
+
+def rebuild_from_db(root: Optional[str] = None, nlist: Optional[int] = None) -> Path:
+    """Offline full rebuild from the claims collection."""
+    return build_index(_iter_db_embeddings(), root=root, nlist=nlist)
+
+
+def compact(root: Optional[str] = None, nlist: Optional[int] = None) -> Path:
+    """Fold the tail back into the IVF lists (re-training centroids) without touching MongoDB."""
+    index = open_index(root, reuse=False)
+    if index is None:
+        raise FileNotFoundError("No ANN index to compact.")
+    latest: dict[str, np.ndarray] = {}
+    for ids, vecs in index.iter_vectors():
+        for cid, vec in zip(ids, vecs):
+            latest[cid] = vec
+    return build_index(latest.items(), root=root, nlist=nlist)
+
+
+# --- Process-wide handle ------------------------------------------------------
+
+_open: dict[str, AnnIndex] = {}
+_open_lock = threading.Lock()
+
+
+def open_index(root: Optional[str] = None, reuse: bool = True) -> Optional[AnnIndex]:
+    """Open the current index version (None if not built). Reopens after a rebuild/compaction."""
+    root_path = Path(root or settings.ANN_INDEX_DIR)
+    version = _current_version(root_path)
+    if version is None or not (version / "meta.json").exists():
+        return None
+    key = str(root_path)
+    with _open_lock:
+        cached = _open.get(key)
+        if reuse and cached is not None and cached.path == version:
+            return cached
+        index = AnnIndex(version)
+        _open[key] = index
+        return index
+
+
+def ann_enabled() -> bool:
+    return bool(settings.ANN_INDEX_DIR)
+
+
+def append_claim(claim_id: str, embedding: Any, root: Optional[str] = None) -> bool:
+    """Append-only insert of a saved claim into the current version's tail."""
+    root_path = Path(root or settings.ANN_INDEX_DIR)
+    with _locked(root_path):
+        index = open_index(str(root_path))
+        if index is None:
+            return False
+        return index.append(claim_id, embedding)
+
+
+def evaluate_recall(
+    root: Optional[str] = None,
+    n_queries: int = 200,
+    top_k: int = 10,
+    nprobes: Iterable[int] = (1, 2, 4, 8, 16, 32),
+    noise: float = 0.05,
+    threshold_pct: Optional[float] = None,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """
+    Recall@k of ANN search vs brute force, per nprobe, on perturbed copies of stored vectors.
+    Also reports how often the duplicate decision (top-1 pct >= threshold) agrees with exact search.
+    """
+    index = open_index(root, reuse=False)
+    if index is None:
+        raise FileNotFoundError("No ANN index to evaluate.")
+    threshold = settings.DUPLICATION_THRESHOLD_PCT if threshold_pct is None else threshold_pct
+    rng = np.random.default_rng(seed)
+    total = len(index)
+    picks = rng.choice(total, min(n_queries, total), replace=False)
+    tail, _ = index._refresh_tail()
+    queries = []
+    for p in picks:
+        base = index.main[p] if p < index.main.shape[0] else tail[p - index.main.shape[0]]
+        queries.append(np.asarray(base) + rng.normal(0, noise, index.dim).astype(np.float32))
+    exact = [index.brute_force(q, top_k) for q in queries]
+
+    report = []
+    for nprobe in nprobes:
+        hits = agree = 0
+        start = time.perf_counter()
+        approx = [index.search(q, top_k, nprobe=nprobe) for q in queries]
+        elapsed = time.perf_counter() - start
+        for a, e in zip(approx, exact):
+            hits += len({cid for cid, _ in a} & {cid for cid, _ in e})
+            a_dup = bool(a) and a[0][1] >= threshold
+            e_dup = bool(e) and e[0][1] >= threshold
+            agree += a_dup == e_dup
+        report.append({
+            "nprobe": nprobe,
+            "recall_at_k": round(hits / max(1, sum(len(e) for e in exact)), 4),
+            "decision_agreement": round(agree / max(1, len(queries)), 4),
+            "avg_query_ms": round(elapsed / max(1, len(queries)) * 1000, 3),
+        })
+    return report
@@ -0,0 +1,153 @@
+"""
+Blocking keys for duplicate detection: normalized policy number, claimant name,
+amount and date, stored on each claim and looked up through indexed queries so
+embedding similarity only has to rank a small candidate block.
+"""
+import re
+import unicodedata
+from datetime import date
+from typing import Any, Optional
+
+# Devanagari digits (०-९) → ASCII
+_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+_HONORIFICS = {"mr", "mrs", "ms", "miss", "dr", "shri", "sri", "smt", "kumari", "श्री", "श्रीमती", "डॉ"}
+
+_MONTHS = {
+    m: i + 1
+    for i, names in enumerate([
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ])
+    for m in names
+}
+
+_NON_ALNUM = re.compile(r"[\W_]+", re.UNICODE)
+_AMOUNT = re.compile(r"(\d+(?:\.\d+)?)\s*(crore|cr|lakhs?|lacs?|l|k)?\b", re.I)
+_DATE_NUMERIC = re.compile(r"(\d{1,4})[/\-.](\d{1,2})[/\-.](\d{1,4})")
+_DATE_TEXT = re.compile(r"(\d{1,2})(?:st|nd|rd|th)?\s*[-\s]?([A-Za-z]{3,9})[,\s-]*(\d{2,4})")
+_MULTIPLIERS = {"crore": 10_000_000, "cr": 10_000_000, "lakh": 100_000, "lakhs": 100_000,
+                "lac": 100_000, "lacs": 100_000, "l": 100_000, "k": 1_000}
+
+BLOCKING_FIELDS = ("policy_number", "claimant_name", "claim_amount", "incident_date")
+
+# Stand-ins for a missing value (LLMs and forms fill fields with these), compared casefolded
+# without spaces or punctuation. As keys they would put unrelated claims in one huge block
+_PLACEHOLDERS = {
+    "na", "nil", "none", "null", "nan", "unknown", "tbd", "tba",
+    "notavailable", "notapplicable", "notknown", "notprovided", "notspecified", "notmentioned", "notgiven",
+}
+_MIN_POLICY_LEN = 4
+
+
+def _clean(value: Any) -> str:
+    if value is None:
+        return ""
+    return unicodedata.normalize("NFKC", str(value)).translate(_DIGITS).strip()
+
+
+def is_placeholder(value: Any) -> bool:
+    """Empty, or a stand-in such as 'N/A', '-', 'Unknown', 'Not available', 'XXXX', '000'."""
+    compact = _NON_ALNUM.sub("", _clean(value).casefold())
+    return not compact or compact in _PLACEHOLDERS or set(compact) <= {"x"} or set(compact) <= {"0"}
+
+
+def normalize_policy_number(value: Any) -> Optional[str]:
+    """'hl-9987 1234' → 'HL99871234'; None for placeholders and keys too short or without digits."""
+    if is_placeholder(value):
+        return None
+    s = _NON_ALNUM.sub("", _clean(value)).upper()
+    if len(s) < _MIN_POLICY_LEN or not any(ch.isdigit() for ch in s):
+        return None
+    return s
+
+
+def normalize_name(value: Any) -> Optional[str]:
+    """Casefold, drop honorifics and punctuation, sort tokens ('Sharma, Mr. Rohan' → 'rohan sharma')."""
+    if is_placeholder(value):
+        return None
+    tokens = [t for t in _NON_ALNUM.sub(" ", _clean(value).casefold()).split() if t not in _HONORIFICS]
+    name = " ".join(sorted(tokens))
+    return name if sum(ch.isalpha() for ch in name) >= 2 else None
+
+
+def normalize_amount(value: Any) -> Optional[str]:
+    """'₹ 1.2 Lakh' → '120000', 'Rs. 82,450.00' → '82450'; None for placeholders and zero."""
+    if is_placeholder(value):
+        return None
+    s = _clean(value).replace(",", "")
+    m = _AMOUNT.search(s)
+    if not m:
+        return None
+    amount = float(m.group(1)) * _MULTIPLIERS.get((m.group(2) or "").lower(), 1)
+    if amount <= 0:
+        return None
+    return str(int(amount)) if amount == int(amount) else f"{amount:.2f}"
+
+
+def _make_date(y: int, m: int, d: int) -> Optional[str]:
+    if y < 100:
+        y += 2000
+    try:
+        return date(y, m, d).isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_date(value: Any) -> Optional[str]:
+    """Day-first dates ('05/02/2026', '5-2-26', '5 Feb 2026', '2026-02-05') → ISO '2026-02-05'."""
+    s = _clean(value)
+    m = _DATE_NUMERIC.search(s)
+    if m:
+        a, b, c = (int(x) for x in m.groups())
+        if len(m.group(1)) == 4:
+            return _make_date(a, b, c)
+        return _make_date(c, b, a) or _make_date(c, a, b)
+    m = _DATE_TEXT.search(s)
+    if m and m.group(2).lower() in _MONTHS:
+        return _make_date(int(m.group(3)), _MONTHS[m.group(2).lower()], int(m.group(1)))
+    return None
+
+
+_NORMALIZERS = {
+    "policy_number": normalize_policy_number,
+    "claimant_name": normalize_name,
+    "claim_amount": normalize_amount,
+    "incident_date": normalize_date,
+}
+
+
+def blocking_keys(key_fields: Optional[dict[str, Any]]) -> dict[str, Optional[str]]:
+    """Normalized blocking keys for a key_fields dict (as returned by extract_claim_fields_with_llm)."""
+    key_fields = key_fields or {}
+    return {f: _NORMALIZERS[f](key_fields.get(f)) for f in BLOCKING_FIELDS}
+
+
+def blocking_queries(
+    keys: dict[str, Optional[str]],
+    key_fields: Optional[dict[str, Any]] = None,
+) -> list[dict[str, Any]]:
+    """
+    One MongoDB filter per blocking key, strongest first: same policy number, same
+    claimant name, same amount and date. Each is queried with its own limit so a
+    common name cannot crowd policy-number matches out of the block. Raw key_fields
+    values are also matched so claims saved before blocking keys existed are still found.
+    Empty when there is nothing to block on.
+    """
+    queries: list[dict[str, Any]] = []
+    for field in ("policy_number", "claimant_name"):
+        clauses = []
+        if keys.get(field):
+            clauses.append({f"blocking_keys.{field}": keys[field]})
+        raw = (key_fields or {}).get(field)
+        if raw:
+            clauses.append({f"key_fields.{field}": raw})
+        if clauses:
+            queries.append(clauses[0] if len(clauses) == 1 else {"$or": clauses})
+    if keys.get("claim_amount") and keys.get("incident_date"):
+        queries.append({
+            "blocking_keys.claim_amount": keys["claim_amount"],
+            "blocking_keys.incident_date": keys["incident_date"],
+        })
+    return queries
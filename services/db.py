@@ -1,12 +1,39 @@
+import asyncio
+import logging
+import weakref
 from typing import Any, Optional
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, IndexModel, MongoClient
+from pymongo.errors import OperationFailure
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 from pymongo.database import Database
 from pymongo.collection import Collection
 
 from config import settings
 
+from .cache import LRUCache
+
 _db: Optional[Database] = None
+# One async client per event loop (async connections are bound to their loop)
+_async_dbs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncDatabase]" = weakref.WeakKeyDictionary()
+_indexes_ready = False
+
+logger = logging.getLogger(__name__)
+
+# Dashboard query results (pages, counts); cleared on every save in this process,
+# so only claims written by other processes can be up to DASHBOARD_CACHE_TTL_S stale
+_query_cache = LRUCache(settings.DASHBOARD_CACHE_SIZE, ttl=settings.DASHBOARD_CACHE_TTL_S)
+
+# Columns the dashboard shows (and exports)
+DASHBOARD_FIELDS = (
+    "claim_id", "compared_with", "duplication_pct", "key_differences", "status", "rejection_reason", "created_at",
+)
+
+# Max claims pulled into a duplicate-check block per blocking key (newest first)
+_BLOCK_LIMIT = 200
+_BLOCK_PROJECTION = {"claim_id": 1, "key_fields": 1, "embedding": 1}
+_BLOCK_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
 
 
 def get_db() -> Database:
@@ -16,44 +43,525 @@ def get_db() -> Database:
             raise ValueError("MONGODB_URI is not set in .env")
         client = MongoClient(settings.MONGODB_URI)
         _db = client[settings.MONGODB_DB_NAME]
+        if settings.MONGODB_ENSURE_INDEXES:
+            try:
+                ensure_indexes()
+            except Exception as e:
+                logger.warning("Could not ensure claims indexes: %s", e)
     return _db
 
 
+def get_async_db() -> AsyncDatabase:
+    """Async database handle for the running event loop (pymongo's native asyncio driver)."""
+    loop = asyncio.get_running_loop()
+    db = _async_dbs.get(loop)
+    if db is None:
+        if not settings.MONGODB_URI:
+            raise ValueError("MONGODB_URI is not set in .env")
+        db = AsyncMongoClient(settings.MONGODB_URI)[settings.MONGODB_DB_NAME]
+        _async_dbs[loop] = db
+    return db
+
+
 def _claims_collection() -> Collection:
     return get_db()[settings.MONGODB_CLAIMS_COLLECTION]
 
 
+def _async_claims_collection() -> AsyncCollection:
+    return get_async_db()[settings.MONGODB_CLAIMS_COLLECTION]
+
+
+def _texts_collection() -> Collection:
+    return get_db()[settings.MONGODB_CLAIM_TEXT_COLLECTION]
+
+
+def _async_texts_collection() -> AsyncCollection:
+    return get_async_db()[settings.MONGODB_CLAIM_TEXT_COLLECTION]
+
+
+# Large payloads kept out of the claims documents (stored in the claim text collection)
+_TEXT_FIELDS = ("extracted_text", "ocr_pages")
+# Projection that leaves out the text and embedding payloads
+_LEAN_PROJECTION = {"extracted_text": 0, "ocr_pages": 0, "embedding": 0, "embedding_i8": 0}
+
+
+def _split_text(doc: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    Move the text payloads out of a claim document (in place) into a claim-text
+    document keyed by claim_id; the claim keeps only text_chars. None if there is no text.
+    """
+    payload = {field: doc.pop(field, None) for field in _TEXT_FIELDS}
+    if not any(payload.values()):
+        return None
+    doc["text_chars"] = len(payload["extracted_text"] or "")
+    return {"_id": doc["claim_id"], "claim_id": doc["claim_id"], **payload, "created_at": doc.get("created_at")}
+
+
 def save_claim(doc: dict[str, Any]) -> str:
     coll = _claims_collection()
+    # Text first: a claim is never visible without its text
+    text_doc = _split_text(doc)
+    if text_doc is not None:
+        _texts_collection().replace_one({"_id": text_doc["_id"]}, text_doc, upsert=True)
     result = coll.insert_one(doc)
+    _query_cache.clear()
+    from .similarity import index_saved_claim
+    index_saved_claim(doc)
+    return str(result.inserted_id)
+
+
+async def save_claim_async(doc: dict[str, Any]) -> str:
+    text_doc = _split_text(doc)
+    if text_doc is not None:
+        await _async_texts_collection().replace_one({"_id": text_doc["_id"]}, text_doc, upsert=True)
+    result = await _async_claims_collection().insert_one(doc)
+    _query_cache.clear()
+    from .similarity import index_saved_claim
+    await asyncio.to_thread(index_saved_claim, doc)
     return str(result.inserted_id)
 
 
 def list_claims(
     status: Optional[str] = None,
     limit: int = 100,
-    exclude_large_fields: bool = False,
+    exclude_large_fields: bool = True,
 ) -> list[dict]:
     coll = _claims_collection()
     q = {} if status is None else {"status": status}
-    proj = None
-    if exclude_large_fields:
-        proj = {"extracted_text": 0, "embedding": 0}
+    proj = _LEAN_PROJECTION if exclude_large_fields else None
     cursor = coll.find(q, proj).sort("created_at", -1).limit(limit)
     return list(cursor)
 
 
-def get_claim_by_id(claim_id: str) -> Optional[dict]:
+def list_claims_page(
+    status: Optional[str] = None,
+    page_size: int = 50,
+    after: Optional[tuple[Any, Any]] = None,
+) -> tuple[list[dict], Optional[tuple[Any, Any]]]:
+    """
+    One page of claims, newest first, with only the dashboard columns.
+    Keyset pagination on (created_at, _id): pass the returned cursor as `after` to get
+    the next page (None when there are no more), so every page costs one index range scan.
+    Results are cached for DASHBOARD_CACHE_TTL_S.
+    """
+    key = ("page", status, page_size, after)
+    cached = _query_cache.get(key)
+    if cached is not None:
+        return cached
+    q: dict[str, Any] = {} if status is None else {"status": status}
+    if after is not None:
+        created_at, last_id = after
+        q["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+    proj = {f: 1 for f in DASHBOARD_FIELDS}
+    cursor = (
+        _claims_collection()
+        .find(q, proj)
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(page_size + 1)
+    )
+    rows = list(cursor)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1].get("created_at"), rows[-1]["_id"])
+    result = (rows, next_cursor)
+    _query_cache.put(key, result)
+    return result
+
+
+# $sort on status lets the planner read the status_created_at_id index instead of the
+# collection, and the projection makes the scan covered (no documents fetched)
+_STATUS_COUNTS_PIPELINE = [
+    {"$sort": {"status": 1}},
+    {"$project": {"_id": 0, "status": 1}},
+    {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+]
+
+
+def count_claims_by_status() -> dict[str, int]:
+    """Claim counts per status (one covered scan of the status index; cached)."""
+    cached = _query_cache.get("status_counts")
+    if cached is not None:
+        return cached
+    counts = {str(d["_id"]): d["count"] for d in _claims_collection().aggregate(_STATUS_COUNTS_PIPELINE)}
+    _query_cache.put("status_counts", counts)
+    return counts
+
+
+def list_claim_timings(limit: int = 500) -> list[dict]:
+    """Stage timing breakdowns of the most recent claims (for the Ops page)."""
+    cursor = (
+        _claims_collection()
+        .find({"timings": {"$exists": True}}, {"_id": 0, "claim_id": 1, "created_at": 1, "timings": 1})
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit)
+    )
+    return list(cursor)
+
+
+def get_claim_by_id(claim_id: str, include_large_fields: bool = False) -> Optional[dict]:
+    """One claim; text and embeddings only with include_large_fields (text via get_claim_text)."""
+    coll = _claims_collection()
+    doc = coll.find_one({"claim_id": claim_id}, None if include_large_fields else _LEAN_PROJECTION)
+    if doc is not None and include_large_fields and "extracted_text" not in doc:
+        text_doc = _texts_collection().find_one({"_id": claim_id}, {"_id": 0, "claim_id": 0, "created_at": 0})
+        doc.update(text_doc or {})
+    return doc
+
+
+def get_claim_texts(claim_ids: list[str]) -> dict[str, str]:
+    """claim_id → extracted text, from the claim text collection (inline text on unmigrated claims)."""
+    if not claim_ids:
+        return {}
+    ids = list(claim_ids)
+    texts = {
+        d["_id"]: d.get("extracted_text") or ""
+        for d in _texts_collection().find({"_id": {"$in": ids}}, {"extracted_text": 1})
+    }
+    missing = [cid for cid in ids if cid not in texts]
+    if missing:
+        for d in _claims_collection().find(
+            {"claim_id": {"$in": missing}, "extracted_text": {"$exists": True}},
+            {"claim_id": 1, "extracted_text": 1},
+        ):
+            texts[d["claim_id"]] = d.get("extracted_text") or ""
+    return texts
+
+
+def get_claim_text(claim_id: str) -> Optional[str]:
+    """Extracted text of one claim, loaded on demand (None if the claim has none)."""
+    return get_claim_texts([claim_id]).get(claim_id)
+
+
+def migrate_claim_texts(batch_size: int = 200) -> dict[str, int]:
+    """
+    Move inline extracted_text / ocr_pages from claims into the claim text collection,
+    in resumable keyset batches (text is written before it is unset from the claim).
+    Returns {"moved": n}.
+    """
+    from pymongo import ReplaceOne, UpdateOne
+
+    coll = _claims_collection()
+    texts = _texts_collection()
+    moved = 0
+    last_id = None
+    while True:
+        q: dict[str, Any] = {"$or": [{f: {"$exists": True}} for f in _TEXT_FIELDS]}
+        if last_id is not None:
+            q["_id"] = {"$gt": last_id}
+        docs = list(
+            coll.find(q, {"claim_id": 1, "created_at": 1, **{f: 1 for f in _TEXT_FIELDS}})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not docs:
+            break
+        text_ops, claim_ops = [], []
+        for doc in docs:
+            last_id = doc["_id"]
+            doc.setdefault("claim_id", str(doc["_id"]))
+            text_doc = _split_text(doc)
+            unset = {f: "" for f in _TEXT_FIELDS}
+            if text_doc is None:
+                claim_ops.append(UpdateOne({"_id": doc["_id"]}, {"$unset": unset}))
+                continue
+            text_ops.append(ReplaceOne({"_id": text_doc["_id"]}, text_doc, upsert=True))
+            claim_ops.append(
+                UpdateOne({"_id": doc["_id"]}, {"$unset": unset, "$set": {"text_chars": doc["text_chars"]}})
+            )
+        if text_ops:
+            texts.bulk_write(text_ops, ordered=False)
+        coll.bulk_write(claim_ops, ordered=False)
+        moved += len(text_ops)
+    return {"moved": moved}
+
+
+def get_claims_by_ids(claim_ids: list[str], projection: Optional[dict] = None) -> list[dict]:
+    """Fetch claims by claim_id, returned in the order of claim_ids (missing ids skipped)."""
+    if not claim_ids:
+        return []
+    coll = _claims_collection()
+    found = {d.get("claim_id"): d for d in coll.find({"claim_id": {"$in": list(claim_ids)}}, projection)}
+    return [found[cid] for cid in claim_ids if cid in found]
+
+
+# Indexes on the claims collection, one per hot query:
+# claim_id lookups / ID prefix scans, dashboard listing (optionally by status) and blocking
+_CLAIM_INDEXES = [
+    IndexModel([("claim_id", ASCENDING)], name="claim_id_unique", unique=True),
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+    IndexModel(
+        [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="status_created_at_id"
+    ),
+    IndexModel(
+        [("blocking_keys.policy_number", ASCENDING), *_BLOCK_SORT], name="blocking_policy_number_recent"
+    ),
+    IndexModel(
+        [("blocking_keys.claimant_name", ASCENDING), *_BLOCK_SORT], name="blocking_claimant_name_recent"
+    ),
+    IndexModel(
+        [("blocking_keys.claim_amount", ASCENDING), ("blocking_keys.incident_date", ASCENDING), *_BLOCK_SORT],
+        name="blocking_amount_date_recent",
+    ),
+    IndexModel([("key_fields.policy_number", ASCENDING), *_BLOCK_SORT], name="key_fields_policy_number_recent"),
+    IndexModel([("key_fields.claimant_name", ASCENDING), *_BLOCK_SORT], name="key_fields_claimant_name_recent"),
+]
+
+
+def ensure_indexes(force: bool = False) -> list[str]:
+    """
+    Create the claims indexes (once per process; create_index is a no-op for existing ones).
+    If existing data has duplicate claim_ids the unique index cannot be built; a plain
+    claim_id index is created instead and a warning logged. Returns the index names.
+    """
+    global _indexes_ready
+    if _indexes_ready and not force:
+        return []
+    coll = _claims_collection()
+    created = []
+    for model in _CLAIM_INDEXES:
+        try:
+            created.extend(coll.create_indexes([model]))
+        except OperationFailure as e:
+            doc = model.document
+            if not doc.get("unique"):
+                raise
+            logger.warning("Unique index %s not created (%s); falling back to non-unique", doc["name"], e)
+            created.append(coll.create_index(list(doc["key"].items()), name=f"{doc['name']}_nonunique"))
+    _indexes_ready = True
+    return created
+
+
+def find_blocking_candidates(
+    keys: dict[str, Optional[str]],
+    key_fields: Optional[dict[str, Any]] = None,
+    limit: int = _BLOCK_LIMIT,
+) -> list[dict]:
+    """
+    Claims sharing a blocking key (policy number, claimant name, or amount+date) with keys.
+    Each key is queried separately for its newest `limit` claims; policy-number matches
+    come first and a claim found by several keys is returned once.
+    """
+    from .blocking import blocking_queries
+
     coll = _claims_collection()
-    return coll.find_one({"claim_id": claim_id})
+    return _merge_blocks(
+        list(coll.find(q, _BLOCK_PROJECTION).sort(_BLOCK_SORT).limit(limit))
+        for q in blocking_queries(keys, key_fields)
+    )
+
+
+async def find_blocking_candidates_async(
+    keys: dict[str, Optional[str]],
+    key_fields: Optional[dict[str, Any]] = None,
+    limit: int = _BLOCK_LIMIT,
+) -> list[dict]:
+    """Async variant of find_blocking_candidates (the per-key queries run concurrently)."""
+    from .blocking import blocking_queries
+
+    coll = _async_claims_collection()
+    blocks = await asyncio.gather(*(
+        coll.find(q, _BLOCK_PROJECTION).sort(_BLOCK_SORT).limit(limit).to_list()
+        for q in blocking_queries(keys, key_fields)
+    ))
+    return _merge_blocks(blocks)
+
+
+def _merge_blocks(blocks) -> list[dict]:
+    """Concatenate per-key candidate lists in priority order, keeping each claim_id once."""
+    seen: set = set()
+    merged = []
+    for block in blocks:
+        for doc in block:
+            if doc.get("claim_id") not in seen:
+                seen.add(doc.get("claim_id"))
+                merged.append(doc)
+    return merged
+
+
+def _counters_collection() -> Collection:
+    return get_db()[settings.MONGODB_COUNTERS_COLLECTION]
+
+
+def _claim_id_prefix(year: str) -> str:
+    return f"Claim_{year}_"
+
+
+def _max_claim_seqs(year: Optional[str] = None) -> dict[str, int]:
+    """Highest numeric suffix per year among existing Claim_YYYY_NNN ids (one scan)."""
+    pattern = f"^{_claim_id_prefix(year)}" if year else r"^Claim_\d{4}_"
+    best: dict[str, int] = {}
+    for doc in _claims_collection().find({"claim_id": {"$regex": pattern}}, {"claim_id": 1, "_id": 0}):
+        _, y, seq = doc["claim_id"].split("_", 2)
+        if seq.isdigit():
+            best[y] = max(best.get(y, 0), int(seq))
+    return best
+
+
+def seed_claim_counters(year: Optional[str] = None) -> dict[str, int]:
+    """
+    Raise the per-year counters to at least the highest claim ID already stored
+    ($max, so it is idempotent and never moves a counter backwards).
+    Seeds every year found when year is None. Returns year → seeded sequence.
+    """
+    best = _max_claim_seqs(year)
+    if year and year not in best:
+        best[year] = 0
+    coll = _counters_collection()
+    for y, seq in best.items():
+        coll.update_one({"_id": f"claim_id:{y}"}, {"$max": {"seq": seq}}, upsert=True)
+    return best
+
+
+_seeded_years: set[str] = set()
+
+
+def reserve_claim_ids(n: int) -> list[str]:
+    """
+    Atomically reserve n consecutive claim IDs for the current year with one
+    find_one_and_update($inc). Safe across threads and processes. The year's
+    counter is seeded from existing claims the first time it is seen.
+    """
+    from datetime import datetime, timezone
+    from pymongo import ReturnDocument
+
+    if n <= 0:
+        return []
+    year = datetime.now(timezone.utc).strftime("%Y")
+    coll = _counters_collection()
+    counter_id = f"claim_id:{year}"
+    if year not in _seeded_years:
+        if coll.find_one({"_id": counter_id}, {"_id": 1}) is None:
+            seed_claim_counters(year)
+        _seeded_years.add(year)
+    doc = coll.find_one_and_update(
+        {"_id": counter_id},
+        {"$inc": {"seq": n}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    end = int(doc["seq"])
+    prefix = _claim_id_prefix(year)
+    return [f"{prefix}{seq:03d}" for seq in range(end - n + 1, end + 1)]
 
 
 def get_next_claim_id() -> str:
     """Generate next claim ID: Claim_YYYY_NNN (e.g. Claim_2026_101)."""
+    return reserve_claim_ids(1)[0]
+
+
+def save_claims_bulk(docs: list[dict[str, Any]]) -> int:
+    """Insert many claims in one unordered bulk_write; returns number inserted."""
+    if not docs:
+        return 0
+    from pymongo import InsertOne, ReplaceOne
+    from .similarity import index_saved_claim
+
+    text_docs = [t for t in (_split_text(d) for d in docs) if t is not None]
+    if text_docs:
+        _texts_collection().bulk_write(
+            [ReplaceOne({"_id": t["_id"]}, t, upsert=True) for t in text_docs], ordered=False
+        )
+    result = _claims_collection().bulk_write([InsertOne(d) for d in docs], ordered=False)
+    _query_cache.clear()
+    for doc in docs:
+        index_saved_claim(doc)
+    return result.inserted_count
+
+
+def _iter_plan_nodes(plan: Any):
+    """Every stage node in an explain() plan tree (classic and SBE layouts)."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan
+        for value in plan.values():
+            yield from _iter_plan_nodes(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _iter_plan_nodes(value)
+
+
+def _hot_queries() -> list[tuple[str, dict, Optional[list], int]]:
+    """(name, filter, sort, limit) for the queries the app runs on every request."""
     from datetime import datetime, timezone
+
+    from .blocking import blocking_keys, blocking_queries
+
+    prefix = f"Claim_{datetime.now(timezone.utc).strftime('%Y')}_"
+    recent = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    # Blocking filters built exactly as find_blocking_candidates builds them
+    sample = {
+        "policy_number": "HL-99871234",
+        "claimant_name": "Rohan Sharma",
+        "claim_amount": "Rs. 82,450.00",
+        "incident_date": "05/02/2026",
+    }
+    blocking = zip(
+        ("blocking: policy_number", "blocking: claimant_name", "blocking: amount+date"),
+        blocking_queries(blocking_keys(sample), sample),
+    )
+    return [
+        ("list_claims_page", {}, recent, 51),
+        ("list_claims_page(status)", {"status": "rejected"}, recent, 51),
+        ("get_claim_by_id", {"claim_id": f"{prefix}001"}, None, 1),
+        ("claim_id prefix (counter seed)", {"claim_id": {"$regex": f"^{prefix}"}}, None, 0),
+        *((name, q, _BLOCK_SORT, _BLOCK_LIMIT) for name, q in blocking),
+    ]
+
+
+def explain_hot_queries() -> list[dict[str, Any]]:
+    """
+    Run explain() on each hot query. Each report row has the query name, the plan
+    stages, the index used, keys/docs examined and "collscan" (True = full scan).
+    """
     coll = _claims_collection()
-    year = datetime.now(timezone.utc).strftime("%Y")
-    prefix = f"Claim_{year}_"
-    # Count docs with this prefix
-    n = coll.count_documents({"claim_id": {"$regex": f"^{prefix}"}})
-    return f"{prefix}{n + 1:03d}"
+    report = []
+    for name, q, sort, limit in _hot_queries():
+        cursor = coll.find(q)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        report.append(_plan_row(name, cursor.explain()))
+    plan = get_db().command(
+        "explain",
+        {"aggregate": coll.name, "pipeline": _STATUS_COUNTS_PIPELINE, "cursor": {}},
+        verbosity="executionStats",
+    )
+    report.append(_plan_row("count_claims_by_status", plan))
+    return report
+
+
+def _find_key(obj: Any, key: str) -> Optional[dict]:
+    """First dict stored under key anywhere in an explain() output (aggregations nest the plan)."""
+    if isinstance(obj, dict):
+        if isinstance(obj.get(key), dict):
+            return obj[key]
+        values = obj.values()
+    elif isinstance(obj, list):
+        values = obj
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_row(name: str, plan: dict[str, Any]) -> dict[str, Any]:
+    winning = (_find_key(plan, "queryPlanner") or {}).get("winningPlan", {})
+    nodes = list(_iter_plan_nodes(winning))
+    stages = [n["stage"] for n in nodes]
+    stats = _find_key(plan, "executionStats") or {}
+    return {
+        "query": name,
+        "stages": stages,
+        "indexes": sorted({n["indexName"] for n in nodes if n.get("indexName")}),
+        "collscan": "COLLSCAN" in stages,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+    }
@@ -1,105 +1,214 @@
-from typing import Any
+import re
+from typing import Any, Optional
 
+from .blocking import is_placeholder, normalize_amount, normalize_date, normalize_name, normalize_policy_number
 
-def extract_key_fields(text: str) -> dict[str, Any]:
-    """
-    Simple heuristic extraction of key fields from claim text.
-    Used as fallback; agent can override with structured extraction.
-    """
-    import re
-    fields = {
-        "claim_amount": None,
-        "claimant_name": None,
-        "incident_date": None,
-        "policy_number": None,
-    }
-    # Amount: ₹1.2L, Rs 50000, Treatment Cost 54,300; Hindi: दावा राशि, रकम, उपचार लागत
-    amount_patterns = [
-        r"treatment\s*cost[:\s]*[^\d]*([\d,]+(?:\.\d+)?)",
-        r"[Rr]s\.?\s*([\d,]+(?:\.\d+)?)\s*(?:L|Lakh)?",
-        r"₹\s*([\d,]+(?:\.\d+)?)\s*(?:L|Lakh)?",
-        r"([\d,]+(?:\.\d+)?)\s*(?:L|Lakh|INR)",
-        r"claim\s*amount[:\s]+([\d,]+(?:\.\d+)?)",
-        r"amount[:\s]+([\d,]+(?:\.\d+)?)",
-        r"(?:दावा\s*राशि|रकम|उपचार\s*लागत|लागत)[:\s]*[^\d]*([\d,]+(?:\.\d+)?)",
-    ]
-    for p in amount_patterns:
-        m = re.search(p, text, re.I)
-        if m:
-            fields["claim_amount"] = m.group(1).strip()
-            break
-
-    # Policy number: English and Hindi labels (पॉलिसी नंबर, नीति संख्या)
-    policy_m = re.search(r"policy\s*(?:no|number|#)?[:\s]*([A-Za-z0-9\-/]+)", text, re.I)
-    if not policy_m:
-        policy_m = re.search(r"(?:पॉलिसी\s*नंबर|नीति\s*संख्या|पॉलिसी\s*संख्या)[:\s]*([A-Za-z0-9\-/\u0900-\u097F]+)", text)
-    if policy_m:
-        fields["policy_number"] = policy_m.group(1).strip()
-
-    # Date: Date of Incident, incident date; Hindi: घटना की तारीख, तारीख, दिनांक
-    date_m = re.search(
-        r"date\s+of\s+incident[:\s]*(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})",
-        text,
-        re.I,
-    )
-    if date_m:
-        fields["incident_date"] = date_m.group(1).strip()
-    else:
-        date_m = re.search(
-            r"(?:घटना\s*की\s*तारीख|तारीख|दिनांक)[:\s]*(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})",
-            text,
-        )
-        if date_m:
-            fields["incident_date"] = date_m.group(1).strip()
-        else:
-            date_m = re.search(
-                r"(?:incident|date|loss|accident)\s*(?:date)?[:\s]*(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})",
-                text,
-                re.I,
-            )
-            if date_m:
-                fields["incident_date"] = date_m.group(1).strip()
-            else:
-                date_m = re.search(r"(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})", text)
-                if date_m:
-                    fields["incident_date"] = date_m.group(1).strip()
-
-    # Claimant name: any script (Hindi, Tamil, etc.) — use Unicode letters + spaces
-    # English: Policy Holder Name, claimant, name, insured; Hindi: नाम, नामधारक
-    name_pattern = r"[^\n:]{2,80}"  # after label, take up to 80 chars (any script)
-    name_m = re.search(
-        r"policy\s*holder\s*name[:\s]*(" + name_pattern + r")",
-        text,
-        re.I,
+# Fields the scanner returns, in the same order as the LLM extractor
+KEY_FIELDS = ("claimant_name", "policy_number", "claim_amount", "incident_date")
+
+# Field labels (English and Hindi) as (pattern, field, confidence), strongest first so the
+# alternation prefers "Policy Holder Name" over "Policy". Weak labels must be followed by
+# a colon; English labels must not sit inside a longer word. Generic labels ("Name:",
+# "Policy:") score below FIELD_SCANNER_MIN_CONFIDENCE even at line start, so a scan that
+# relies on them still goes to the LLM ("Name: Apollo Hospital Pvt Ltd").
+_EN = r"(?<![A-Za-z])(?:{})(?![A-Za-z])"
+_COLON = r"(?=[ \t]*(?:\([^)\n]{0,20}\))?[ \t]*[:：])"
+_LABELS: list[tuple[str, str, float]] = [
+    (_EN.format(
+        r"policy\s*holder(?:'s)?\s*name|claimant(?:'s)?\s*name|insured(?:'s)?\s*name|patient(?:'s)?\s*name"
+        r"|name\s+of\s+(?:the\s+)?(?:insured|claimant|patient|policy\s*holder)"
+    ), "claimant_name", 0.95),
+    (r"नामधारक\s*का\s*नाम|दावेदार\s*का\s*नाम|बीमित\s*का\s*नाम|मरीज़?\s*का\s*नाम", "claimant_name", 0.95),
+    (_EN.format(r"policy\s*(?:no\.?|number|num|#)"), "policy_number", 0.95),
+    (r"पॉलिसी\s*(?:नंबर|संख्या)|नीति\s*संख्या", "policy_number", 0.95),
+    (_EN.format(
+        r"claim(?:ed)?\s*amount|amount\s*claimed|total\s*claim(?:\s*amount)?|treatment\s*cost|total\s*(?:bill\s*)?amount"
+    ), "claim_amount", 0.95),
+    (r"दावा\s*राशि|उपचार\s*लागत|कुल\s*राशि", "claim_amount", 0.95),
+    (_EN.format(r"date\s*of\s*(?:incident|loss|accident)|(?:incident|loss|accident)\s*date"), "incident_date", 0.95),
+    (r"घटना\s*की\s*(?:तारीख|तिथि)", "incident_date", 0.95),
+    (_EN.format(r"date\s*of\s*admission|admission\s*date"), "incident_date", 0.8),
+    (r"नाम" + _COLON, "claimant_name", 0.65),
+    (_EN.format(r"claimant|insured|name") + _COLON, "claimant_name", 0.65),
+    (_EN.format(r"policy") + _COLON, "policy_number", 0.65),
+    (r"(?:" + _EN.format(r"amount") + r"|रकम|लागत|राशि)" + _COLON, "claim_amount", 0.65),
+    (r"(?:तारीख|दिनांक|तिथि)" + _COLON, "incident_date", 0.65),
+    (_EN.format(r"date"), "incident_date", 0.6),
+]
+_LABEL_RE = re.compile("|".join(f"(?P<l{i}>{p})" for i, (p, _, _) in enumerate(_LABELS)), re.I)
+
+# First word of every label. The scan looks for these with a regex that starts with a
+# single character class (which `re` skips through quickly) and tries _LABEL_RE only there.
+_TRIGGER_WORDS = (
+    "policy", "claimant", "claim", "insured", "patient", "name", "amount", "treatment", "total",
+    "date", "incident", "loss", "accident", "admission",
+    "नाम", "दावेदार", "बीमित", "मरीज", "पॉलिसी", "नीति", "दावा", "उपचार", "कुल", "रकम", "लागत", "राशि",
+    "घटना", "तारीख", "दिनांक", "तिथि",
+)
+
+
+def _trigger_pattern(words: tuple[str, ...]) -> str:
+    by_first: dict[str, list[str]] = {}
+    for w in words:
+        by_first.setdefault(w[0].lower(), []).append(re.escape(w[1:]))
+    first = "".join(sorted({c for f in by_first for c in (f, f.upper())}))
+    branches = "|".join(
+        f"(?<=[{f}{f.upper()}])(?i:{'|'.join(sorted(rests, key=len, reverse=True))})" for f, rests in by_first.items()
     )
-    if not name_m:
-        name_m = re.search(
-        r"(?:claimant|name|insured)[:\s]*(" + name_pattern + r")",
-        text,
+    return f"[{first}](?:{branches})"
+
+
+_TRIGGER_RE = re.compile(_trigger_pattern(_TRIGGER_WORDS))
+
+# Weak labels (below this confidence) score _LINE_START_BONUS higher at the start of a
+# line ("Name: ..." on a form vs "Hospital Name: ..." mid-line); still below _WEAK_LABEL
+_WEAK_LABEL = 0.8
+_LINE_START_BONUS = 0.1
+
+# Last resort when a field has no labelled value: currency-prefixed amounts, bare dates
+_BARE = {
+    "claim_amount": (re.compile(r"(?:(?<![A-Za-z])(?:rs\.?|inr)|₹)(?=\s*\d)", re.I), 0.6),
+    "incident_date": (re.compile(r"(?<![\d/.\-])(?=\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}(?![\d/.\-]))"), 0.4),
+}
+
+# Separator between label and value: optional "(INR)"-style note, then ":" / "-" / "#"
+_SEP_RE = re.compile(r"[ \t]*(?:\([^)\n]{0,20}\))?[ \t]*([:：\-–#]?)[ \t]*")
+
+# Values, matched right after a label
+_VALUE_RES = {
+    "claimant_name": re.compile(r"([^\W\d_][^\n:|\t]{1,79})"),
+    "policy_number": re.compile(r"([A-Za-z0-9ऀ-ॿ][A-Za-z0-9\-/ऀ-ॿ]{2,39})"),
+    "claim_amount": re.compile(
+        r"[^\d\n]{0,12}?(\d[\d,]*(?:\.\d+)?(?:\s*(?:crore|cr|lakhs?|lacs?|l)(?![A-Za-z]))?)", re.I
+    ),
+    "incident_date": re.compile(
+        r"[^\d\n]{0,6}?(\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}"
+        r"|\d{1,2}(?:st|nd|rd|th)?[ \-]?[A-Za-z]{3,9}[, \-]*\d{2,4})",
         re.I,
-    )
-    if not name_m:
-        name_m = re.search(r"(?:नामधारक\s*का\s*नाम|नाम)[:\s]*([^\n:]{2,80})", text)
-    if name_m:
-        fields["claimant_name"] = name_m.group(1).strip()[:80]
+    ),
+}
+
+_COLUMN_GAP = re.compile(r"\s{3,}")
+_POLICY_FORMAT = re.compile(r"^[A-Z]{1,6}[-/]?\d{4,}(?:[-/][A-Z0-9]+)*$|^\d{6,}$", re.I)
+_AMOUNT_FORMAT = re.compile(r"^\d{1,3}(?:,\d{2,3})*(?:\.\d+)?$|^\d+(?:\.\d+)?$")
+
+# Confidence at or above which the scanner stops looking for a field
+_SURE = 0.95
+
 
-    return fields
+def _value_factor(field: str, value: str) -> float:
+    """How well a value fits its field's format: 0 (invalid) to 1."""
+    if field == "claimant_name":
+        words = value.split()
+        if sum(ch.isalpha() for ch in value) < 2 or any(ch.isdigit() for ch in value) or len(words) > 6:
+            return 0.0
+        return 1.0 if len(words) >= 2 else 0.85
+    if field == "policy_number":
+        key = normalize_policy_number(value) or ""
+        if len(key) < 4 or not any(ch.isdigit() for ch in key):
+            return 0.0
+        return 1.0 if _POLICY_FORMAT.match(key) else 0.9
+    if field == "claim_amount":
+        normalized = normalize_amount(value)
+        if normalized is None or float(normalized) <= 0:
+            return 0.0
+        return 1.0 if _AMOUNT_FORMAT.match(value.split()[0].rstrip("Ll")) else 0.85
+    return 1.0 if normalize_date(value) else 0.0
+
+
+def _read_value(text: str, pos: int, field: str, conf: float, separated: bool = True) -> Optional[tuple[str, float]]:
+    """Format-checked value of field starting at pos, with its confidence (None if invalid)."""
+    if separated:
+        sep = _SEP_RE.match(text, pos)
+        pos = sep.end()
+        if not sep.group(1):
+            conf -= 0.1
+    value_m = _VALUE_RES[field].match(text, pos)
+    if not value_m:
+        return None
+    value = _COLUMN_GAP.split(value_m.group(1).strip(), 1)[0].strip(" .,;")
+    conf *= _value_factor(field, value)
+    return (value, round(conf, 3)) if conf > 0 else None
+
+
+def scan_key_fields(text: str) -> dict[str, Any]:
+    """
+    Single-pass regex scan for the four key claim fields (English and Hindi templates).
+    Every label match is followed by a format-checked value; the most confident value per
+    field wins. Returns {"fields": {field: value or None}, "confidence": {field: 0..1}}.
+    """
+    text = text or ""
+    fields: dict[str, Optional[str]] = dict.fromkeys(KEY_FIELDS)
+    confidence: dict[str, float] = dict.fromkeys(KEY_FIELDS, 0.0)
+    resume = 0
+    for trigger in _TRIGGER_RE.finditer(text):
+        if trigger.start() < resume:
+            continue
+        m = _LABEL_RE.match(text, trigger.start())
+        if not m:
+            continue
+        resume = m.end()
+        field, label_conf = _LABELS[int(m.lastgroup[1:])][1:]
+        if label_conf < _WEAK_LABEL and not text[text.rfind("\n", 0, m.start()) + 1 : m.start()].strip():
+            label_conf = min(label_conf + _LINE_START_BONUS, _WEAK_LABEL - 0.01)
+        if confidence[field] >= label_conf:
+            continue
+        found = _read_value(text, m.end(), field, label_conf)
+        if found and found[1] > confidence[field]:
+            fields[field], confidence[field] = found
+            if all(c >= _SURE for c in confidence.values()):
+                break
+    for field, (bare_re, conf) in _BARE.items():
+        if fields[field] is None:
+            for m in bare_re.finditer(text):
+                found = _read_value(text, m.end(), field, conf, separated=False)
+                if found:
+                    fields[field], confidence[field] = found
+                    break
+    return {"fields": fields, "confidence": confidence}
+
+
+def extract_key_fields(text: str) -> dict[str, Any]:
+    """
+    Heuristic extraction of key fields from claim text (see scan_key_fields).
+    Returns {claimant_name, policy_number, claim_amount, incident_date} (values or None).
+    """
+    return scan_key_fields(text)["fields"]
 
 
 # Critical fields that identify a distinct claim (policy, person, amount, date)
 CRITICAL_CLAIM_FIELDS = ("policy_number", "claimant_name", "claim_amount", "incident_date")
 
+# Fields come from the regex scanner or the LLM ("82,450" vs "Rs. 82,450"): compare normalized values
+_COMPARE_NORMALIZERS = {
+    "policy_number": normalize_policy_number,
+    "claimant_name": normalize_name,
+    "claim_amount": normalize_amount,
+    "incident_date": normalize_date,
+}
+
+
+def _comparable(field: str, value: Any) -> Optional[str]:
+    """Normalized value of a key field (raw trimmed text when it does not parse); None when empty or a placeholder."""
+    if value is None or is_placeholder(value):
+        return None
+    normalize = _COMPARE_NORMALIZERS.get(field)
+    normalized = normalize(value) if normalize else None
+    return normalized if normalized is not None else " ".join(str(value).split())
+
 
 def build_content_string_for_embedding(key_fields: dict[str, Any]) -> str:
     """
     Build a stable string from key fields for embedding (duplicate detection by claim content).
-    Used so similarity is based on claim identity, not form template or language.
+    Used so similarity is based on claim identity, not form template or language. Values
+    are normalized as in compute_differences, so the scanner and the LLM tier embed alike.
     """
-    parts = [
-        f"{k}: {v}" for k, v in sorted(key_fields.items())
-        if v is not None and str(v).strip()
-    ]
-    return " | ".join(parts) if parts else ""
+    parts = []
+    for k, v in sorted(key_fields.items()):
+        value = _comparable(k, v)
+        if value is not None:
+            parts.append(f"{k}: {value}")
+    return " | ".join(parts)
 
 
 def key_fields_indicate_different_claim(
@@ -120,15 +229,16 @@ def compute_differences(
     new_fields: dict[str, Any],
     existing_fields: dict[str, Any],
 ) -> list[dict[str, str]]:
-    """Compare two field dicts and return list of {field, old_value, new_value}."""
+    """
+    Compare two field dicts and return list of {field, old_value, new_value} (raw values)
+    for fields whose normalized values differ.
+    """
     diffs = []
     all_keys = set(new_fields) | set(existing_fields)
     for key in all_keys:
         ov = existing_fields.get(key)
         nv = new_fields.get(key)
-        if ov is None and nv is None:
-            continue
-        if ov != nv:
+        if _comparable(key, ov) != _comparable(key, nv):
             diffs.append({
                 "field": key,
                 "old_value": str(ov) if ov is not None else "—",
@@ -0,0 +1,122 @@
+"""
+Two-tier cache for embeddings keyed by (deployment, SHA-256 of normalized input).
+An in-process LRU sits in front of a MongoDB collection holding compact float32
+blobs. The deployment is part of every key, so changing AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+never serves stale vectors; `python -m services.maintenance purge-embedding-cache`
+reclaims the space of the old deployment's entries.
+"""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from bson.binary import Binary
+
+from config import settings
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_memory = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+
+
+def normalize_input(text: str) -> str:
+    """Whitespace-collapsed, truncated input actually sent to the embedding API."""
+    return " ".join(text.split())[:8000]
+
+
+def input_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _collection():
+    from .db import get_db
+
+    return get_db()[settings.MONGODB_EMBEDDING_CACHE_COLLECTION]
+
+
+def _persistent_enabled() -> bool:
+    return (settings.EMBEDDING_CACHE_BACKEND or "none").lower() == "mongo"
+
+
+def purge_other_deployments(keep: Optional[list[str]] = None) -> int:
+    """
+    Delete persisted vectors of every deployment not in keep (default: the current
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT). Run from services.maintenance after switching
+    deployments; entries of other deployments are never read, only kept until purged.
+    """
+    keep = keep or [settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT]
+    coll = _collection()
+    coll.create_index("deployment", name="deployment")
+    deleted = coll.delete_many({"deployment": {"$nin": keep}}).deleted_count
+    logger.info("Embedding cache: purged %s vectors from deployments other than %s", deleted, ", ".join(keep))
+    return deleted
+
+
+def get_many(deployment: str, hashes: list[str]) -> dict[str, list[float]]:
+    """Cached vectors for the given input hashes (hash → vector); misses are omitted."""
+    found: dict[str, list[float]] = {}
+    missing = []
+    for h in hashes:
+        vec = _memory.get((deployment, h))
+        if vec is not None:
+            found[h] = vec
+        else:
+            missing.append(h)
+    if not missing or not _persistent_enabled():
+        return found
+    try:
+        ids = [f"{deployment}:{h}" for h in missing]
+        for doc in _collection().find({"_id": {"$in": ids}}, {"vector": 1}):
+            h = doc["_id"].split(":", 1)[1]
+            vec = np.frombuffer(doc["vector"], dtype=np.float32).tolist()
+            found[h] = vec
+            _memory.put((deployment, h), vec)
+    except Exception as e:
+        logger.warning("Embedding cache read failed: %s", e)
+    return found
+
+
+def get(deployment: str, h: str) -> Optional[list[float]]:
+    return get_many(deployment, [h]).get(h)
+
+
+def put_many(deployment: str, vectors: dict[str, list[float]]) -> None:
+    """Store vectors (hash → vector) in both tiers; persistent-tier errors are logged, not raised."""
+    if not vectors:
+        return
+    for h, vec in vectors.items():
+        _memory.put((deployment, h), vec)
+    if not _persistent_enabled():
+        return
+    try:
+        from pymongo import ReplaceOne
+
+        now = datetime.now(timezone.utc)
+        ops = [
+            ReplaceOne(
+                {"_id": f"{deployment}:{h}"},
+                {
+                    "_id": f"{deployment}:{h}",
+                    "deployment": deployment,
+                    "dim": len(vec),
+                    "vector": Binary(np.asarray(vec, dtype=np.float32).tobytes()),
+                    "created_at": now,
+                },
+                upsert=True,
+            )
+            for h, vec in vectors.items()
+        ]
+        _collection().bulk_write(ops, ordered=False)
+    except Exception as e:
+        logger.warning("Embedding cache write failed: %s", e)
+
+
+def put(deployment: str, h: str, vector: list[float]) -> None:
+    put_many(deployment, {h: vector})
+
+
+def stats() -> dict[str, int]:
+    return _memory.stats()
@@ -0,0 +1,131 @@
+"""
+Storage format for claim embeddings.
+
+New claims store `embedding` as a BSON Binary vector (subtype 9, float32: 2-byte
+header + little-endian floats, ~6 KB for 1536 dims instead of ~14 KB of doubles),
+decoded zero-copy with np.frombuffer. With EMBEDDING_QUANTIZATION=int8 an extra
+`embedding_i8` (int8 Binary vector, symmetric per-vector scale) is stored for the
+in-memory index; cosine is scale-invariant, so the int8 vector needs no scale to rank.
+Readers accept every format: BSON array (legacy), raw float32 bytes, and Binary vectors.
+"""
+from typing import Any, Optional
+
+import numpy as np
+from bson.binary import Binary
+
+from config import settings
+
+# BSON Binary vector subtype and dtype header bytes (same layout as Binary.from_vector)
+_VECTOR_SUBTYPE = 9
+_DTYPE_FLOAT32 = 0x27
+_DTYPE_INT8 = 0x03
+
+
+def encode_embedding(vec: Any) -> Binary:
+    """float32 BSON Binary vector."""
+    arr = np.asarray(vec, dtype="<f4").ravel()
+    return Binary(bytes((_DTYPE_FLOAT32, 0)) + arr.tobytes(), _VECTOR_SUBTYPE)
+
+
+def quantize_int8(vec: Any) -> np.ndarray:
+    """Symmetric scalar quantization to int8 (max |x| maps to 127)."""
+    arr = np.asarray(vec, dtype=np.float32).ravel()
+    peak = float(np.max(np.abs(arr))) if arr.size else 0.0
+    if peak == 0.0:
+        return np.zeros(arr.shape, dtype=np.int8)
+    return np.clip(np.rint(arr * (127.0 / peak)), -127, 127).astype(np.int8)
+
+
+def encode_int8(vec: Any) -> Binary:
+    """int8 BSON Binary vector of quantize_int8(vec)."""
+    return Binary(bytes((_DTYPE_INT8, 0)) + quantize_int8(vec).tobytes(), _VECTOR_SUBTYPE)
+
+
+def decode_embedding(value: Any, dtype: Any = np.float32) -> Optional[np.ndarray]:
+    """
+    Stored embedding (any format) → 1-D numpy array, or None if absent/unreadable.
+    Binary payloads are views over the BSON bytes (no per-element decoding).
+    dtype=None keeps int8 vectors as int8 instead of converting to float32.
+    """
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        arr = value.ravel()
+    elif isinstance(value, Binary) and value.subtype == _VECTOR_SUBTYPE:
+        if len(value) < 2:
+            return None
+        kind = value[0]
+        if kind == _DTYPE_FLOAT32:
+            arr = np.frombuffer(value, dtype="<f4", offset=2)
+        elif kind == _DTYPE_INT8:
+            arr = np.frombuffer(value, dtype=np.int8, offset=2)
+        else:
+            return None
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        # Raw float32 blob (same encoding as the embedding cache)
+        arr = np.frombuffer(value, dtype="<f4")
+    else:
+        arr = np.asarray(value, dtype=np.float32).ravel()
+    if dtype is not None and arr.dtype != dtype:
+        arr = arr.astype(dtype)
+    return arr
+
+
+def is_compact(value: Any) -> bool:
+    """True if value is already stored as a Binary vector."""
+    return isinstance(value, Binary) and value.subtype == _VECTOR_SUBTYPE
+
+
+def int8_enabled() -> bool:
+    return (settings.EMBEDDING_QUANTIZATION or "none").lower() == "int8"
+
+
+def embedding_fields(vec: Any) -> dict[str, Binary]:
+    """Claim-document fields for an embedding: `embedding` plus `embedding_i8` when int8 is on."""
+    fields = {"embedding": encode_embedding(vec)}
+    if int8_enabled():
+        fields["embedding_i8"] = encode_int8(vec)
+    return fields
+
+
+def migrate_claim_embeddings(batch_size: int = 500, int8: Optional[bool] = None) -> dict[str, int]:
+    """
+    Rewrite stored claim embeddings in the compact format, streaming in _id order
+    (keyset batches, so it is safe to interrupt and rerun). Converts BSON arrays to
+    float32 Binary vectors and, with int8 (default: EMBEDDING_QUANTIZATION), fills in
+    missing embedding_i8. Returns {"scanned": n, "updated": n}.
+    """
+    from pymongo import UpdateOne
+
+    from .db import _claims_collection
+
+    int8 = int8_enabled() if int8 is None else int8
+    pending: list[dict[str, Any]] = [{"embedding": {"$type": "array"}}]
+    if int8:
+        pending.append({"embedding": {"$ne": None}, "embedding_i8": {"$exists": False}})
+    coll = _claims_collection()
+    last_id = None
+    scanned = updated = 0
+    while True:
+        q: dict[str, Any] = {"$or": pending}
+        if last_id is not None:
+            q["_id"] = {"$gt": last_id}
+        docs = list(coll.find(q, {"embedding": 1}).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        ops = []
+        for doc in docs:
+            vec = decode_embedding(doc.get("embedding"))
+            if vec is None or vec.size == 0:
+                continue
+            fields: dict[str, Any] = {}
+            if not is_compact(doc["embedding"]):
+                fields["embedding"] = encode_embedding(vec)
+            if int8:
+                fields["embedding_i8"] = encode_int8(vec)
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if ops:
+            updated += coll.bulk_write(ops, ordered=False).modified_count
+        scanned += len(docs)
+        last_id = docs[-1]["_id"]
+    return {"scanned": scanned, "updated": updated}
@@ -1,24 +1,90 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from openai import AzureOpenAI
 
 from config import settings
 
+from . import embedding_cache, metrics
+from .openai_client import call_with_retries, get_client
+
+# Zero vector for empty input (dim depends on model; 1536 for ada-002)
+_EMPTY_DIM = 1536
+
+
+def _pack_batches(inputs: list[str]) -> list[list[int]]:
+    """Group input positions into requests bounded by EMBEDDING_BATCH_SIZE and EMBEDDING_BATCH_MAX_CHARS."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    chars = 0
+    for i, text in enumerate(inputs):
+        if current and (
+            len(current) >= settings.EMBEDDING_BATCH_SIZE
+            or chars + len(text) > settings.EMBEDDING_BATCH_MAX_CHARS
+        ):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(i)
+        chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
 
-def _client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION,
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT.rstrip("/"),
+def _embed_batch(client: AzureOpenAI, deployment: str, inputs: list[str]) -> list[list[float]]:
+    resp = call_with_retries(
+        client.embeddings.create,
+        model=deployment,
+        input=inputs,
+        timeout=settings.OPENAI_TIMEOUT_S,
     )
+    return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+
+def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """
+    Embeddings for many texts, in input order. Identical inputs are embedded once,
+    cached vectors are reused, and the rest are sent in the largest batches the
+    deployment allows, with up to EMBEDDING_MAX_CONCURRENCY requests in flight.
+    """
+    deployment = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+    results: list[list[float] | None] = [None] * len(texts)
+    positions: dict[str, list[int]] = {}
+    normalized: dict[str, str] = {}
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = [0.0] * _EMPTY_DIM
+            continue
+        norm = embedding_cache.normalize_input(text)
+        h = embedding_cache.input_hash(norm)
+        positions.setdefault(h, []).append(i)
+        normalized[h] = norm
+
+    vectors = embedding_cache.get_many(deployment, list(positions))
+    todo = [h for h in positions if h not in vectors]
+    metrics.record_cache("embedding", hits=len(positions) - len(todo), misses=len(todo))
+    if todo:
+        client = get_client()
+        batches = [[todo[i] for i in b] for b in _pack_batches([normalized[h] for h in todo])]
+        workers = max(1, min(settings.EMBEDDING_MAX_CONCURRENCY, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Each request runs in a copy of the caller's context so its metrics join the current trace
+            contexts = [contextvars.copy_context() for _ in batches]
+            embedded = pool.map(
+                lambda ctx, batch: ctx.run(_embed_batch, client, deployment, [normalized[h] for h in batch]),
+                contexts,
+                batches,
+            )
+            fetched = {h: vec for batch, vecs in zip(batches, embedded) for h, vec in zip(batch, vecs)}
+        embedding_cache.put_many(deployment, fetched)
+        vectors.update(fetched)
+
+    for h, idxs in positions.items():
+        for i in idxs:
+            results[i] = vectors[h]
+    return results
 
 
 def get_embedding(text: str) -> list[float]:
-    """Get embedding for text using Azure OpenAI embedding deployment."""
-    if not text or not text.strip():
-        # Return zero vector for empty (dim depends on model; 1536 for ada-002)
-        return [0.0] * 1536
-    client = _client()
-    resp = client.embeddings.create(
-        model=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-        input=text.strip()[:8000],
-    )
-    return resp.data[0].embedding
+    """Get embedding for text using Azure OpenAI embedding deployment (cached by input hash)."""
+    return get_embeddings([text])[0]
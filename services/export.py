@@ -0,0 +1,191 @@
+"""
+Streaming export of the claims collection to Excel, CSV or Parquet.
+Rows are read from a MongoDB cursor in batches and written straight to a temp file
+(openpyxl write-only mode, csv.writer, or Parquet row groups), so memory use stays
+flat however many claims are exported.
+
+Exports without an explicit path go to a shared temp directory; sweep_exports removes
+files older than EXPORT_TTL_S that no session downloaded.
+"""
+import csv
+import importlib.util
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+from pymongo import DESCENDING
+
+from config import settings
+from .db import DASHBOARD_FIELDS, _claims_collection
+
+logger = logging.getLogger(__name__)
+
+# Header of each exported column (same labels as the dashboard table)
+COLUMN_LABELS = {
+    "claim_id": "Claim ID",
+    "compared_with": "Compared With",
+    "duplication_pct": "Duplication %",
+    "key_differences": "Key Differences",
+    "status": "Status",
+    "rejection_reason": "Rejection Reason",
+    "created_at": "Created",
+}
+
+FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_BATCH_SIZE = 2000
+
+# Excel's row limit per worksheet (header included); longer exports continue on new sheets
+_XLSX_MAX_ROWS = 1_048_576
+
+_EXPORT_DIR = os.path.join(tempfile.gettempdir(), "claim_exports")
+
+
+def _iter_batches(status: Optional[str], batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    q = {} if status is None else {"status": status}
+    cursor = (
+        _claims_collection()
+        .find(q, {f: 1 for f in DASHBOARD_FIELDS})
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .batch_size(batch_size)
+    )
+    batch: list[dict[str, Any]] = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _naive_utc(value: Any) -> Any:
+    # Excel has no time zones; store UTC wall time
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _write_xlsx(path: str, batches: Iterator[list[dict]], max_rows: int = _XLSX_MAX_ROWS) -> int:
+    """Sheets "Claims", "Claims (2)", ... of at most max_rows rows each, header included."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = None
+    rows = 0
+    n = 0
+    for batch in batches:
+        for doc in batch:
+            if ws is None or rows >= max_rows:
+                ws = wb.create_sheet("Claims" if ws is None else f"Claims ({len(wb.worksheets) + 1})")
+                ws.append([COLUMN_LABELS[f] for f in DASHBOARD_FIELDS])
+                rows = 1
+            ws.append([_naive_utc(doc.get(f)) for f in DASHBOARD_FIELDS])
+            rows += 1
+        n += len(batch)
+    if ws is None:
+        wb.create_sheet("Claims").append([COLUMN_LABELS[f] for f in DASHBOARD_FIELDS])
+    wb.save(path)
+    return n
+
+
+def _write_csv(path: str, batches: Iterator[list[dict]]) -> int:
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow([COLUMN_LABELS[f] for f in DASHBOARD_FIELDS])
+        for batch in batches:
+            writer.writerows(
+                [
+                    d.get(fld).isoformat() if isinstance(d.get(fld), datetime) else d.get(fld)
+                    for fld in DASHBOARD_FIELDS
+                ]
+                for d in batch
+            )
+            n += len(batch)
+    return n
+
+
+def _write_parquet(path: str, batches: Iterator[list[dict]]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).") from e
+
+    schema = pa.schema([
+        (COLUMN_LABELS[f], pa.timestamp("us", tz="UTC") if f == "created_at"
+         else pa.float64() if f == "duplication_pct" else pa.string())
+        for f in DASHBOARD_FIELDS
+    ])
+    n = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            columns = {}
+            for f in DASHBOARD_FIELDS:
+                values = [d.get(f) for d in batch]
+                if f not in ("created_at", "duplication_pct"):
+                    values = [None if v is None else str(v) for v in values]
+                columns[COLUMN_LABELS[f]] = values
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            n += len(batch)
+    return n
+
+
+_WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv, "parquet": _write_parquet}
+
+
+def available_formats() -> list[str]:
+    """Export formats whose writer library is installed (Parquet needs pyarrow)."""
+    return [fmt for fmt in _WRITERS if fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def sweep_exports(max_age_s: Optional[float] = None) -> int:
+    """Delete temp exports older than max_age_s (default EXPORT_TTL_S). Returns how many."""
+    max_age_s = settings.EXPORT_TTL_S if max_age_s is None else max_age_s
+    if not os.path.isdir(_EXPORT_DIR):
+        return 0
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for entry in os.scandir(_EXPORT_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def export_claims(
+    fmt: str = "xlsx",
+    status: Optional[str] = None,
+    path: Optional[str] = None,
+    batch_size: int = _BATCH_SIZE,
+) -> tuple[str, int]:
+    """
+    Write every claim (optionally only one status), newest first, to path (default: a
+    new file in the export temp directory, deleted by the caller or sweep_exports).
+    Returns (path, rows written).
+    """
+    writer = _WRITERS.get(fmt)
+    if writer is None:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(_WRITERS)}.")
+    if path is None:
+        os.makedirs(_EXPORT_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="claims_export_", suffix=f".{fmt}", dir=_EXPORT_DIR)
+        os.close(fd)
+    try:
+        n = writer(path, _iter_batches(status, batch_size))
+    except Exception:
+        os.unlink(path)
+        raise
+    logger.info("Exported %s claims to %s", n, path)
+    return path, n
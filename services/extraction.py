@@ -1,50 +1,84 @@
+import atexit
 import base64
+import contextvars
 import io
 import logging
-from typing import Optional
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
 
 import pdfplumber
 
 from config import settings
 
+from . import extraction_cache, metrics
+from .openai_client import call_with_retries, get_client
+
 logger = logging.getLogger(__name__)
 
 # Minimum characters from embedded text to skip OCR fallback
 _MIN_EMBEDDED_TEXT_LEN = 10
 
+# Render resolution for OCR
+_OCR_DPI = 200
+
+# Pages with less embedded text than this are OCR'd if they carry an image
+_MIN_PAGE_TEXT_LEN = 20
+
+# Rendered page counts as blank when under 0.05% of thumbnail pixels are darker than this grey level
+# (a single line of text is ~0.2%; speckle noise averages out in the thumbnail)
+_BLANK_DARK_LEVEL = 200
+_BLANK_DARK_FRACTION = 0.0005
+
 # Prompt for Azure vision OCR (same deployment as chat; gpt-4o-mini supports vision)
 _AZURE_OCR_PROMPT = """Extract all text from this document image. Preserve order, layout, and line breaks. Output plain text only, no markdown or commentary. If the document is in multiple languages (e.g. English and Hindi), include all text as it appears."""
 
 
-def _extract_with_azure_vision(file_bytes: bytes) -> str:
-    """Extract text from PDF using Azure OpenAI vision (gpt-4o-mini) on each page image."""
-    try:
-        from pdf2image import convert_from_bytes
-        from openai import AzureOpenAI
-    except ImportError as e:
-        logger.warning("Azure vision OCR unavailable (missing pdf2image or openai): %s", e)
-        return ""
-    if not settings.AZURE_OPENAI_API_KEY or not settings.AZURE_OPENAI_ENDPOINT:
-        logger.warning("Azure OpenAI not configured; skipping Azure vision OCR.")
-        return ""
-    try:
-        images = convert_from_bytes(file_bytes, dpi=200)
-    except Exception as e:
-        logger.warning("Could not convert PDF to images (install poppler): %s", e)
+def _encode_page_image(img: Any) -> str:
+    """Downscale and encode a page image as a data URL (JPEG by default to shrink payloads)."""
+    max_dim = settings.AZURE_OCR_MAX_DIM
+    if max_dim and max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim))
+    buf = io.BytesIO()
+    if settings.AZURE_OCR_IMAGE_FORMAT.lower() in ("jpeg", "jpg"):
+        img.convert("RGB").save(buf, format="JPEG", quality=settings.AZURE_OCR_JPEG_QUALITY, optimize=True)
+        mime = "image/jpeg"
+    else:
+        img.save(buf, format="PNG")
+        mime = "image/png"
+    b64 = base64.standard_b64encode(buf.getvalue()).decode("utf-8")
+    return f"data:{mime};base64,{b64}"
+
+
+def _azure_vision_page(pdf_path: str, page_no: int) -> str:
+    """Render, encode and transcribe one page; retried up to AZURE_OCR_PAGE_RETRIES times."""
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(pdf_path, dpi=_OCR_DPI, first_page=page_no, last_page=page_no)
+    if not images or _is_blank_image(images[0]):
         return ""
-    client = AzureOpenAI(
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION,
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT.rstrip("/"),
-    )
-    text_parts = []
-    for i, img in enumerate(images):
+    url = _encode_page_image(images[0])
+    del images
+    last_error: Optional[Exception] = None
+    for _ in range(settings.AZURE_OCR_PAGE_RETRIES + 1):
         try:
-            buf = io.BytesIO()
-            img.save(buf, format="PNG")
-            b64 = base64.standard_b64encode(buf.getvalue()).decode("utf-8")
-            url = f"data:image/png;base64,{b64}"
-            resp = client.chat.completions.create(
+            # Transient HTTP failures (429/5xx) are already retried with backoff here
+            resp = call_with_retries(
+                get_client().chat.completions.create,
                 model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
                 messages=[
                     {
@@ -57,61 +91,438 @@ def _extract_with_azure_vision(file_bytes: bytes) -> str:
                 ],
                 temperature=0.0,
                 max_tokens=4096,
+                timeout=settings.OPENAI_VISION_TIMEOUT_S,
             )
             content = (resp.choices[0].message.content or "").strip()
             if content:
-                text_parts.append(content)
+                return content
         except Exception as e:
-            logger.warning("Azure vision OCR failed for page %s: %s", i + 1, e)
-    return "\n\n".join(p.strip() for p in text_parts if p and p.strip())
+            last_error = e
+    if last_error is not None:
+        raise last_error
+    return ""
 
 
-def _extract_with_ocr(file_bytes: bytes) -> str:
-    """Extract text from PDF using Tesseract OCR (for image-only / screenshot PDFs).
-    Uses TESSERACT_LANG from config (e.g. 'eng', 'hin+eng' for Hindi+English)."""
+def _ocr_pages_with_azure_vision(file_bytes: bytes, pages: list[int]) -> dict[int, str]:
+    """
+    Azure OpenAI vision (gpt-4o-mini) OCR of the given 1-based pages, with up to
+    AZURE_OCR_CONCURRENCY page requests in flight. Returns {page_no: text} for pages
+    that produced text; failed pages are left out so the caller can fall back per page.
+    """
     try:
-        from pdf2image import convert_from_bytes
-        import pytesseract
-        from config import settings
+        import pdf2image  # noqa: F401
     except ImportError as e:
-        logger.warning("OCR fallback unavailable (missing pdf2image or pytesseract): %s", e)
+        logger.warning("Azure vision OCR unavailable (missing pdf2image): %s", e)
+        return {}
+    if not settings.AZURE_OPENAI_API_KEY or not settings.AZURE_OPENAI_ENDPOINT:
+        logger.warning("Azure OpenAI not configured; skipping Azure vision OCR.")
+        return {}
+    results: dict[int, str] = {}
+    with _as_temp_pdf(file_bytes) as pdf_path:
+        workers = max(1, min(settings.AZURE_OCR_CONCURRENCY, len(pages)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Per-page context copies keep token usage and retries on the caller's metrics trace
+            futures = {pool.submit(contextvars.copy_context().run, _azure_vision_page, pdf_path, p): p for p in pages}
+            for fut in as_completed(futures):
+                page_no = futures[fut]
+                try:
+                    text = fut.result()
+                except Exception as e:
+                    logger.warning("Azure vision OCR failed for page %s: %s", page_no, e)
+                    continue
+                if text:
+                    results[page_no] = text
+    return results
+
+
+@contextmanager
+def _as_temp_pdf(file_bytes: bytes) -> Iterator[str]:
+    """PDF bytes in a temp file, so pages can be rendered one at a time by path."""
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(file_bytes)
+        tmp.flush()
+        yield tmp.name
+
+
+def _pdf_page_count(file_bytes: bytes) -> int:
+    """Page count via poppler's pdfinfo (no rendering)."""
+    from pdf2image import pdfinfo_from_bytes
+
+    return int(pdfinfo_from_bytes(file_bytes)["Pages"])
+
+
+def _ocr_worker_init() -> None:
+    # One tesseract thread per worker process; parallelism comes from the pool
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _is_blank_image(img: Any) -> bool:
+    """Near-uniform page (blank scan, separator sheet): too few dark pixels to hold text."""
+    small = img.convert("L")
+    small.thumbnail((256, 256))
+    hist = small.histogram()
+    dark = sum(hist[:_BLANK_DARK_LEVEL])
+    return dark / max(1, small.width * small.height) < _BLANK_DARK_FRACTION
+
+
+def _ocr_page(pdf_path: str, page_no: int, lang: str) -> str:
+    """Render one page (first_page/last_page) and OCR it. Runs in an OCR worker process."""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    images = convert_from_path(pdf_path, dpi=_OCR_DPI, first_page=page_no, last_page=page_no)
+    if not images or _is_blank_image(images[0]):
         return ""
+    return pytesseract.image_to_string(images[0], lang=lang)
+
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lock = threading.Lock()
+
+
+def _ocr_workers() -> int:
+    return settings.OCR_WORKERS or os.cpu_count() or 1
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    """Process-wide OCR pool sized to the cores (forkserver: safe to start from threaded apps)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=_ocr_workers(), mp_context=ctx, initializer=_ocr_worker_init
+            )
+        return _ocr_pool
+
+
+def _reset_ocr_pool() -> None:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+        _ocr_pool = None
+
+
+atexit.register(_reset_ocr_pool)
+
+
+def _ocr_pages_with_tesseract(file_bytes: bytes, pages: Optional[list[int]] = None) -> dict[int, str]:
+    """
+    Tesseract OCR of the given 1-based pages (default: all), fanned out to the OCR process
+    pool one page at a time. At most 2 pages per worker are in flight, so peak memory is
+    bounded by pool size, not page count. OCR_MAX_PAGES and OCR_TIME_BUDGET_S cap the work
+    per document. Returns {page_no: text} for pages that finished.
+    """
     try:
-        images = convert_from_bytes(file_bytes, dpi=200)
-    except Exception as e:
-        logger.warning("Could not convert PDF to images (install poppler): %s", e)
-        return ""
+        import pdf2image  # noqa: F401
+        import pytesseract  # noqa: F401
+    except ImportError as e:
+        logger.warning("OCR fallback unavailable (missing pdf2image or pytesseract): %s", e)
+        return {}
+    if pages is None:
+        try:
+            pages = list(range(1, _pdf_page_count(file_bytes) + 1))
+        except Exception as e:
+            logger.warning("Could not read PDF page count (install poppler): %s", e)
+            return {}
+    if len(pages) > settings.OCR_MAX_PAGES:
+        logger.warning("OCR limited to first %s of %s pages", settings.OCR_MAX_PAGES, len(pages))
+        pages = pages[: settings.OCR_MAX_PAGES]
+    if not pages:
+        return {}
     lang = getattr(settings, "TESSERACT_LANG", "eng") or "eng"
-    text_parts = []
-    for img in images:
+    deadline = time.monotonic() + settings.OCR_TIME_BUDGET_S
+    results: dict[int, str] = {}
+
+    with _as_temp_pdf(file_bytes) as pdf_path:
+        if len(pages) == 1 or _ocr_workers() <= 1:
+            for page_no in pages:
+                if time.monotonic() > deadline:
+                    logger.warning("OCR time budget exhausted after %s pages", len(results))
+                    break
+                try:
+                    results[page_no] = _ocr_page(pdf_path, page_no, lang)
+                except Exception as e:
+                    logger.warning("Tesseract OCR failed on page %s (lang=%s, install tesseract and language pack): %s", page_no, lang, e)
+            return results
+
+        pool = _get_ocr_pool()
+        window = _ocr_workers() * 2
+        queue = list(pages)
+        in_flight: dict[Future, int] = {}
+        try:
+            while queue or in_flight:
+                while queue and len(in_flight) < window:
+                    page_no = queue.pop(0)
+                    in_flight[pool.submit(_ocr_page, pdf_path, page_no, lang)] = page_no
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("OCR time budget exhausted; %s pages not OCR'd", len(queue) + len(in_flight))
+                    break
+                done, _ = wait(in_flight, timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    page_no = in_flight.pop(fut)
+                    try:
+                        results[page_no] = fut.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        logger.warning("Tesseract OCR failed on page %s (lang=%s, install tesseract and language pack): %s", page_no, lang, e)
+        except BrokenProcessPool as e:
+            logger.warning("OCR worker pool crashed: %s", e)
+            _reset_ocr_pool()
+        finally:
+            for fut in in_flight:
+                fut.cancel()
+    return results
+
+
+def _join_pages(page_texts: dict[int, str]) -> str:
+    """Reassemble per-page text in page order."""
+    return "\n\n".join(
+        page_texts[p].strip() for p in sorted(page_texts) if page_texts[p] and page_texts[p].strip()
+    )
+
+
+def _ocr_pages(file_bytes: bytes, pages: list[int]) -> tuple[dict[int, str], str, bool]:
+    """
+    OCR the given pages: Azure vision first if enabled, then Tesseract for every page
+    Azure did not return text for. Returns ({page_no: text}, engine label, degraded);
+    degraded is True when some page was never OCR'd (engine failure, OCR_MAX_PAGES,
+    time budget), as opposed to OCR'd and found empty.
+    Tesseract uses TESSERACT_LANG from config (e.g. 'eng', 'hin+eng' for Hindi+English).
+    """
+    texts: dict[int, str] = {}
+    engines = []
+    if settings.USE_AZURE_OCR:
+        texts = _ocr_pages_with_azure_vision(file_bytes, pages)
+        if texts:
+            engines.append("azure_vision")
+    missing = [p for p in pages if not (texts.get(p) or "").strip()]
+    degraded = False
+    if missing:
+        finished = _ocr_pages_with_tesseract(file_bytes, missing)
+        degraded = any(p not in finished for p in missing)
+        tess = {p: t for p, t in finished.items() if t and t.strip()}
+        if tess:
+            engines.append("tesseract")
+        texts.update(tess)
+    return texts, "+".join(engines) or "none", degraded
+
+
+class _EngineBudgetExceeded(Exception):
+    """A text-layer engine ran past its time or memory cap."""
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc); None where unavailable."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _EngineBudget:
+    """Per-engine time and memory cap, checked between pages."""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.deadline = time.monotonic() + settings.EXTRACT_ENGINE_TIMEOUT_S
+        self.rss_start = _rss_bytes()
+
+    def check(self, page_no: int) -> None:
+        if time.monotonic() > self.deadline:
+            raise _EngineBudgetExceeded(
+                f"{self.engine}: time cap {settings.EXTRACT_ENGINE_TIMEOUT_S}s hit at page {page_no}"
+            )
+        rss = _rss_bytes()
+        if rss is not None and self.rss_start is not None:
+            grown_mb = (rss - self.rss_start) / (1024 * 1024)
+            if grown_mb > settings.EXTRACT_ENGINE_MAX_MEMORY_MB:
+                raise _EngineBudgetExceeded(
+                    f"{self.engine}: memory cap {settings.EXTRACT_ENGINE_MAX_MEMORY_MB}MB hit at page {page_no}"
+                )
+
+
+def _pypdf_has_image(resources: Any, depth: int = 0) -> bool:
+    """True if a page/form resource dict references an image XObject (no image decoding)."""
+    try:
+        resources = resources.get_object() if resources is not None else None
+        xobjects = resources.get("/XObject") if resources else None
+        if not xobjects:
+            return False
+        for ref in xobjects.get_object().values():
+            obj = ref.get_object()
+            subtype = obj.get("/Subtype")
+            if subtype == "/Image":
+                return True
+            if subtype == "/Form" and depth < 2 and _pypdf_has_image(obj.get("/Resources"), depth + 1):
+                return True
+        return False
+    except Exception:
+        # Unreadable resources: assume an image so the page is not silently dropped
+        return True
+
+
+def _pages_with_pypdf(file_bytes: bytes) -> list[tuple[str, bool]]:
+    """Cheap text-layer read (no layout analysis). Returns [(text, has_image)] per page."""
+    from pypdf import PdfReader
+
+    budget = _EngineBudget("pypdf")
+    reader = PdfReader(io.BytesIO(file_bytes))
+    pages = []
+    for i, page in enumerate(reader.pages, start=1):
+        budget.check(i)
+        pages.append((page.extract_text() or "", _pypdf_has_image(page.get("/Resources"))))
+    return pages
+
+
+def _pages_with_pdfplumber(file_bytes: bytes) -> list[tuple[str, bool]]:
+    """Layout-aware text extraction; pages are closed as we go to keep memory flat."""
+    budget = _EngineBudget("pdfplumber")
+    pages = []
+    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        for i, page in enumerate(pdf.pages, start=1):
+            budget.check(i)
+            pages.append((page.extract_text() or "", bool(page.images)))
+            page.close()
+    return pages
+
+
+# Text-layer engines, cheapest first (EXTRACT_TEXT_ENGINES selects and orders them)
+_TEXT_ENGINES = {
+    "pypdf": _pages_with_pypdf,
+    "pdfplumber": _pages_with_pdfplumber,
+}
+
+_CID_GLYPH = re.compile(r"\(cid:\d+\)")
+
+
+def _text_layer_ok(page_texts: list[str]) -> bool:
+    """Heuristic: enough text, few undecodable glyphs, and words that are not run together."""
+    text = "\n\n".join(t for t in page_texts if t)
+    stripped = text.strip()
+    if len(stripped) < _MIN_EMBEDDED_TEXT_LEN:
+        return False
+    bad = stripped.count("\ufffd") + len(_CID_GLYPH.findall(stripped)) * 6
+    if bad / len(stripped) > 0.05:
+        return False
+    words = stripped.split()
+    return sum(len(w) for w in words) / len(words) <= 25
+
+
+def _classify_page(text: str, has_image: bool) -> str:
+    """'text' (usable text layer), 'image' (needs OCR) or 'blank' (nothing to read)."""
+    if len(text.strip()) >= _MIN_PAGE_TEXT_LEN:
+        return "text"
+    if has_image:
+        return "image"
+    return "text" if text.strip() else "blank"
+
+
+def _needs_escalation(pages: list[tuple[str, bool]]) -> bool:
+    """Try the next text engine? Only if the text layer looks poor, or nothing at all was found."""
+    text_pages = [t for t, img in pages if _classify_page(t, img) == "text"]
+    if text_pages:
+        return not _text_layer_ok(text_pages)
+    return not any(img for _, img in pages)
+
+
+def _extract_uncached(file_bytes: bytes) -> dict[str, Any]:
+    """
+    Run the extraction engine chain: cheap pypdf text layer, pdfplumber when that looks
+    poor, then per-page OCR of image-only pages (text-layer and blank pages are not OCR'd).
+    When the whole text layer is under _MIN_EMBEDDED_TEXT_LEN, "blank" pages are OCR'd too:
+    inline images and outlined text are not detected as images, and truly empty pages are
+    skipped cheaply by the blank-image check.
+    The returned engine names the engines that contributed, e.g. "pypdf+tesseract";
+    ocr_pages maps each OCR'd page number (as a string) to its raw OCR text; degraded is
+    True when some pages that needed OCR were not OCR'd (see _ocr_pages).
+    """
+    chosen: Optional[tuple[str, list[tuple[str, bool]]]] = None
+    last_error: Optional[Exception] = None
+    for name in [e.strip() for e in settings.EXTRACT_TEXT_ENGINES.split(",") if e.strip()]:
+        engine_fn = _TEXT_ENGINES.get(name)
+        if engine_fn is None:
+            logger.warning("Unknown text extraction engine %r", name)
+            continue
         try:
-            text_parts.append(pytesseract.image_to_string(img, lang=lang))
+            with metrics.span(f"text:{name}"):
+                pages = engine_fn(file_bytes)
+        except _EngineBudgetExceeded as e:
+            logger.warning("Text engine aborted, escalating: %s", e)
+            continue
         except Exception as e:
-            logger.warning("Tesseract OCR failed (lang=%s, install tesseract and language pack): %s", lang, e)
-            return ""
-    return "\n\n".join(p.strip() for p in text_parts if p and p.strip())
+            logger.warning("Text engine %s failed: %s", name, e)
+            last_error = e
+            continue
+        if not _needs_escalation(pages):
+            chosen = (name, pages)
+            break
+        if chosen is None or sum(len(t) for t, _ in pages) > sum(len(t) for t, _ in chosen[1]):
+            chosen = (name, pages)
+    if chosen is None:
+        if last_error is None:
+            return {"text": "", "engine": "none", "page_count": None, "ocr_pages": None}
+        return {"text": f"[Extraction error: {last_error}]", "engine": "error", "page_count": None, "ocr_pages": None}
+
+    text_engine, pages = chosen
+    page_count = len(pages)
+    kinds = [_classify_page(t, img) for t, img in pages]
+    texts = {i: t for i, ((t, _), kind) in enumerate(zip(pages, kinds), start=1) if kind == "text"}
+    image_pages = [i for i, kind in enumerate(kinds, start=1) if kind == "image"]
+    if sum(len(t.strip()) for t, _ in pages) < _MIN_EMBEDDED_TEXT_LEN:
+        image_pages = [i for i, kind in enumerate(kinds, start=1) if kind in ("image", "blank")]
+    engines = [text_engine] if texts else []
+    ocr_texts: dict[int, str] = {}
+    degraded = False
+
+    # OCR only image pages (and blank ones, see above): Azure vision first if enabled, else
+    # Tesseract; per-page fallback to Tesseract
+    if image_pages:
+        with metrics.span("ocr"):
+            ocr_texts, ocr_engine, degraded = _ocr_pages(file_bytes, image_pages)
+        if ocr_texts:
+            engines.append(ocr_engine)
+        for p in image_pages:
+            # Keep any short embedded text (e.g. a caption) when OCR yields nothing
+            texts[p] = ocr_texts.get(p) or pages[p - 1][0]
+    return {
+        "text": _join_pages(texts),
+        "engine": "+".join(engines) or "none",
+        "page_count": page_count,
+        "ocr_pages": {str(p): t for p, t in sorted(ocr_texts.items())} or None,
+        "degraded": degraded,
+    }
+
+
+def extract_pdf(file_bytes: bytes, filename: str = "") -> dict[str, Any]:
+    """
+    Extract text from PDF bytes, served from the SHA-256 extraction cache when the same
+    file was seen before. Returns {"text", "engine", "page_count", "ocr_pages", "sha256",
+    "cached", "degraded"}; degraded means some pages could not be OCR'd (see _ocr_pages).
+    """
+    sha256 = extraction_cache.file_sha256(file_bytes)
+    cached = extraction_cache.get(sha256)
+    metrics.record_cache("extraction", hits=int(cached is not None), misses=int(cached is None))
+    if cached is not None:
+        return {**cached, "sha256": sha256, "cached": True, "degraded": False}
+    result = _extract_uncached(file_bytes)
+    degraded = result["degraded"]
+    # Only cache complete, usable text; errors, empty OCR and partial OCR (failed pages,
+    # page or time budget hit; possibly transient) are retried next time
+    if (
+        result["engine"] != "error"
+        and not degraded
+        and len((result["text"] or "").strip()) >= _MIN_EMBEDDED_TEXT_LEN
+    ):
+        extraction_cache.put(sha256, result)
+    return {**result, "sha256": sha256, "cached": False}
 
 
 def extract_text_from_pdf(file_bytes: bytes, filename: str = "") -> str:
-    """Extract plain text from PDF: embedded text via pdfplumber, then OCR fallback for image-only PDFs."""
-    text_parts = []
-    try:
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            for page in pdf.pages:
-                t = page.extract_text()
-                if t:
-                    text_parts.append(t)
-    except Exception as e:
-        return f"[Extraction error: {e}]"
-    result = "\n\n".join(text_parts) if text_parts else ""
-    if result.strip() and len(result.strip()) >= _MIN_EMBEDDED_TEXT_LEN:
-        return result
-    # OCR path: Azure vision first if enabled, else Tesseract; fallback to Tesseract on Azure failure
-    ocr_text = ""
-    if settings.USE_AZURE_OCR:
-        ocr_text = _extract_with_azure_vision(file_bytes)
-    if not ocr_text or len(ocr_text.strip()) < _MIN_EMBEDDED_TEXT_LEN:
-        ocr_text = _extract_with_ocr(file_bytes)
-    if ocr_text and len(ocr_text.strip()) >= _MIN_EMBEDDED_TEXT_LEN:
-        return ocr_text
-    return result if result else ocr_text
+    """Extract plain text from PDF: embedded text via pypdf/pdfplumber, then OCR fallback for image-only PDFs."""
+    return extract_pdf(file_bytes, filename)["text"]
@@ -0,0 +1,165 @@
+"""
+Content-addressed cache for PDF text extraction, keyed by SHA-256 of the file bytes.
+Two tiers: an in-process LRU, then a persistent store (MongoDB collection or a
+local directory, per EXTRACTION_CACHE_BACKEND). Entries hold the extracted text,
+the engine that produced it, the page count and the raw OCR text per OCR'd page,
+and expire after EXTRACTION_CACHE_TTL_S.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from config import settings
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction output for the same bytes changes (page assembly, OCR routing,
+# cleanup), so entries written by older code are no longer served
+EXTRACTION_VERSION = 3
+
+_memory = LRUCache(settings.EXTRACTION_CACHE_SIZE, ttl=settings.EXTRACTION_CACHE_TTL_S)
+_counter_lock = threading.Lock()
+_persistent_hits = 0
+_misses = 0
+_indexes_ready = False
+
+
+def file_sha256(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def cache_key(sha256: str) -> str:
+    """
+    Key includes the extraction version, the text engine chain and the OCR settings, so
+    changing any of them does not serve text produced the old way.
+    """
+    engines = "+".join(e.strip() for e in settings.EXTRACT_TEXT_ENGINES.split(",") if e.strip())
+    ocr = "azure" if settings.USE_AZURE_OCR else "tess"
+    return f"{sha256}:v{EXTRACTION_VERSION}:{engines}:{ocr}:{settings.TESSERACT_LANG}"
+
+
+_ENTRY_FIELDS = ("engine", "page_count", "ocr_pages")
+
+
+def _entry(doc: dict[str, Any]) -> dict[str, Any]:
+    return {"text": doc.get("text", ""), **{k: doc.get(k) for k in _ENTRY_FIELDS}}
+
+
+def _backend() -> str:
+    return (settings.EXTRACTION_CACHE_BACKEND or "none").lower()
+
+
+def _mongo_collection():
+    """The cache collection, with its TTL index on created_at (created once per process)."""
+    global _indexes_ready
+    from pymongo import ASCENDING, IndexModel
+
+    from .db import get_db
+
+    coll = get_db()[settings.MONGODB_EXTRACTION_CACHE_COLLECTION]
+    if not _indexes_ready:
+        coll.create_indexes([
+            IndexModel(
+                [("created_at", ASCENDING)], name="created_ttl", expireAfterSeconds=int(settings.EXTRACTION_CACHE_TTL_S)
+            ),
+        ])
+        _indexes_ready = True
+    return coll
+
+
+def _mongo_get(key: str) -> Optional[dict[str, Any]]:
+    doc = _mongo_collection().find_one({"_id": key})
+    if doc is None:
+        return None
+    return _entry(doc)
+
+
+def _mongo_put(key: str, sha256: str, entry: dict[str, Any]) -> None:
+    _mongo_collection().replace_one(
+        {"_id": key},
+        {"_id": key, "sha256": sha256, **entry, "created_at": datetime.now(timezone.utc)},
+        upsert=True,
+    )
+
+
+def _disk_path(key: str) -> Path:
+    safe = key.replace(":", "_").replace("+", "-")
+    return Path(settings.EXTRACTION_CACHE_DIR) / safe[:2] / f"{safe}.json"
+
+
+def _disk_get(key: str) -> Optional[dict[str, Any]]:
+    path = _disk_path(key)
+    if not path.exists():
+        return None
+    if time.time() - path.stat().st_mtime > settings.EXTRACTION_CACHE_TTL_S:
+        path.unlink(missing_ok=True)
+        return None
+    return _entry(json.loads(path.read_text(encoding="utf-8")))
+
+
+def _disk_put(key: str, sha256: str, entry: dict[str, Any]) -> None:
+    path = _disk_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"sha256": sha256, **entry}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def get(sha256: str) -> Optional[dict[str, Any]]:
+    """Cached {text, engine, page_count, ocr_pages} for these file bytes, or None (counts a miss)."""
+    global _persistent_hits, _misses
+    key = cache_key(sha256)
+    entry = _memory.get(key)
+    if entry is not None:
+        return entry
+    backend = _backend()
+    try:
+        if backend == "mongo":
+            entry = _mongo_get(key)
+        elif backend == "disk":
+            entry = _disk_get(key)
+    except Exception as e:
+        logger.warning("Extraction cache read failed (%s): %s", backend, e)
+        entry = None
+    with _counter_lock:
+        if entry is None:
+            _misses += 1
+        else:
+            _persistent_hits += 1
+    if entry is not None:
+        _memory.put(key, entry)
+    return entry
+
+
+def put(sha256: str, entry: dict[str, Any]) -> None:
+    """Store an extraction result in both tiers (persistent-tier errors are logged, not raised)."""
+    key = cache_key(sha256)
+    entry = _entry(entry)
+    _memory.put(key, entry)
+    backend = _backend()
+    try:
+        if backend == "mongo":
+            _mongo_put(key, sha256, entry)
+        elif backend == "disk":
+            _disk_put(key, sha256, entry)
+    except Exception as e:
+        logger.warning("Extraction cache write failed (%s): %s", backend, e)
+
+
+def stats() -> dict[str, int]:
+    """Hit/miss counters since process start."""
+    mem = _memory.stats()
+    return {
+        "memory_hits": mem["hits"],
+        "persistent_hits": _persistent_hits,
+        "misses": _misses,
+        "memory_size": mem["size"],
+    }
@@ -0,0 +1,320 @@
+"""
+Headless bulk ingestion: run the verification pipeline over a directory or manifest
+of claim PDFs with a pool of worker processes.
+
+    python -m services.ingest /data/claims --workers 8 --batch-size 100
+    python -m services.ingest manifest.txt --report run.jsonl --checkpoint run.ckpt
+
+Workers extract, classify, embed and match each file without writing; the parent
+allocates claim IDs and inserts finished claims with one bulk_write per batch, then
+records the paths in the checkpoint file. Before each insert, the parent re-matches
+every claim against the claims this run saved after its file was submitted (and those
+earlier in the batch), which its worker could not see, so duplicates within a run are
+caught too. A crashed or interrupted run resumes from the checkpoint. Saved claims and
+deterministic rejections (unreadable or non-claim documents) are checkpointed; files
+that failed in a way that may pass next time (OpenAI/Mongo errors, partial OCR) are
+retried. Every file gets one line in the JSONL report, followed by a summary line with
+throughput statistics.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Fields copied from the pipeline result into each report line
+_REPORT_FIELDS = (
+    "success", "claim_id", "status", "compared_with", "duplication_pct", "rejection_reason", "error", "retryable",
+    "timings",
+)
+
+
+# --- Input -------------------------------------------------------------------------
+
+
+def iter_sources(source: str) -> Iterator[str]:
+    """
+    Yield PDF paths from a directory (recursive, sorted) or a manifest file:
+    .jsonl with one {"path": ...} object per line, or plain text with one path per line.
+    Relative manifest paths are resolved against the manifest's directory.
+    """
+    src = Path(source)
+    if src.is_dir():
+        for p in sorted(src.rglob("*")):
+            if p.is_file() and p.suffix.lower() == ".pdf":
+                yield str(p)
+        return
+    base = src.parent
+    with open(src, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if src.suffix.lower() == ".jsonl":
+                line = str(json.loads(line).get("path") or "")
+                if not line:
+                    continue
+            p = Path(line)
+            yield str(p if p.is_absolute() else base / p)
+
+
+def load_checkpoint(path: str | None) -> set[str]:
+    """Paths already committed by a previous run."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+# --- Worker --------------------------------------------------------------------------
+
+
+def _worker_init() -> None:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def _process_file(path: str) -> dict[str, Any]:
+    """Run the pipeline on one file without persisting; returns the result plus timing."""
+    from .pipeline import run_verification
+    from .similarity import refresh_similarity_index
+
+    start = time.perf_counter()
+    size = 0
+    try:
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        size = len(file_bytes)
+        # Pick up claims the parent inserted since this worker last looked
+        try:
+            refresh_similarity_index()
+        except Exception as e:
+            logger.warning("Similarity index refresh failed: %s", e)
+        result = run_verification(file_bytes, os.path.basename(path), persist=False)
+    except Exception as e:
+        result = {"success": False, "claim_id": None, "error": f"{e.__class__.__name__}: {e}", "retryable": True}
+    return {"path": path, "bytes": size, "seconds": time.perf_counter() - start, "result": result}
+
+
+# --- Parent: batching, persistence, report -----------------------------------------------
+
+
+def _peer(doc: dict[str, Any]) -> dict[str, Any]:
+    """What re-matching needs of a saved claim (not its text)."""
+    return {k: doc.get(k) for k in ("claim_id", "key_fields", "embedding")}
+
+
+def _done(result: dict[str, Any]) -> bool:
+    """Checkpoint this file? Saved claims and deterministic rejections; not possibly transient errors."""
+    if result.get("success"):
+        return not result.get("error")
+    return not result.get("retryable", True)
+
+
+class _Run:
+    """Accumulates worker results and flushes them to Mongo, the report and the checkpoint."""
+
+    def __init__(self, batch_size: int, report_path: str | None, checkpoint_path: str | None):
+        self.batch_size = max(1, batch_size)
+        self.pending: list[dict[str, Any]] = []
+        self.report = open(report_path, "a", encoding="utf-8") if report_path else None
+        self.checkpoint = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+        self.latencies: list[float] = []
+        self.counts: dict[str, int] = {}
+        self.bytes = 0
+        self.inserted = 0
+        # Submit time of files not yet added, and (save time, peer) of claims saved this run
+        # that a file still in flight or pending may not have seen
+        self.submitted: dict[str, float] = {}
+        self.recent: list[tuple[float, dict[str, Any]]] = []
+
+    def submit(self, path: str) -> None:
+        self.submitted.setdefault(path, time.monotonic())
+
+    def add(self, item: dict[str, Any]) -> None:
+        item["submitted_at"] = self.submitted.pop(item["path"], time.monotonic())
+        self.pending.append(item)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        from .db import reserve_claim_ids, save_claims_bulk
+
+        batch, self.pending = self.pending, []
+        to_save = [it for it in batch if it["result"].get("claim_doc") is not None]
+        if to_save:
+            try:
+                ids = reserve_claim_ids(len(to_save))
+                docs = []
+                for claim_id, it in zip(ids, to_save):
+                    it["result"]["claim_doc"]["claim_id"] = claim_id
+                    it["result"]["claim_id"] = claim_id
+                    self._rematch(it, docs)
+                    docs.append(it["result"]["claim_doc"])
+                self.inserted += save_claims_bulk(docs)
+                saved_at = time.monotonic()
+                self.recent.extend((saved_at, _peer(doc)) for doc in docs)
+            except Exception as e:
+                # Leave these paths out of the checkpoint so a rerun retries them
+                logger.error("Bulk insert of %s claims failed: %s", len(to_save), e)
+                for it in to_save:
+                    it["result"] = {
+                        "success": False, "claim_id": None, "error": f"Insert failed: {e}", "retryable": True,
+                    }
+        for it in batch:
+            self._record(it, checkpoint=_done(it["result"]))
+        for fh in (self.report, self.checkpoint):
+            if fh:
+                fh.flush()
+                os.fsync(fh.fileno())
+        # Peers saved before every open file was submitted are visible to those files' workers
+        cutoff = min([*self.submitted.values(), *(it["submitted_at"] for it in self.pending)], default=None)
+        self.recent = [r for r in self.recent if cutoff is not None and r[0] >= cutoff]
+
+    def _rematch(self, item: dict[str, Any], batch_docs: list[dict[str, Any]]) -> None:
+        """Re-match the item's claim against run peers its worker could not have seen."""
+        from .pipeline import rematch_unsaved_claim
+
+        peers = [p for saved_at, p in self.recent if saved_at >= item["submitted_at"]]
+        peers.extend(_peer(doc) for doc in batch_docs)
+        try:
+            updated = rematch_unsaved_claim(item["result"]["claim_doc"], peers)
+        except Exception as e:
+            logger.warning("Re-matching %s against this run's claims failed: %s", item["path"], e)
+            return
+        if updated:
+            item["result"].update(updated)
+
+    def _record(self, item: dict[str, Any], checkpoint: bool) -> None:
+        result = item["result"]
+        # "invalid": rejected for good (unreadable, not a claim); "error": retried on resume
+        if result.get("success"):
+            outcome = result.get("status")
+        else:
+            outcome = "error" if result.get("retryable", True) else "invalid"
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        self.latencies.append(item["seconds"])
+        self.bytes += item["bytes"]
+        if self.report:
+            line = {"path": item["path"], "seconds": round(item["seconds"], 3)}
+            line.update({k: result.get(k) for k in _REPORT_FIELDS})
+            self.report.write(json.dumps(line, default=str) + "\n")
+        if self.checkpoint and checkpoint:
+            self.checkpoint.write(item["path"] + "\n")
+
+    def summary(self, elapsed: float, skipped: int) -> dict[str, Any]:
+        lat = sorted(self.latencies)
+        files = len(lat)
+
+        def pct(p: float) -> float | None:
+            return round(lat[min(files - 1, int(p * files))], 3) if files else None
+
+        return {
+            "summary": True,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "files": files,
+            "skipped_from_checkpoint": skipped,
+            "inserted": self.inserted,
+            "outcomes": self.counts,
+            "elapsed_s": round(elapsed, 3),
+            "files_per_s": round(files / elapsed, 3) if elapsed > 0 else None,
+            "mb_per_s": round(self.bytes / 1e6 / elapsed, 3) if elapsed > 0 else None,
+            "latency_p50_s": pct(0.50),
+            "latency_p95_s": pct(0.95),
+            "latency_max_s": round(lat[-1], 3) if lat else None,
+        }
+
+    def close(self, summary: dict[str, Any]) -> None:
+        if self.report:
+            self.report.write(json.dumps(summary) + "\n")
+            self.report.close()
+        if self.checkpoint:
+            self.checkpoint.close()
+
+
+def ingest(
+    source: str,
+    workers: int = 0,
+    batch_size: int = 50,
+    report_path: str | None = None,
+    checkpoint_path: str | None = None,
+    limit: int | None = None,
+) -> dict[str, Any]:
+    """Process every not-yet-checkpointed PDF under source. Returns the summary dict."""
+    done = load_checkpoint(checkpoint_path)
+    sources = list(iter_sources(source))
+    paths = [p for p in sources if p not in done]
+    # Checkpoint entries from other sources or manifests do not count
+    skipped = len(sources) - len(paths)
+    if limit is not None:
+        paths = paths[:limit]
+    workers = workers or os.cpu_count() or 1
+    logger.info("Ingesting %s files with %s workers (%s already done)", len(paths), workers, skipped)
+
+    run = _Run(batch_size, report_path, checkpoint_path)
+    start = time.perf_counter()
+    # Spawned workers: no inherited Mongo/OpenAI sockets, no forked threads
+    ctx = multiprocessing.get_context("spawn")
+    max_in_flight = workers * 2
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_worker_init) as pool:
+            it = iter(paths)
+            in_flight = set()
+            try:
+                while True:
+                    while len(in_flight) < max_in_flight:
+                        path = next(it, None)
+                        if path is None:
+                            break
+                        run.submit(path)
+                        in_flight.add(pool.submit(_process_file, path))
+                    if not in_flight:
+                        break
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        run.add(fut.result())
+            except KeyboardInterrupt:
+                logger.warning("Interrupted; flushing completed files (rerun with the same checkpoint to resume)")
+                for fut in in_flight:
+                    fut.cancel()
+                raise
+    finally:
+        run.flush()
+        summary = run.summary(time.perf_counter() - start, skipped)
+        run.close(summary)
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(prog="python -m services.ingest", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="Directory of PDFs (searched recursively) or a .txt/.jsonl manifest")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Claims per bulk insert / checkpoint")
+    parser.add_argument("--report", default=None, help="JSONL report path (appended)")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file of committed paths (enables resume)")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most N pending files")
+    args = parser.parse_args(argv)
+    # Parent-side metrics (batch saves); workers do not serve their own
+    from . import metrics
+
+    metrics.serve_metrics()
+    try:
+        summary = ingest(args.source, args.workers, args.batch_size, args.report, args.checkpoint, args.limit)
+    except KeyboardInterrupt:
+        return 130
+    print(json.dumps(summary))
+    return 0 if not summary["outcomes"].get("error") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
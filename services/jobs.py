@@ -0,0 +1,427 @@
+"""
+Background verification jobs: a queue in a MongoDB collection worked by a pool of
+worker processes, so the UI only enqueues and polls.
+
+    python -m services.jobs --workers 4
+    python -m services.jobs --workers 2 --lanes interactive     # dedicated UI workers
+
+Each job holds the upload (in a GridFS bucket), a priority lane and its status:
+queued → running → done | failed. Workers claim the highest-priority, oldest queued
+job with one find_one_and_update and hold a lease they renew while the pipeline runs;
+a job whose worker died is picked up again once its lease expires (up to
+JOB_MAX_ATTEMPTS). enqueue_job raises QueueFullError when JOB_QUEUE_MAX jobs of the
+same or higher priority are waiting. Finished jobs expire after JOB_RESULT_TTL_S.
+
+enqueue_batch queues a multi-file upload as one job per file sharing a batch_id.
+Workers hold the batch's lock (a lease document) from the duplicate search through
+the save, so files of one batch are also checked against each other.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lane → priority (lower runs first)
+LANES = {"interactive": 0, "default": 1, "bulk": 2}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_JOB_FIELDS = {
+    "status": 1, "lane": 1, "filename": 1, "attempts": 1, "result": 1, "error": 1,
+    "created_at": 1, "started_at": 1, "finished_at": 1, "priority": 1, "batch_id": 1, "batch_index": 1,
+}
+
+
+class QueueFullError(RuntimeError):
+    """Too many jobs waiting in this lane (and higher-priority lanes); retry later."""
+
+
+def _jobs_collection() -> Collection:
+    from .db import get_db
+
+    return get_db()[settings.MONGODB_JOBS_COLLECTION]
+
+
+def _workers_collection() -> Collection:
+    from .db import get_db
+
+    return get_db()[f"{settings.MONGODB_JOBS_COLLECTION}_workers"]
+
+
+def _locks_collection() -> Collection:
+    from .db import get_db
+
+    return get_db()[f"{settings.MONGODB_JOBS_COLLECTION}_locks"]
+
+
+def _files():
+    from gridfs import GridFSBucket
+
+    from .db import get_db
+
+    return GridFSBucket(get_db(), bucket_name=f"{settings.MONGODB_JOBS_COLLECTION}_files")
+
+
+_indexes_ready = False
+
+
+def ensure_job_indexes() -> None:
+    """Queue-order index, plus TTL indexes expiring finished jobs and stale worker heartbeats."""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    _jobs_collection().create_indexes([
+        IndexModel([("status", ASCENDING), ("priority", ASCENDING), ("created_at", ASCENDING)], name="queue_order"),
+        IndexModel([("finished_at", ASCENDING)], name="finished_ttl", expireAfterSeconds=settings.JOB_RESULT_TTL_S),
+        IndexModel([("batch_id", ASCENDING), ("batch_index", ASCENDING)], name="batch", sparse=True),
+    ])
+    # Locks left behind by a crashed worker
+    _locks_collection().create_indexes([
+        IndexModel([("until", ASCENDING)], name="until_ttl", expireAfterSeconds=0),
+    ])
+    _workers_collection().create_indexes([
+        IndexModel([("seen_at", ASCENDING)], name="seen_ttl", expireAfterSeconds=max(60, int(settings.JOB_LEASE_S))),
+    ])
+    _indexes_ready = True
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _oid(job_id: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(job_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+# --- Producer / polling API --------------------------------------------------------------
+
+
+def _check_capacity(lane: str, adding: int = 1) -> int:
+    """Priority of lane; raises QueueFullError if adding jobs would exceed JOB_QUEUE_MAX waiting."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane {lane!r}; expected one of {', '.join(LANES)}.")
+    ensure_job_indexes()
+    priority = LANES[lane]
+    waiting = _jobs_collection().count_documents(
+        {"status": QUEUED, "priority": {"$lte": priority}}, limit=settings.JOB_QUEUE_MAX
+    )
+    if waiting + adding > settings.JOB_QUEUE_MAX:
+        raise QueueFullError(
+            f"Queue full: {waiting} jobs waiting in lane {lane!r} or above (limit {settings.JOB_QUEUE_MAX}); "
+            "try again shortly."
+        )
+    return priority
+
+
+def _job_doc(file_bytes: bytes, filename: str, lane: str, priority: int) -> dict[str, Any]:
+    return {
+        "status": QUEUED,
+        "lane": lane,
+        "priority": priority,
+        "filename": filename,
+        "file_id": _files().upload_from_stream(filename or "document.pdf", file_bytes),
+        "size": len(file_bytes),
+        "attempts": 0,
+        "created_at": _now(),
+    }
+
+
+def enqueue_job(file_bytes: bytes, filename: str = "", lane: str = "interactive") -> str:
+    """Queue one PDF for verification. Returns the job id; raises QueueFullError under back-pressure."""
+    priority = _check_capacity(lane)
+    return str(_jobs_collection().insert_one(_job_doc(file_bytes, filename, lane, priority)).inserted_id)
+
+
+def enqueue_batch(files: list[tuple[bytes, str]], lane: str = "default") -> str:
+    """
+    Queue a multi-file upload of (file_bytes, filename), one job per file. Returns the
+    batch id. All or nothing: raises QueueFullError if the whole batch does not fit.
+    """
+    priority = _check_capacity(lane, len(files))
+    batch_id = str(ObjectId())
+    docs = []
+    for i, (file_bytes, filename) in enumerate(files):
+        doc = _job_doc(file_bytes, filename, lane, priority)
+        doc.update(batch_id=batch_id, batch_index=i)
+        docs.append(doc)
+    _jobs_collection().insert_many(docs)
+    return batch_id
+
+
+def get_job(job_id: str) -> Optional[dict[str, Any]]:
+    """Job status and (when done) the run_verification result; queued jobs include their queue position."""
+    oid = _oid(job_id)
+    if oid is None:
+        return None
+    doc = _jobs_collection().find_one({"_id": oid}, _JOB_FIELDS)
+    if doc is None:
+        return None
+    doc["job_id"] = str(doc.pop("_id"))
+    if doc["status"] == QUEUED:
+        doc["position"] = _jobs_collection().count_documents({
+            "status": QUEUED,
+            "$or": [
+                {"priority": {"$lt": doc["priority"]}},
+                {"priority": doc["priority"], "created_at": {"$lt": doc["created_at"]}},
+            ],
+        }) + 1
+    return doc
+
+
+def get_batch(batch_id: str) -> list[dict[str, Any]]:
+    """Jobs of an upload batch in upload order (status, result, error per file)."""
+    jobs = list(_jobs_collection().find({"batch_id": batch_id}, _JOB_FIELDS).sort("batch_index", ASCENDING))
+    for job in jobs:
+        job["job_id"] = str(job.pop("_id"))
+    return jobs
+
+
+def queue_stats() -> dict[str, Any]:
+    """Job counts by lane and status, and the number of live workers."""
+    counts: dict[str, dict[str, int]] = {}
+    for row in _jobs_collection().aggregate([
+        {"$group": {"_id": {"lane": "$lane", "status": "$status"}, "n": {"$sum": 1}}},
+    ]):
+        counts.setdefault(row["_id"]["lane"], {})[row["_id"]["status"]] = row["n"]
+    return {"lanes": counts, "workers": active_workers()}
+
+
+def active_workers() -> int:
+    """Worker processes that reported in within the last JOB_LEASE_S."""
+    since = _now() - timedelta(seconds=settings.JOB_LEASE_S)
+    return _workers_collection().count_documents({"seen_at": {"$gte": since}})
+
+
+# --- Worker side ----------------------------------------------------------------------
+
+
+def claim_next_job(worker_id: str, lanes: Optional[list[str]] = None) -> Optional[dict[str, Any]]:
+    """
+    Atomically take the next job: queued, or running with an expired lease (its worker
+    died). Highest priority first, then oldest. Returns the job document or None.
+    """
+    now = _now()
+    q: dict[str, Any] = {
+        "$or": [{"status": QUEUED}, {"status": RUNNING, "lease_until": {"$lt": now}}],
+        "attempts": {"$lt": settings.JOB_MAX_ATTEMPTS},
+    }
+    if lanes:
+        q["lane"] = {"$in": lanes}
+    return _jobs_collection().find_one_and_update(
+        q,
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker": worker_id,
+                "started_at": now,
+                "lease_until": now + timedelta(seconds=settings.JOB_LEASE_S),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", ASCENDING), ("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _finish(job: dict[str, Any], worker_id: str, fields: dict[str, Any]) -> bool:
+    """Record the outcome if this worker still holds the job; drop the uploaded file."""
+    res = _jobs_collection().update_one(
+        {"_id": job["_id"], "worker": worker_id, "status": RUNNING},
+        {"$set": {**fields, "finished_at": _now()}, "$unset": {"lease_until": ""}},
+    )
+    if res.matched_count:
+        try:
+            _files().delete(job["file_id"])
+        except Exception as e:
+            logger.warning("Could not delete upload of job %s: %s", job["_id"], e)
+    return bool(res.matched_count)
+
+
+def reap_abandoned_jobs() -> int:
+    """Fail jobs whose lease expired after their last allowed attempt. Returns how many."""
+    now = _now()
+    n = 0
+    for job in _jobs_collection().find(
+        {"status": RUNNING, "lease_until": {"$lt": now}, "attempts": {"$gte": settings.JOB_MAX_ATTEMPTS}},
+        {"file_id": 1, "worker": 1},
+    ):
+        n += _finish(job, job["worker"], {"status": FAILED, "error": "Worker stopped responding; job abandoned."})
+    return n
+
+
+@contextmanager
+def batch_lock(batch_id: str, holder: str) -> Iterator[None]:
+    """
+    Lock shared by the jobs of one batch across worker processes: a lease document
+    (JOB_LEASE_S) that a crashed holder cannot keep forever.
+    """
+    coll = _locks_collection()
+    key = f"batch:{batch_id}"
+    while True:
+        now = _now()
+        try:
+            # Matches a free or expired lock; otherwise the upsert collides with the holder's document
+            coll.update_one(
+                {"_id": key, "until": {"$lt": now}},
+                {"$set": {"holder": holder, "until": now + timedelta(seconds=settings.JOB_LEASE_S)}},
+                upsert=True,
+            )
+            break
+        except DuplicateKeyError:
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        coll.delete_one({"_id": key, "holder": holder})
+
+
+def _heartbeat(worker_id: str) -> None:
+    _workers_collection().update_one(
+        {"_id": worker_id}, {"$set": {"seen_at": _now(), "pid": os.getpid()}}, upsert=True
+    )
+
+
+def _renew_lease(job_id: ObjectId, worker_id: str, stop: threading.Event) -> None:
+    interval = max(1.0, settings.JOB_LEASE_S / 3)
+    while not stop.wait(interval):
+        try:
+            _jobs_collection().update_one(
+                {"_id": job_id, "worker": worker_id, "status": RUNNING},
+                {"$set": {"lease_until": _now() + timedelta(seconds=settings.JOB_LEASE_S)}},
+            )
+            _heartbeat(worker_id)
+        except Exception as e:
+            logger.warning("Lease renewal for job %s failed: %s", job_id, e)
+
+
+def run_job(job: dict[str, Any], worker_id: str) -> None:
+    """Run the pipeline for one claimed job and store its result."""
+    from .pipeline import run_verification
+
+    stop = threading.Event()
+    renewer = threading.Thread(target=_renew_lease, args=(job["_id"], worker_id, stop), daemon=True)
+    renewer.start()
+    try:
+        file_bytes = _files().open_download_stream(job["file_id"]).read()
+        lock = batch_lock(job["batch_id"], worker_id) if job.get("batch_id") else None
+        result = run_verification(file_bytes, job.get("filename") or "", match_lock=lock)
+    except Exception as e:
+        logger.exception("Job %s failed on attempt %s", job["_id"], job["attempts"])
+        if job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+            # Back in the queue for another attempt
+            _jobs_collection().update_one(
+                {"_id": job["_id"], "worker": worker_id},
+                {"$set": {"status": QUEUED, "error": f"{e.__class__.__name__}: {e}"}, "$unset": {"lease_until": ""}},
+            )
+        else:
+            _finish(job, worker_id, {"status": FAILED, "error": f"{e.__class__.__name__}: {e}"})
+        return
+    finally:
+        stop.set()
+    _finish(job, worker_id, {"status": DONE, "result": result, "error": None})
+
+
+def _worker_loop(worker_id: str, lanes: Optional[list[str]], stop: Any, metrics_port: int = 0) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if metrics_port:
+        from . import metrics
+
+        metrics.serve_metrics(metrics_port)
+    # The parent handles Ctrl+C / SIGTERM and sets stop; finish the current job first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger.info("Job worker %s started (lanes: %s)", worker_id, ", ".join(lanes or LANES))
+    idle = 0.0
+    while not stop.is_set():
+        try:
+            _heartbeat(worker_id)
+            reap_abandoned_jobs()
+            job = claim_next_job(worker_id, lanes)
+        except Exception as e:
+            logger.warning("Job queue unavailable: %s", e)
+            job = None
+        if job is None:
+            # Back off while idle, up to 5x the poll interval
+            idle = min(idle + settings.JOB_POLL_INTERVAL_S, settings.JOB_POLL_INTERVAL_S * 5)
+            stop.wait(idle)
+            continue
+        idle = 0.0
+        run_job(job, worker_id)
+    logger.info("Job worker %s stopped", worker_id)
+
+
+def serve(workers: int = 0, lanes: Optional[list[str]] = None, metrics_port: Optional[int] = None) -> None:
+    """
+    Run `workers` worker processes (default JOB_WORKERS) until SIGINT/SIGTERM. Worker i
+    serves its pipeline metrics on metrics_port + i (default METRICS_PORT; 0 = off).
+    """
+    workers = workers or settings.JOB_WORKERS
+    metrics_port = settings.METRICS_PORT if metrics_port is None else metrics_port
+    ensure_job_indexes()
+    # Spawned workers: no inherited Mongo/OpenAI sockets, no forked threads
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    host = socket.gethostname()
+    procs = [
+        ctx.Process(
+            target=_worker_loop,
+            args=(f"{host}:{os.getpid()}:{i}", lanes, stop, metrics_port + i if metrics_port else 0),
+            daemon=False,
+        )
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    def _shutdown(signum: int, frame: Any) -> None:
+        logger.info("Stopping %s job workers after their current jobs", workers)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    for p in procs:
+        p.join()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(prog="python -m services.jobs", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: JOB_WORKERS)")
+    parser.add_argument(
+        "--lanes", default=None, help=f"Comma-separated lanes to serve (default: all of {','.join(LANES)})"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="Prometheus port of the first worker, +1 per worker (default: METRICS_PORT; 0 = off)",
+    )
+    args = parser.parse_args(argv)
+    lanes = [lane.strip() for lane in args.lanes.split(",") if lane.strip()] if args.lanes else None
+    unknown = [lane for lane in lanes or [] if lane not in LANES]
+    if unknown:
+        parser.error(f"unknown lane(s): {', '.join(unknown)}")
+    serve(args.workers, lanes, args.metrics_port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Offline maintenance commands.
+
+    python -m services.maintenance ann-rebuild [--nlist N]
+    python -m services.maintenance ann-compact [--nlist N]
+    python -m services.maintenance ann-recall [--queries 200] [--k 10] [--nprobe 1,4,8,16]
+    python -m services.maintenance seed-counters [--year 2026]
+    python -m services.maintenance ensure-indexes
+    python -m services.maintenance explain
+    python -m services.maintenance migrate-embeddings [--batch-size 500] [--int8]
+    python -m services.maintenance migrate-text [--batch-size 200]
+    python -m services.maintenance export --format csv [--status rejected] [--out claims.csv]
+    python -m services.maintenance purge-embedding-cache [--keep deployment ...]
+"""
+import argparse
+import json
+import logging
+import sys
+
+from . import ann_index
+
+
+def _cmd_ann_rebuild(args: argparse.Namespace) -> int:
+    path = ann_index.rebuild_from_db(nlist=args.nlist)
+    print(f"ANN index rebuilt at {path}")
+    return 0
+
+
+def _cmd_ann_compact(args: argparse.Namespace) -> int:
+    path = ann_index.compact(nlist=args.nlist)
+    print(f"ANN index compacted at {path}")
+    return 0
+
+
+def _cmd_ann_recall(args: argparse.Namespace) -> int:
+    nprobes = [int(x) for x in args.nprobe.split(",") if x.strip()]
+    report = ann_index.evaluate_recall(
+        n_queries=args.queries,
+        top_k=args.k,
+        nprobes=nprobes,
+        noise=args.noise,
+        threshold_pct=args.threshold,
+    )
+    for row in report:
+        print(json.dumps(row))
+    return 0
+
+
+def _cmd_seed_counters(args: argparse.Namespace) -> int:
+    from .db import seed_claim_counters
+
+    seeded = seed_claim_counters(args.year)
+    for year, seq in sorted(seeded.items()):
+        print(f"claim_id:{year} >= {seq}")
+    return 0
+
+
+def _cmd_ensure_indexes(args: argparse.Namespace) -> int:
+    from .db import ensure_indexes
+
+    for name in ensure_indexes(force=True):
+        print(name)
+    return 0
+
+
+def _cmd_explain(args: argparse.Namespace) -> int:
+    from .db import explain_hot_queries
+
+    report = explain_hot_queries()
+    for row in report:
+        print(json.dumps(row))
+    scans = [row["query"] for row in report if row["collscan"]]
+    if scans:
+        print(f"COLLSCAN in: {', '.join(scans)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _cmd_migrate_embeddings(args: argparse.Namespace) -> int:
+    from .embedding_codec import migrate_claim_embeddings
+
+    print(json.dumps(migrate_claim_embeddings(batch_size=args.batch_size, int8=args.int8 or None)))
+    return 0
+
+
+def _cmd_migrate_text(args: argparse.Namespace) -> int:
+    from .db import migrate_claim_texts
+
+    print(json.dumps(migrate_claim_texts(batch_size=args.batch_size)))
+    return 0
+
+
+def _cmd_export(args: argparse.Namespace) -> int:
+    from .export import export_claims
+
+    path, n = export_claims(args.format, status=args.status, path=args.out)
+    print(f"{n} claims written to {path}")
+    return 0
+
+
+def _cmd_purge_embedding_cache(args: argparse.Namespace) -> int:
+    from .embedding_cache import purge_other_deployments
+
+    print(json.dumps({"deleted": purge_other_deployments(args.keep)}))
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(prog="python -m services.maintenance", description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ann-rebuild", help="Rebuild the ANN index from the claims collection")
+    p.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ANN_NLIST or ~4*sqrt(n))")
+    p.set_defaults(func=_cmd_ann_rebuild)
+
+    p = sub.add_parser("ann-compact", help="Fold appended claims back into the IVF lists")
+    p.add_argument("--nlist", type=int, default=None)
+    p.set_defaults(func=_cmd_ann_compact)
+
+    p = sub.add_parser("ann-recall", help="Recall and duplicate-decision agreement vs brute force")
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--nprobe", default="1,2,4,8,16,32", help="Comma-separated nprobe values")
+    p.add_argument("--noise", type=float, default=0.05, help="Gaussian noise added to sampled query vectors")
+    p.add_argument("--threshold", type=float, default=None, help="Default: DUPLICATION_THRESHOLD_PCT")
+    p.set_defaults(func=_cmd_ann_recall)
+
+    p = sub.add_parser("seed-counters", help="Seed the claim ID counters from existing claim IDs")
+    p.add_argument("--year", default=None, help="Only this year (default: every year found)")
+    p.set_defaults(func=_cmd_seed_counters)
+
+    p = sub.add_parser("ensure-indexes", help="Create the claims collection indexes")
+    p.set_defaults(func=_cmd_ensure_indexes)
+
+    p = sub.add_parser("explain", help="explain() the hot queries; exit 1 if any does a COLLSCAN")
+    p.set_defaults(func=_cmd_explain)
+
+    p = sub.add_parser("migrate-embeddings", help="Convert stored embeddings to float32 Binary (and int8)")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.add_argument("--int8", action="store_true", help="Also write embedding_i8 (default: EMBEDDING_QUANTIZATION)")
+    p.set_defaults(func=_cmd_migrate_embeddings)
+
+    p = sub.add_parser("migrate-text", help="Move inline extracted text / OCR pages to the claim text collection")
+    p.add_argument("--batch-size", type=int, default=200)
+    p.set_defaults(func=_cmd_migrate_text)
+
+    p = sub.add_parser("export", help="Stream all claims to an Excel/CSV/Parquet file")
+    p.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx")
+    p.add_argument("--status", choices=["accepted", "rejected", "flagged"], default=None)
+    p.add_argument("--out", default=None, help="Output path (default: a temp file)")
+    p.set_defaults(func=_cmd_export)
+
+    p = sub.add_parser("purge-embedding-cache", help="Delete cached embeddings of other embedding deployments")
+    p.add_argument(
+        "--keep", nargs="+", default=None, help="Deployments to keep (default: AZURE_OPENAI_EMBEDDING_DEPLOYMENT)"
+    )
+    p.set_defaults(func=_cmd_purge_embedding_cache)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
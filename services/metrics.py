@@ -0,0 +1,293 @@
+"""
+Lightweight spans and counters for the verification pipeline.
+
+    with metrics.trace() as t:          # one per run_verification call
+        with metrics.span("extract"):
+            ...
+    t.summary()                         # compact breakdown stored on the claim document
+
+The current trace lives in a ContextVar, so spans opened in asyncio tasks and
+asyncio.to_thread calls land in the right run (plain thread pools must copy the
+context). Every span also feeds a process-wide sliding window per stage, exposed as
+p50/p95 through prometheus_text() (and the optional METRICS_PORT HTTP endpoint).
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_QUANTILES = (0.5, 0.95)
+
+
+class Trace:
+    """Spans, token usage, retries and cache lookups of one pipeline run."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.tokens: dict[str, int] = {"prompt": 0, "completion": 0}
+        self.cost_usd = 0.0
+        self.retries = 0
+        self.cache: dict[str, dict[str, int]] = {}
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def summary(self) -> dict[str, Any]:
+        """Compact breakdown (milliseconds) for the claim document and the UI."""
+        with self._lock:
+            out: dict[str, Any] = {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "stages_ms": {k: round(v * 1000, 1) for k, v in self.stages.items()},
+                "tokens": dict(self.tokens),
+                "retries": self.retries,
+                "cache": {k: dict(v) for k, v in self.cache.items()},
+            }
+            if self.cost_usd:
+                out["cost_usd"] = round(self.cost_usd, 6)
+            return out
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("claim_trace", default=None)
+
+
+class _Registry:
+    """Process-wide aggregates: a sliding window of durations per stage plus counters."""
+
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self._window = window
+        self.durations: dict[str, deque] = {}
+        self.counts: dict[str, int] = {}
+        self.sums: dict[str, float] = {}
+        self.tokens: dict[tuple[str, str], int] = {}
+        self.cost_usd = 0.0
+        self.retries: dict[str, int] = {}
+        self.cache: dict[tuple[str, str], int] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations.setdefault(stage, deque(maxlen=self._window)).append(seconds)
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+            self.sums[stage] = self.sums.get(stage, 0.0) + seconds
+
+    def stage_summary(self) -> list[dict[str, Any]]:
+        with self._lock:
+            snapshot = {k: np.fromiter(v, dtype=np.float64) for k, v in self.durations.items()}
+            counts, sums = dict(self.counts), dict(self.sums)
+        rows = []
+        for stage in sorted(snapshot):
+            window = snapshot[stage]
+            p50, p95 = np.quantile(window, _QUANTILES) if window.size else (0.0, 0.0)
+            rows.append({
+                "stage": stage,
+                "count": counts[stage],
+                "p50_ms": round(float(p50) * 1000, 1),
+                "p95_ms": round(float(p95) * 1000, 1),
+                "mean_ms": round(sums[stage] / counts[stage] * 1000, 1),
+                "sum_s": sums[stage],
+            })
+        return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self.__init__(self._window)
+
+
+_registry = _Registry(settings.METRICS_WINDOW)
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Start a trace for one pipeline run; nested spans and counters are recorded on it."""
+    t = Trace()
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+        _registry.observe("total", time.perf_counter() - t.started)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a stage or external call (recorded even if it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _registry.observe(name, elapsed)
+        t = _current.get()
+        if t is not None:
+            t.add_stage(name, elapsed)
+
+
+def _cost(model: str, prompt: int, completion: int) -> float:
+    if model == settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT:
+        return prompt / 1000 * settings.EMBEDDING_COST_PER_1K_TOKENS
+    return (
+        prompt / 1000 * settings.CHAT_COST_PER_1K_PROMPT_TOKENS
+        + completion / 1000 * settings.CHAT_COST_PER_1K_COMPLETION_TOKENS
+    )
+
+
+def record_usage(model: str, usage: Any) -> None:
+    """Token usage of one OpenAI response (the SDK's `usage` object; None is ignored)."""
+    if usage is None:
+        return
+    prompt = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion = int(getattr(usage, "completion_tokens", 0) or 0)
+    cost = _cost(model, prompt, completion)
+    with _registry._lock:
+        for kind, n in (("prompt", prompt), ("completion", completion)):
+            key = (model, kind)
+            _registry.tokens[key] = _registry.tokens.get(key, 0) + n
+        _registry.cost_usd += cost
+    t = _current.get()
+    if t is not None:
+        with t._lock:
+            t.tokens["prompt"] += prompt
+            t.tokens["completion"] += completion
+            t.cost_usd += cost
+
+
+def record_retry(model: str) -> None:
+    with _registry._lock:
+        _registry.retries[model] = _registry.retries.get(model, 0) + 1
+    t = _current.get()
+    if t is not None:
+        with t._lock:
+            t.retries += 1
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+    """Cache lookups (e.g. cache="embedding", hits=3, misses=1)."""
+    if not hits and not misses:
+        return
+    with _registry._lock:
+        for result, n in (("hit", hits), ("miss", misses)):
+            if n:
+                _registry.cache[(cache, result)] = _registry.cache.get((cache, result), 0) + n
+    t = _current.get()
+    if t is not None:
+        with t._lock:
+            entry = t.cache.setdefault(cache, {"hit": 0, "miss": 0})
+            entry["hit"] += hits
+            entry["miss"] += misses
+
+
+def stage_summary() -> list[dict[str, Any]]:
+    """Per-stage count and total (since start), p50/p95/mean over the last METRICS_WINDOW observations."""
+    return _registry.stage_summary()
+
+
+def counters() -> dict[str, Any]:
+    """Token, cost, retry and cache counters since process start."""
+    with _registry._lock:
+        return {
+            "tokens": {f"{m}:{k}": n for (m, k), n in _registry.tokens.items()},
+            "cost_usd": round(_registry.cost_usd, 6),
+            "retries": dict(_registry.retries),
+            "cache": {f"{c}:{r}": n for (c, r), n in _registry.cache.items()},
+        }
+
+
+def reset() -> None:
+    _registry.reset()
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    """Prometheus text exposition of the stage quantiles and counters."""
+    lines = [
+        "# HELP claim_stage_seconds Pipeline stage and external call latency (sliding window).",
+        "# TYPE claim_stage_seconds summary",
+    ]
+    for row in stage_summary():
+        stage = _label(row["stage"])
+        for q, key in zip(_QUANTILES, ("p50_ms", "p95_ms")):
+            lines.append(f'claim_stage_seconds{{stage="{stage}",quantile="{q}"}} {row[key] / 1000:.6f}')
+        lines.append(f'claim_stage_seconds_count{{stage="{stage}"}} {row["count"]}')
+        lines.append(f'claim_stage_seconds_sum{{stage="{stage}"}} {row["sum_s"]:.6f}')
+    with _registry._lock:
+        tokens = dict(_registry.tokens)
+        retries = dict(_registry.retries)
+        cache = dict(_registry.cache)
+        cost = _registry.cost_usd
+    lines += ["# HELP claim_openai_tokens_total OpenAI tokens used.", "# TYPE claim_openai_tokens_total counter"]
+    lines += [
+        f'claim_openai_tokens_total{{model="{_label(m)}",kind="{k}"}} {n}' for (m, k), n in sorted(tokens.items())
+    ]
+    lines += ["# HELP claim_openai_cost_usd_total Estimated OpenAI cost.", "# TYPE claim_openai_cost_usd_total counter"]
+    lines.append(f"claim_openai_cost_usd_total {cost:.6f}")
+    lines += ["# HELP claim_openai_retries_total Retried OpenAI calls.", "# TYPE claim_openai_retries_total counter"]
+    lines += [f'claim_openai_retries_total{{model="{_label(m)}"}} {n}' for m, n in sorted(retries.items())]
+    lines += ["# HELP claim_cache_requests_total Cache lookups by result.", "# TYPE claim_cache_requests_total counter"]
+    lines += [
+        f'claim_cache_requests_total{{cache="{_label(c)}",result="{r}"}} {n}' for (c, r), n in sorted(cache.items())
+    ]
+    return "\n".join(lines) + "\n"
+
+
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port: Optional[int] = None) -> bool:
+    """
+    Serve prometheus_text() at http://0.0.0.0:<port>/metrics from a daemon thread
+    (once per process; default METRICS_PORT, 0 = disabled). Returns True if serving.
+    Called explicitly by the entry points (Streamlit app, job workers, ingest), never on import.
+    """
+    global _server_started
+    port = settings.METRICS_PORT if port is None else port
+    if not port:
+        return False
+    with _server_lock:
+        if _server_started:
+            return True
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %s (in use by another process?): %s", port, e)
+            return False
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _server_started = True
+        logger.info("Serving Prometheus metrics on :%s/metrics", port)
+        return True
@@ -0,0 +1,175 @@
+"""
+Process-wide Azure OpenAI clients with a tuned keep-alive connection pool, explicit
+timeouts, and jittered exponential retry on 429 / 5xx / connection errors that
+honours Retry-After. Sync callers use get_client() + call_with_retries();
+concurrent callers use get_async_client() + acall_with_retries().
+"""
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncAzureOpenAI, AzureOpenAI
+
+from config import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_RETRY_STATUS = {408, 409, 429}
+_BACKOFF_BASE_S = 0.5
+_BACKOFF_MAX_S = 30.0
+
+_client: Optional[AzureOpenAI] = None
+_client_lock = threading.Lock()
+# One async client per event loop: httpx.AsyncClient connections are bound to the loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncAzureOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.OPENAI_TIMEOUT_S, connect=settings.OPENAI_CONNECT_TIMEOUT_S)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.OPENAI_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_POOL_MAX_CONNECTIONS,
+        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_S,
+    )
+
+
+def _client_kwargs() -> dict[str, Any]:
+    return {
+        "api_key": settings.AZURE_OPENAI_API_KEY,
+        "api_version": settings.AZURE_OPENAI_API_VERSION,
+        "azure_endpoint": settings.AZURE_OPENAI_ENDPOINT.rstrip("/"),
+        "timeout": _timeout(),
+        # Retries are handled by call_with_retries so they are jittered and observable
+        "max_retries": 0,
+    }
+
+
+def get_client() -> AzureOpenAI:
+    """Shared sync client (thread-safe; reuses pooled keep-alive connections)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AzureOpenAI(
+                    **_client_kwargs(),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+    return _client
+
+
+def get_async_client() -> AsyncAzureOpenAI:
+    """Shared async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncAzureOpenAI(
+            **_client_kwargs(),
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _reset_after_fork() -> None:
+    # Pooled sockets must not be shared with a forked child
+    global _client
+    _client = None
+    _async_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in _RETRY_STATUS or exc.status_code >= 500
+    return isinstance(exc, APIConnectionError)  # includes APITimeoutError
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Server-requested delay in seconds (retry-after-ms, Retry-After seconds or HTTP date)."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int, exc: Exception) -> float:
+    server = _retry_after(exc)
+    if server is not None:
+        return min(server, _BACKOFF_MAX_S * 2)
+    # Full jitter: uniform(0, base * 2^attempt), capped
+    return random.uniform(0, min(_BACKOFF_MAX_S, _BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def call_with_retries(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Call an OpenAI SDK method, retrying transient failures up to OPENAI_MAX_RETRIES times.
+    Records an "openai:<model>" span, token usage and retries in services.metrics.
+    """
+    model = str(kwargs.get("model", "unknown"))
+    attempt = 0
+    with metrics.span(f"openai:{model}"):
+        while True:
+            try:
+                resp = fn(*args, **kwargs)
+                metrics.record_usage(model, getattr(resp, "usage", None))
+                return resp
+            except Exception as e:
+                if attempt >= settings.OPENAI_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = _backoff(attempt, e)
+                attempt += 1
+                metrics.record_retry(model)
+                logger.info("OpenAI call failed (%s); retry %s in %.2fs", e.__class__.__name__, attempt, delay)
+                time.sleep(delay)
+
+
+async def acall_with_retries(fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+    """Async counterpart of call_with_retries."""
+    model = str(kwargs.get("model", "unknown"))
+    attempt = 0
+    with metrics.span(f"openai:{model}"):
+        while True:
+            try:
+                resp = await fn(*args, **kwargs)
+                metrics.record_usage(model, getattr(resp, "usage", None))
+                return resp
+            except Exception as e:
+                if attempt >= settings.OPENAI_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = _backoff(attempt, e)
+                attempt += 1
+                metrics.record_retry(model)
+                logger.info("OpenAI call failed (%s); retry %s in %.2fs", e.__class__.__name__, attempt, delay)
+                await asyncio.sleep(delay)
@@ -1,132 +1,476 @@
 """
-Verification pipeline: extract → document-type check → LLM extraction → content embedding → similarity → diff → agent → save.
+Verification pipeline: extract → document-type check → key fields (regex scan, LLM when unsure) → content embedding → similarity → diff → agent → save.
 """
-from typing import Any, Optional
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, ContextManager, Iterator, Optional, TypeVar
 
 from config import settings
+from . import metrics
 from . import (
     get_db,
     save_claim,
-    list_claims,
-    extract_text_from_pdf,
+    extract_pdf,
     find_most_similar_claim,
+    search_similar_claims,
     compute_differences,
     get_verdict_and_reason,
     get_embedding,
 )
-from .agent import check_is_claim_document, extract_claim_fields_with_llm
-from .diff_extractor import key_fields_indicate_different_claim, build_content_string_for_embedding
-from .db import get_next_claim_id
+from .agent import (
+    check_is_claim_document,
+    check_is_claim_document_async,
+    classify_and_extract_claim,
+    classify_and_extract_claim_async,
+    extract_claim_fields_with_llm,
+    extract_claim_fields_with_llm_async,
+    get_verdict_and_reason_async,
+)
+from .diff_extractor import key_fields_indicate_different_claim, build_content_string_for_embedding, scan_key_fields
+from .blocking import blocking_keys
+from .embedding_codec import decode_embedding, embedding_fields
+from .db import get_next_claim_id, find_blocking_candidates, find_blocking_candidates_async, save_claim_async
+from .similarity import refresh_similarity_index, warm_similarity_index
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_ERR_NO_TEXT = "Could not extract enough text from the document. Please upload a valid PDF with readable text."
+_ERR_NO_FIELDS = "Could not extract claim details from this document. Please ensure it is a clear claim form and try again."
+
 
+def _failure(error: str, retryable: bool = False) -> dict[str, Any]:
+    """Failed result; retryable marks errors that may pass on a rerun (API, Mongo, partial OCR)."""
+    return {"success": False, "error": error, "claim_id": None, "retryable": retryable}
+
+
+def _no_text(extraction: dict[str, Any]) -> dict[str, Any]:
+    # Unreadable for good unless extraction errored or some pages could not be OCR'd this time
+    return _failure(_ERR_NO_TEXT, retryable=extraction["engine"] == "error" or bool(extraction.get("degraded")))
+
+
+def _not_a_claim(doc_check: dict[str, Any]) -> dict[str, Any]:
+    reason = doc_check.get("reason", "").strip() or "Document is not a claim form."
+    return _failure(
+        f"This document does not appear to be a claim form. {reason} Please upload an insurance/claim document."
+    )
 
-def run_verification(file_bytes: bytes, filename: str = "") -> dict[str, Any]:
+
+def _scan_confident(scan: dict[str, Any]) -> bool:
+    return min(scan["confidence"].values()) >= settings.FIELD_SCANNER_MIN_CONFIDENCE
+
+
+def _fallback_fields(scan: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """Scanned fields when the LLM extraction failed (None if the scan found nothing)."""
+    return scan["fields"] if any(v is not None for v in scan["fields"].values()) else None
+
+
+def _embedding_input(new_fields: dict[str, Any], extracted_text: str) -> str:
+    return build_content_string_for_embedding(new_fields) or extracted_text[:8000]
+
+
+def _rank_candidates(
+    block: list[dict],
+    new_embedding: list[float],
+    content_string: str,
+) -> list[tuple[dict, float]]:
     """
-    Run full pipeline on uploaded PDF. Returns result dict for UI and saves to MongoDB.
-    Rejects non-claim documents (e.g. resume). Uses LLM extraction and content-based embedding.
+    Rank the blocking candidates by embedding, merged with the best matches of the global
+    vector search: a block can be non-empty yet miss the duplicate (e.g. the duplicate's
+    key fields were misread), so the global search always runs.
     """
-    # 1. Text extraction
-    extracted_text = extract_text_from_pdf(file_bytes, filename)
-    if not extracted_text or len(extracted_text.strip()) < 10:
-        return {
-            "success": False,
-            "error": "Could not extract enough text from the document. Please upload a valid PDF with readable text.",
-            "claim_id": None,
-        }
-
-    # 2. Document-type check: reject non-claims (resume, invoice, etc.)
-    doc_check = check_is_claim_document(extracted_text)
-    if not doc_check.get("is_claim", True):
-        reason = doc_check.get("reason", "").strip() or "Document is not a claim form."
-        return {
-            "success": False,
-            "error": f"This document does not appear to be a claim form. {reason} Please upload an insurance/claim document.",
-            "claim_id": None,
-        }
-
-    # 3. Key fields: LLM only (any language); no regex
-    new_fields = extract_claim_fields_with_llm(extracted_text)
-    if new_fields is None:
-        return {
-            "success": False,
-            "error": "Could not extract claim details from this document. Please ensure it is a clear claim form and try again.",
-            "claim_id": None,
-        }
-    content_string = build_content_string_for_embedding(new_fields)
-    new_embedding = get_embedding(content_string) if content_string else get_embedding(extracted_text[:8000])
-
-    # 4. Load existing claims and find most similar (by content embedding)
-    existing = list_claims(limit=50)
     similar_list = find_most_similar_claim(
-        content_string or extracted_text[:8000],
-        existing,
-        text_field="extracted_text",
+        content_string,
+        block,
         top_k=1,
         new_embedding=new_embedding,
-    )
+    ) if block else []
+    try:
+        similar_list = similar_list + search_similar_claims(new_embedding, top_k=1)
+    except Exception as e:
+        if not similar_list:
+            raise
+        logger.warning("Global similarity search failed; using the blocking candidates only: %s", e)
+    best: dict[str, tuple[dict, float]] = {}
+    for match, pct in similar_list:
+        claim_id = match.get("claim_id") or str(match.get("_id", ""))
+        if claim_id not in best or pct > best[claim_id][1]:
+            best[claim_id] = (match, pct)
+    return sorted(best.values(), key=lambda hit: hit[1], reverse=True)
 
-    compared_with: Optional[str] = None
-    duplication_pct: float = 0.0
-    key_differences_str = ""
-    rejection_reason = ""
-    status = "accepted"
+
+def _assess(new_fields: dict[str, Any], similar_list: list[tuple[dict, float]]) -> dict[str, Any]:
+    """
+    Steps 5-7 without the agent call: differences, different-claim override, and
+    moderate-similarity flag. Sets "needs_agent" when the agent verdict is required.
+    """
+    outcome: dict[str, Any] = {
+        "compared_with": None,
+        "duplication_pct": 0.0,
+        "key_differences": "",
+        "rejection_reason": "",
+        "status": "accepted",
+        "differences": [],
+        "needs_agent": False,
+    }
     existing_fields = {}
 
     if similar_list:
         best_match, pct = similar_list[0]
-        compared_with = best_match.get("claim_id") or str(best_match.get("_id", ""))
-        duplication_pct = pct
+        outcome["compared_with"] = best_match.get("claim_id") or str(best_match.get("_id", ""))
+        outcome["duplication_pct"] = pct
         existing_fields = best_match.get("key_fields") or {}
+    compared_with = outcome["compared_with"]
+    duplication_pct = outcome["duplication_pct"]
 
     # 5. Differences (new_fields from LLM above)
     differences = compute_differences(new_fields, existing_fields) if existing_fields else []
+    outcome["differences"] = differences
 
     # 6. Same form template but different claim? (e.g. different policy holder, policy, amount)
     # Avoid false duplicate when two forms share layout but are different claims.
     if compared_with and key_fields_indicate_different_claim(new_fields, existing_fields):
-        duplication_pct = 0.0
-        status = "accepted"
-        key_differences_str = "Different claim (different policy holder, policy number, amount, or date)."
-        rejection_reason = ""
+        outcome["duplication_pct"] = 0.0
+        outcome["key_differences"] = "Different claim (different policy holder, policy number, amount, or date)."
     # 7. Agent verdict (only when we have a comparison and not already ruled different)
     elif compared_with and duplication_pct >= settings.DUPLICATION_THRESHOLD_PCT:
-        agent_out = get_verdict_and_reason(duplication_pct, compared_with, differences)
-        status = agent_out["status"]
-        key_differences_str = agent_out["key_differences"]
-        rejection_reason = agent_out["rejection_reason"]
+        outcome["needs_agent"] = True
     elif compared_with:
-        key_differences_str = "; ".join(
+        outcome["key_differences"] = "; ".join(
             f"{d['field']}: {d['old_value']} → {d['new_value']}" for d in differences
         ) or "No significant differences."
         if duplication_pct >= 50:
-            status = "flagged"
-            rejection_reason = f"Moderate similarity ({duplication_pct}%) with {compared_with}; review recommended."
+            outcome["status"] = "flagged"
+            outcome["rejection_reason"] = (
+                f"Moderate similarity ({duplication_pct}%) with {compared_with}; review recommended."
+            )
+    return outcome
+
+
+@contextmanager
+def _holding(match_lock: Optional[ContextManager[Any]]) -> Iterator[None]:
+    """Hold the batch lock (if any) from the duplicate search through the save."""
+    if match_lock is None:
+        yield
+        return
+    with ExitStack() as stack:
+        with metrics.span("batch_lock_wait"):
+            stack.enter_context(match_lock)
+        # Batch peers saved by other processes while this one waited
+        try:
+            refresh_similarity_index()
+        except Exception as e:
+            logger.warning("Similarity index refresh failed: %s", e)
+        yield
 
-    # 8. Persist
-    claim_id = get_next_claim_id()
-    doc = {
+
+def _apply_verdict(outcome: dict[str, Any], agent_out: dict[str, str]) -> None:
+    outcome["status"] = agent_out["status"]
+    outcome["key_differences"] = agent_out["key_differences"]
+    outcome["rejection_reason"] = agent_out["rejection_reason"]
+
+
+def _build_claim_doc(
+    claim_id: Optional[str],
+    filename: str,
+    extraction: dict[str, Any],
+    new_fields: dict[str, Any],
+    new_keys: dict[str, Optional[str]],
+    new_embedding: list[float],
+    outcome: dict[str, Any],
+    field_source: str,
+    scan: dict[str, Any],
+) -> dict[str, Any]:
+    return {
         "claim_id": claim_id,
         "filename": filename,
-        "extracted_text": extracted_text,
-        "embedding": new_embedding,
+        "extracted_text": extraction["text"],
+        "ocr_pages": extraction.get("ocr_pages"),
+        "file_sha256": extraction["sha256"],
+        "extraction_engine": extraction["engine"],
+        "page_count": extraction["page_count"],
+        **embedding_fields(new_embedding),
         "key_fields": new_fields,
-        "status": status,
-        "compared_with": compared_with,
-        "duplication_pct": duplication_pct,
-        "key_differences": key_differences_str,
-        "rejection_reason": rejection_reason,
-        "created_at": None,  # set by MongoDB or we set below
+        # "scanner" (regex tier), "llm", or "scanner_fallback" (LLM extraction failed)
+        "field_source": field_source,
+        "field_confidence": scan["confidence"],
+        "blocking_keys": new_keys,
+        "status": outcome["status"],
+        "compared_with": outcome["compared_with"],
+        "duplication_pct": outcome["duplication_pct"],
+        "key_differences": outcome["key_differences"],
+        "rejection_reason": outcome["rejection_reason"],
+        "created_at": datetime.now(timezone.utc),
     }
-    from datetime import datetime, timezone
-    doc["created_at"] = datetime.now(timezone.utc)
-    save_claim(doc)
 
+
+def _success(claim_id: Optional[str], outcome: dict[str, Any]) -> dict[str, Any]:
     return {
         "success": True,
         "claim_id": claim_id,
-        "compared_with": compared_with,
-        "duplication_pct": duplication_pct,
-        "key_differences": key_differences_str,
-        "status": status,
-        "rejection_reason": rejection_reason,
+        "compared_with": outcome["compared_with"],
+        "duplication_pct": outcome["duplication_pct"],
+        "key_differences": outcome["key_differences"],
+        "status": outcome["status"],
+        "rejection_reason": outcome["rejection_reason"],
         "error": None,
     }
+
+
+def run_verification(
+    file_bytes: bytes,
+    filename: str = "",
+    persist: bool = True,
+    match_lock: Optional[ContextManager[Any]] = None,
+) -> dict[str, Any]:
+    """
+    Run full pipeline on uploaded PDF. Returns result dict for UI and saves to MongoDB.
+    Rejects non-claim documents (e.g. resume). Uses LLM extraction and content-based embedding.
+    With persist=False nothing is written and no claim_id is allocated: the unsaved
+    document is returned under "claim_doc" for the caller to batch-insert.
+    Files verified concurrently under one match_lock (an upload batch) hold it from the
+    duplicate search through the save, so each is also checked against the others.
+    Each stage is timed (services.metrics); the breakdown is saved on the claim as
+    "timings" and returned under the same key.
+    """
+    with metrics.trace() as trace:
+        return _run_verification(file_bytes, filename, persist, trace, match_lock)
+
+
+def _run_verification(
+    file_bytes: bytes,
+    filename: str,
+    persist: bool,
+    trace: metrics.Trace,
+    match_lock: Optional[ContextManager[Any]] = None,
+) -> dict[str, Any]:
+    # 1. Text extraction (served from the file-hash cache for repeat uploads)
+    with metrics.span("extract"):
+        extraction = extract_pdf(file_bytes, filename)
+    extracted_text = extraction["text"]
+    if not extracted_text or len(extracted_text.strip()) < 10:
+        return _no_text(extraction)
+
+    # 2 + 3. Document-type check (reject resume, invoice, etc.) and key fields. Tier 1 is
+    # the regex field scan; when it is confident only the classification goes to the LLM.
+    # Otherwise one combined LLM call (COMBINED_CLASSIFY_EXTRACT) or two calls
+    with metrics.span("scan_fields"):
+        scan = scan_key_fields(extracted_text)
+    field_source = "llm"
+    combined = None
+    if _scan_confident(scan):
+        with metrics.span("classify"):
+            doc_check = check_is_claim_document(extracted_text)
+        if not doc_check.get("is_claim", True):
+            return _not_a_claim(doc_check)
+        new_fields, field_source = scan["fields"], "scanner"
+    else:
+        if settings.COMBINED_CLASSIFY_EXTRACT:
+            with metrics.span("classify_extract"):
+                combined = classify_and_extract_claim(extracted_text)
+        if combined is not None:
+            doc_check, new_fields = combined, combined["fields"]
+            if not doc_check["is_claim"]:
+                return _not_a_claim(doc_check)
+        else:
+            with metrics.span("classify"):
+                doc_check = check_is_claim_document(extracted_text)
+            if not doc_check.get("is_claim", True):
+                return _not_a_claim(doc_check)
+            with metrics.span("extract_fields"):
+                new_fields = extract_claim_fields_with_llm(extracted_text)
+    if new_fields is None:
+        new_fields, field_source = _fallback_fields(scan), "scanner_fallback"
+    if new_fields is None:
+        return _failure(_ERR_NO_FIELDS, retryable=True)
+    content_string = _embedding_input(new_fields, extracted_text)
+    with metrics.span("embed"):
+        new_embedding = get_embedding(content_string)
+
+    with _holding(match_lock):
+        # 4. Blocking: claims sharing policy number / name / amount+date are the candidate set,
+        # ranked by content embedding together with the top global vector-search matches
+        new_keys = blocking_keys(new_fields)
+        with metrics.span("blocking"):
+            block = find_blocking_candidates(new_keys, new_fields)
+        with metrics.span("rank"):
+            similar_list = _rank_candidates(block, new_embedding, content_string)
+
+        # 5-7. Differences, overrides and agent verdict
+        outcome = _assess(new_fields, similar_list)
+        if outcome["needs_agent"]:
+            with metrics.span("verdict"):
+                verdict = get_verdict_and_reason(
+                    outcome["duplication_pct"], outcome["compared_with"], outcome["differences"]
+                )
+            _apply_verdict(outcome, verdict)
+
+        # 8. Persist
+        if not persist:
+            doc = _build_claim_doc(None, filename, extraction, new_fields, new_keys, new_embedding, outcome, field_source, scan)
+            doc["timings"] = trace.summary()
+            return {**_success(None, outcome), "claim_doc": doc, "timings": doc["timings"]}
+        with metrics.span("save"):
+            claim_id = get_next_claim_id()
+            doc = _build_claim_doc(claim_id, filename, extraction, new_fields, new_keys, new_embedding, outcome, field_source, scan)
+            # Timings up to the save (the save itself is in the process-wide metrics)
+            doc["timings"] = trace.summary()
+            save_claim(doc)
+        return {**_success(claim_id, outcome), "timings": doc["timings"]}
+
+
+def rematch_unsaved_claim(doc: dict[str, Any], peers: list[dict]) -> Optional[dict[str, Any]]:
+    """
+    Re-check an unsaved claim document (run_verification(persist=False)) against peers:
+    claims with claim_id, key_fields and embedding that its duplicate search could not
+    see (saved, or about to be, after it ran). When a peer is more similar than the
+    stored match, steps 5-7 are redone against it and the outcome is written into doc.
+    Returns the updated outcome fields, or None when doc is unchanged.
+    """
+    if not peers:
+        return None
+    similar_list = find_most_similar_claim("", peers, top_k=1, new_embedding=decode_embedding(doc["embedding"]))
+    if not similar_list or similar_list[0][1] <= (doc.get("duplication_pct") or 0.0):
+        return None
+    outcome = _assess(doc["key_fields"] or {}, similar_list)
+    if outcome["needs_agent"]:
+        with metrics.span("verdict"):
+            verdict = get_verdict_and_reason(
+                outcome["duplication_pct"], outcome["compared_with"], outcome["differences"]
+            )
+        _apply_verdict(outcome, verdict)
+    updated = {k: v for k, v in _success(doc.get("claim_id"), outcome).items() if k in doc}
+    doc.update(updated)
+    return updated
+
+
+def verify_batch(files: list[tuple[bytes, str]], max_workers: int = 0) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    Verify an upload batch of (file_bytes, filename) with up to max_workers (default
+    BATCH_MAX_CONCURRENCY) in flight. Yields (position in files, result) as each one
+    finishes. Files are duplicate-checked against each other as well as stored claims.
+    """
+    lock = threading.Lock()
+
+    def verify(file_bytes: bytes, filename: str) -> dict[str, Any]:
+        try:
+            return run_verification(file_bytes, filename, match_lock=lock)
+        except Exception as e:
+            logger.exception("Verification of %s failed", filename)
+            return _failure(f"{e.__class__.__name__}: {e}", retryable=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers or settings.BATCH_MAX_CONCURRENCY)) as pool:
+        futures = {pool.submit(verify, file_bytes, filename): i for i, (file_bytes, filename) in enumerate(files)}
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
+
+
+async def _warm_index() -> None:
+    """Index warm-up is only an optimization: on failure the search loads the index lazily."""
+    try:
+        await _timed("warm_index", asyncio.to_thread(warm_similarity_index))
+    except Exception as e:
+        logger.warning("Similarity index warm-up failed; loading it on first search instead: %s", e)
+
+
+async def _timed(name: str, awaitable: Awaitable[T]) -> T:
+    with metrics.span(name):
+        return await awaitable
+
+
+async def run_verification_async(file_bytes: bytes, filename: str = "") -> dict[str, Any]:
+    """
+    Async run_verification with the independent stages overlapped: document-type check,
+    field extraction and similarity-index warm-up run concurrently; embedding and the
+    blocking query run concurrently. Extraction is cancelled as soon as classification
+    rejects the document. Returns the same result dict as run_verification.
+    """
+    with metrics.trace() as trace:
+        return await _run_verification_async(file_bytes, filename, trace)
+
+
+async def _run_verification_async(file_bytes: bytes, filename: str, trace: metrics.Trace) -> dict[str, Any]:
+    # 1. Text extraction (CPU/OCR bound; off the event loop)
+    extraction = await _timed("extract", asyncio.to_thread(extract_pdf, file_bytes, filename))
+    extracted_text = extraction["text"]
+    if not extracted_text or len(extracted_text.strip()) < 10:
+        return _no_text(extraction)
+
+    # 2 + 3. Classification, field extraction and candidate-index load in parallel
+    # (the LLM extracts fields only when the regex scan is not confident)
+    warm_task = asyncio.create_task(_warm_index())
+    try:
+        with metrics.span("scan_fields"):
+            scan = scan_key_fields(extracted_text)
+        confident = _scan_confident(scan)
+        field_source = "llm"
+        combined = (
+            await _timed("classify_extract", classify_and_extract_claim_async(extracted_text))
+            if settings.COMBINED_CLASSIFY_EXTRACT and not confident
+            else None
+        )
+        if confident:
+            doc_check = await _timed("classify", check_is_claim_document_async(extracted_text))
+            if not doc_check.get("is_claim", True):
+                return _not_a_claim(doc_check)
+            new_fields, field_source = scan["fields"], "scanner"
+        elif combined is not None:
+            if not combined["is_claim"]:
+                return _not_a_claim(combined)
+            new_fields = combined["fields"]
+        else:
+            classify_task = asyncio.create_task(_timed("classify", check_is_claim_document_async(extracted_text)))
+            fields_task = asyncio.create_task(
+                _timed("extract_fields", extract_claim_fields_with_llm_async(extracted_text))
+            )
+            try:
+                doc_check = await classify_task
+                if not doc_check.get("is_claim", True):
+                    return _not_a_claim(doc_check)
+                new_fields = await fields_task
+            finally:
+                if not fields_task.done():
+                    fields_task.cancel()
+        if new_fields is None:
+            new_fields, field_source = _fallback_fields(scan), "scanner_fallback"
+        if new_fields is None:
+            return _failure(_ERR_NO_FIELDS, retryable=True)
+
+        # 4. Embedding and blocking query in parallel, then rank
+        content_string = _embedding_input(new_fields, extracted_text)
+        new_keys = blocking_keys(new_fields)
+        new_embedding, block = await asyncio.gather(
+            _timed("embed", asyncio.to_thread(get_embedding, content_string)),
+            _timed("blocking", find_blocking_candidates_async(new_keys, new_fields)),
+        )
+        await warm_task
+        similar_list = await _timed(
+            "rank", asyncio.to_thread(_rank_candidates, block, new_embedding, content_string)
+        )
+
+        # 5-7. Differences, overrides and agent verdict
+        outcome = _assess(new_fields, similar_list)
+        if outcome["needs_agent"]:
+            _apply_verdict(
+                outcome,
+                await _timed("verdict", get_verdict_and_reason_async(
+                    outcome["duplication_pct"], outcome["compared_with"], outcome["differences"]
+                )),
+            )
+
+        # 8. Persist
+        with metrics.span("save"):
+            claim_id = await asyncio.to_thread(get_next_claim_id)
+            doc = _build_claim_doc(claim_id, filename, extraction, new_fields, new_keys, new_embedding, outcome, field_source, scan)
+            doc["timings"] = trace.summary()
+            await save_claim_async(doc)
+        return {**_success(claim_id, outcome), "timings": doc["timings"]}
+    finally:
+        # Early returns (not a claim, no fields) leave the warm-up running
+        if not warm_task.done():
+            warm_task.cancel()
@@ -1,8 +1,14 @@
-from typing import Optional
+import logging
+from typing import Any, Optional
 
 import numpy as np
 
-from .embeddings import get_embedding
+from . import ann_index
+from .embedding_codec import decode_embedding
+from .embeddings import get_embedding, get_embeddings
+from .vector_index import get_claim_index, index_claim
+
+logger = logging.getLogger(__name__)
 
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
@@ -19,6 +25,18 @@ def _sim_to_pct(sim: float) -> float:
     return max(0.0, min(100.0, (sim + 1) / 2 * 100))
 
 
+def _top_k_rows(matrix: np.ndarray, query: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Cosine scores of query vs each row of matrix; returns (row indices, scores) best first."""
+    row_norms = np.linalg.norm(matrix, axis=1)
+    q_norm = float(np.linalg.norm(query))
+    denom = row_norms * q_norm
+    scores = np.divide(matrix @ query, denom, out=np.zeros(matrix.shape[0], dtype=np.float32), where=denom > 0)
+    k = min(top_k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top, scores[top]
+
+
 def find_most_similar_claim(
     new_text: str,
     existing_claims: list[dict],
@@ -40,18 +58,89 @@ def find_most_similar_claim(
     else:
         return []
 
-    results: list[tuple[dict, float]] = []
+    query = np.asarray(new_emb, dtype=np.float32)
+    # Legacy claims without a stored embedding are embedded in one batched call;
+    # their text is loaded from the claim text collection when not in the candidate doc
+    missing = [c for c in existing_claims if c.get("embedding") is None]
+    texts = {id(c): c.get(text_field) or c.get("extracted_text") for c in missing}
+    to_load = [c["claim_id"] for c in missing if not texts[id(c)] and c.get("claim_id")]
+    if to_load:
+        from .db import get_claim_texts
 
+        loaded = get_claim_texts(to_load)
+        for c in missing:
+            texts[id(c)] = texts[id(c)] or loaded.get(c.get("claim_id"))
+    missing = [c for c in missing if texts[id(c)]]
+    backfilled = dict(zip(
+        (id(c) for c in missing),
+        get_embeddings([texts[id(c)] for c in missing]) if missing else [],
+    ))
+    candidates: list[dict] = []
+    vectors: list[Any] = []
     for claim in existing_claims:
-        text = claim.get(text_field) or claim.get("extracted_text") or ""
-        if not text:
-            continue
-        existing_emb = claim.get("embedding")
+        existing_emb = decode_embedding(claim.get("embedding"))
         if existing_emb is None:
-            existing_emb = get_embedding(text)
-        sim = cosine_similarity(new_emb, existing_emb)
-        pct = _sim_to_pct(sim)
-        results.append((claim, round(pct, 1)))
+            existing_emb = backfilled.get(id(claim))
+            if existing_emb is None:
+                continue
+        if len(existing_emb) != query.shape[0]:
+            continue
+        candidates.append(claim)
+        vectors.append(existing_emb)
+    if not candidates:
+        return []
+
+    matrix = np.vstack(vectors).astype(np.float32, copy=False)
+    top, scores = _top_k_rows(matrix, query, top_k)
+    return [(candidates[i], round(_sim_to_pct(float(s)), 1)) for i, s in zip(top, scores)]
+
+
+def search_similar_claims(
+    new_embedding: list[float],
+    top_k: int = 1,
+) -> list[tuple[dict[str, Any], float]]:
+    """
+    Search all stored claims for the closest matches: the on-disk ANN index when
+    ANN_INDEX_DIR is set and built, else the process-wide in-memory vector index.
+    Returns list of ({claim_id, key_fields}, duplication_pct) sorted descending.
+    """
+    if ann_index.ann_enabled():
+        index = ann_index.open_index()
+        if index is not None:
+            from .db import get_claims_by_ids
+
+            hits = index.search(new_embedding, top_k=top_k)
+            docs = get_claims_by_ids([cid for cid, _ in hits], {"claim_id": 1, "key_fields": 1})
+            by_id = {d["claim_id"]: d for d in docs}
+            return [
+                ({"claim_id": cid, "key_fields": by_id[cid].get("key_fields") or {}}, pct)
+                for cid, pct in hits
+                if cid in by_id
+            ]
+        logger.warning("ANN_INDEX_DIR set but no index built; using in-memory index.")
+    return get_claim_index().search(new_embedding, top_k=top_k)
+
+
+def warm_similarity_index() -> None:
+    """Load (or open) the index search_similar_claims will use, so the first search does not pay for it."""
+    if ann_index.ann_enabled() and ann_index.open_index() is not None:
+        return
+    get_claim_index()
+
+
+def refresh_similarity_index() -> None:
+    """Pick up claims other processes saved since this process loaded its in-memory index."""
+    if ann_index.ann_enabled() and ann_index.open_index() is not None:
+        return
+    get_claim_index().refresh_from_db()
+
 
-    results.sort(key=lambda x: x[1], reverse=True)
-    return results[:top_k]
+def index_saved_claim(doc: dict[str, Any]) -> None:
+    """Make a just-saved claim searchable (in-memory index and, if enabled, the ANN tail)."""
+    index_claim(doc)
+    if ann_index.ann_enabled() and doc.get("embedding") is not None:
+        claim_id = doc.get("claim_id") or str(doc.get("_id", ""))
+        try:
+            ann_index.append_claim(claim_id, decode_embedding(doc["embedding"]))
+        except Exception as e:
+            logger.warning("Could not append claim %s to ANN index: %s", claim_id, e)
@@ -0,0 +1,294 @@
+"""
+In-memory claims vector index: one contiguous float32 matrix of L2-normalized
+embeddings with parallel claim_id / key_fields arrays.
+Loaded once per process from MongoDB and appended to when a claim is saved,
+so duplicate search covers the whole corpus with a single matrix-vector product.
+With EMBEDDING_QUANTIZATION=int8 the matrix holds int8 rows (4x smaller) and the
+top candidates are re-scored exactly against their stored float32 embeddings.
+"""
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from config import settings
+
+from .embedding_codec import decode_embedding, int8_enabled, quantize_int8
+
+logger = logging.getLogger(__name__)
+
+# Rows allocated up front; the matrix doubles when full (amortized O(1) appends)
+_INITIAL_CAPACITY = 1024
+
+# Documents fetched per round trip when loading the index
+_LOAD_BATCH_SIZE = 2000
+
+# int8 rows converted to float32 per step while scoring (bounds the temporary buffer)
+_SCORE_CHUNK_ROWS = 65_536
+
+_HAS_EMBEDDING = {"embedding": {"$exists": True, "$ne": None}}
+
+
+def _normalize(vec: Any) -> np.ndarray:
+    """Return a float32 unit vector (zero vector stays zero, so its cosine is 0)."""
+    v = decode_embedding(vec)
+    if v is None:
+        return np.empty(0, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    if norm == 0.0:
+        return v
+    return v / norm
+
+
+def _sim_to_pct(sim: np.ndarray) -> np.ndarray:
+    """Vectorized cosine → 0-100 percentage (same mapping as similarity._sim_to_pct)."""
+    return np.clip((sim + 1.0) / 2.0 * 100.0, 0.0, 100.0)
+
+
+class ClaimVectorIndex:
+    """Append-only, thread-safe brute-force cosine index over claim embeddings."""
+
+    def __init__(self, dim: Optional[int] = None, quantized: Optional[bool] = None):
+        self._lock = threading.RLock()
+        self._dim = dim
+        self._quantized = int8_enabled() if quantized is None else quantized
+        self._matrix: Optional[np.ndarray] = None
+        # 1 / ||row|| of each int8 row (quantized mode only)
+        self._inv_norms: Optional[np.ndarray] = None
+        self._size = 0
+        self._claim_ids: list[str] = []
+        self._key_fields: list[dict[str, Any]] = []
+        self._positions: dict[str, int] = {}
+        self._last_loaded_id: Any = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    @property
+    def quantized(self) -> bool:
+        return self._quantized
+
+    def _ensure_capacity(self, extra: int) -> None:
+        needed = self._size + extra
+        if self._matrix is not None and needed <= self._matrix.shape[0]:
+            return
+        capacity = max(_INITIAL_CAPACITY, self._matrix.shape[0] if self._matrix is not None else 0)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self._dim), dtype=np.int8 if self._quantized else np.float32)
+        inv_norms = np.zeros(capacity, dtype=np.float32) if self._quantized else None
+        if self._matrix is not None and self._size:
+            grown[: self._size] = self._matrix[: self._size]
+            if inv_norms is not None:
+                inv_norms[: self._size] = self._inv_norms[: self._size]
+        # Swap in the new buffers; readers holding views of the old ones stay valid
+        self._matrix = grown
+        self._inv_norms = inv_norms
+
+    def _row(self, embedding: Any) -> tuple[np.ndarray, float]:
+        """Stored row for an embedding and its inverse norm (1.0 for float rows, already unit)."""
+        if not self._quantized:
+            return _normalize(embedding), 1.0
+        vec = decode_embedding(embedding, dtype=None)
+        if vec is None:
+            return np.empty(0, dtype=np.int8), 0.0
+        row = vec if vec.dtype == np.int8 else quantize_int8(vec)
+        norm = float(np.linalg.norm(row.astype(np.float32)))
+        return row, (1.0 / norm if norm else 0.0)
+
+    def _set_row(self, pos: int, vec: np.ndarray, inv_norm: float) -> None:
+        self._matrix[pos] = vec
+        if self._quantized:
+            self._inv_norms[pos] = inv_norm
+
+    def add(self, claim_id: str, embedding: Any, key_fields: Optional[dict[str, Any]] = None) -> bool:
+        """Add or replace one claim. Returns False if the embedding dimension does not match."""
+        vec, inv_norm = self._row(embedding)
+        if vec.size == 0:
+            return False
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vec.size)
+            if vec.size != self._dim:
+                logger.warning(
+                    "Skipping claim %s in vector index: dim %s != %s", claim_id, vec.size, self._dim
+                )
+                return False
+            pos = self._positions.get(claim_id)
+            if pos is not None:
+                self._set_row(pos, vec, inv_norm)
+                self._key_fields[pos] = key_fields or {}
+                return True
+            self._ensure_capacity(1)
+            self._set_row(self._size, vec, inv_norm)
+            self._claim_ids.append(claim_id)
+            self._key_fields.append(key_fields or {})
+            self._positions[claim_id] = self._size
+            self._size += 1
+            return True
+
+    def add_claim(self, doc: dict[str, Any]) -> bool:
+        """Add a claim document (needs embedding; claim_id falls back to _id)."""
+        emb = doc.get("embedding_i8") if self._quantized else None
+        if emb is None:
+            emb = doc.get("embedding")
+        if emb is None:
+            return False
+        claim_id = doc.get("claim_id") or str(doc.get("_id", ""))
+        return self.add(claim_id, emb, doc.get("key_fields"))
+
+    def load_from_db(self) -> int:
+        """Stream every stored embedding into the index. Returns number of claims loaded."""
+        loaded = self._load_since(None)
+        logger.info("Claims vector index loaded %s embeddings", loaded)
+        return loaded
+
+    def refresh_from_db(self) -> int:
+        """
+        Load claims inserted (by any process) since the last load. ObjectIds are generated
+        client-side, so a claim committed late can sort below the last loaded _id: the _id
+        range scan re-reads the last VECTOR_INDEX_REFRESH_OVERLAP_S before it (claim_ids
+        only) and fetches embeddings just for the claims not indexed yet.
+        """
+        from .db import _claims_collection
+
+        last = self._last_loaded_id
+        if not isinstance(last, ObjectId):
+            return self._load_since(last)
+        overlap = timedelta(seconds=settings.VECTOR_INDEX_REFRESH_OVERLAP_S)
+        q = {**_HAS_EMBEDDING, "_id": {"$gte": ObjectId.from_datetime(last.generation_time - overlap)}}
+        new_ids = []
+        for doc in _claims_collection().find(q, {"claim_id": 1}).sort("_id", 1):
+            if (doc.get("claim_id") or str(doc["_id"])) not in self._positions:
+                new_ids.append(doc["_id"])
+            if doc["_id"] > last:
+                last = doc["_id"]
+        loaded = self._load({"_id": {"$in": new_ids}}) if new_ids else 0
+        self._last_loaded_id = last
+        return loaded
+
+    def _load_since(self, after_id: Any) -> int:
+        q: dict[str, Any] = {}
+        if after_id is not None:
+            q["_id"] = {"$gt": after_id}
+        return self._load(q)
+
+    def _load(self, q: dict[str, Any]) -> int:
+        from .db import _claims_collection
+
+        q = {**_HAS_EMBEDDING, **q}
+        # Quantized mode transfers only the int8 copy when a claim has one
+        emb = {"$ifNull": ["$embedding_i8", "$embedding"]} if self._quantized else 1
+        cursor = _claims_collection().find(
+            q,
+            {"claim_id": 1, "embedding": emb, "key_fields": 1},
+        ).sort("_id", 1).batch_size(_LOAD_BATCH_SIZE)
+        loaded = 0
+        for doc in cursor:
+            if self.add_claim(doc):
+                loaded += 1
+            self._last_loaded_id = doc["_id"]
+        return loaded
+
+    def search(
+        self,
+        embedding: Any,
+        top_k: int = 1,
+    ) -> list[tuple[dict[str, Any], float]]:
+        """
+        Top-k most similar claims by cosine similarity.
+        Returns list of ({claim_id, key_fields}, duplication_pct) sorted descending.
+        """
+        with self._lock:
+            n = self._size
+            if n == 0 or top_k <= 0:
+                return []
+            matrix = self._matrix[:n]
+            inv_norms = self._inv_norms[:n] if self._quantized else None
+            claim_ids = self._claim_ids
+            key_fields = self._key_fields
+        q = _normalize(embedding)
+        if q.size != matrix.shape[1]:
+            logger.warning("Query embedding dim %s != index dim %s", q.size, matrix.shape[1])
+            return []
+        if inv_norms is None:
+            scores = matrix @ q
+            k = min(top_k, n)
+        else:
+            scores = np.empty(n, dtype=np.float32)
+            for start in range(0, n, _SCORE_CHUNK_ROWS):
+                end = min(n, start + _SCORE_CHUNK_ROWS)
+                scores[start:end] = matrix[start:end].astype(np.float32) @ q
+            scores *= inv_norms
+            k = min(max(top_k, settings.EMBEDDING_RESCORE_CANDIDATES), n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        if inv_norms is not None:
+            scores = scores.copy()
+            scores[top] = _exact_scores([claim_ids[i] for i in top], q, scores[top])
+        top = top[np.argsort(-scores[top], kind="stable")][:top_k]
+        pcts = _sim_to_pct(scores[top])
+        return [
+            ({"claim_id": claim_ids[i], "key_fields": key_fields[i]}, round(float(p), 1))
+            for i, p in zip(top, pcts)
+        ]
+
+
+def _exact_scores(claim_ids: list[str], q: np.ndarray, approx: np.ndarray) -> np.ndarray:
+    """Cosine of q against the stored float32 embeddings of claim_ids (approx kept where unavailable)."""
+    from .db import get_claims_by_ids
+
+    exact = np.array(approx, dtype=np.float32)
+    try:
+        docs = get_claims_by_ids(claim_ids, {"claim_id": 1, "embedding": 1})
+    except Exception as e:
+        logger.warning("Exact re-scoring skipped: %s", e)
+        return exact
+    by_id = {d["claim_id"]: d.get("embedding") for d in docs}
+    for j, cid in enumerate(claim_ids):
+        vec = _normalize(by_id.get(cid))
+        if vec.size == q.size:
+            exact[j] = float(vec @ q)
+    return exact
+
+
+_index: Optional[ClaimVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_claim_index() -> ClaimVectorIndex:
+    """Process-wide claims index, loaded from MongoDB on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = ClaimVectorIndex()
+                index.load_from_db()
+                _index = index
+    return _index
+
+
+def index_claim(doc: dict[str, Any]) -> None:
+    """Append a just-saved claim to the process index (no-op until the index is loaded)."""
+    if _index is None:
+        return
+    try:
+        _index.add_claim(doc)
+    except Exception as e:
+        logger.warning("Could not add claim to vector index: %s", e)
+
+
+def reset_claim_index() -> None:
+    """Drop the process index so the next search reloads it from MongoDB."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -4,6 +4,8 @@ Single app: Home, Submit Claim, Dashboard (via Streamlit multipage).
 """
 import streamlit as st
 
+from services import metrics
+
 st.set_page_config(
     page_title="Claim Document Verifier",
     page_icon="📋",
@@ -11,6 +13,9 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Prometheus endpoint for this Streamlit process (once; no-op unless METRICS_PORT is set)
+metrics.serve_metrics()
+
 # Custom style for a clean, professional look
 st.markdown("""
 <style>
@@ -77,7 +82,7 @@ with col3:
     st.markdown("""
     <div class="metric-card">
         <strong>📥 Export</strong><br/>
-        <span style="color:#64748b;font-size:0.9rem;">Download results as Excel from the Dashboard.</span>
+        <span style="color:#64748b;font-size:0.9rem;">Download all results as Excel, CSV or Parquet from the Dashboard.</span>
     </div>
     """, unsafe_allow_html=True)
 
@@ -87,6 +92,6 @@ st.markdown("""
     <strong>How it works</strong><br/>
     1. <b>Submit Claim</b> — Upload a claim PDF. We extract text, compare it with existing claims using AI embeddings, and run an agent to decide accept / reject / flag.<br/>
     2. <b>Dashboard</b> — See all claims with status, duplication %, compared claim, key differences, and <b>rejection reason</b> for quick review.<br/>
-    3. <b>Export</b> — Download the table as Excel (Claim ID, Compared With, Duplication %, Key Differences, Status, Rejection Reason).
+    3. <b>Export</b> — Download the full claim history as Excel, CSV or Parquet (Claim ID, Compared With, Duplication %, Key Differences, Status, Rejection Reason).
 </div>
 """, unsafe_allow_html=True)